@@ -0,0 +1,124 @@
+"""
+Benchmark the batch analyze path against the original per-row function
+
+Checks generate_explanations against the original per-row /analyze code
+(sklearn predict on one row at a time) for every customer in the CSV plus
+edge-case inputs, then times both on batches of customer records. Inputs
+the per-row code rejected (null, non-numeric) must come back as per-record
+errors.
+
+    python benchmark_analyze.py --sizes 1 100 1000
+"""
+import argparse
+import time
+import warnings
+import main
+
+def legacy_explanation(user_data):
+    """The original per-row /analyze implementation, unchanged apart from the artifacts lookup"""
+    model_artifacts = main.resources.artifacts
+    model = model_artifacts['model']
+    feature_names = model_artifacts['features']
+    label_encoders = model_artifacts['label_encoders']
+
+    input_data = []
+    processed_row = {}
+    for feat in feature_names:
+        val = user_data.get(feat, 0)
+        if feat in label_encoders:
+            le = label_encoders[feat]
+            try:
+                val = str(val)
+                if val in le.classes_:
+                    val = le.transform([val])[0]
+                else:
+                    val = 0 # Fallback
+            except:
+                val = 0
+        processed_row[feat] = float(val) if isinstance(val, (int, float)) else val
+        input_data.append(processed_row[feat])
+
+    # The original passed a plain list to a model fitted on a frame
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        prediction = model.predict([input_data])[0]
+
+    importances = list(zip(feature_names, model.feature_importances_))
+    importances.sort(key=lambda x: x[1], reverse=True)
+    top_features = importances[:3]
+
+    why_text = []
+    improve_text = []
+    for feat, imp in top_features:
+        why_text.append(f"{feat} (Importance: {imp:.2f}) plays a major role.")
+        feat_upper = feat.upper()
+        if 'DEBT' in feat_upper:
+             improve_text.append(f"Lowering your {feat} usually improves the score.")
+        elif 'SAVINGS' in feat_upper or 'INCOME' in feat_upper:
+             improve_text.append(f"Increasing {feat} can help.")
+        elif 'GAMBLING' in feat_upper:
+             improve_text.append(f"Reducing {feat} is recommended.")
+    if not improve_text:
+        improve_text.append("Maintain good financial habits.")
+
+    return {
+        "score": round(prediction, 1),
+        "analysis": {
+            "factors": [f"{f}: {v}" for f, v in zip(feature_names, input_data) if f in [tf[0] for tf in top_features]],
+            "explanation": " ".join(why_text),
+            "recommendations": improve_text
+        }
+    }
+
+def edge_cases(record):
+    """(label, input) variants of one record"""
+    artifacts = main.resources.artifacts
+    numeric = next(artifacts['features'][i] for i in artifacts['top_index']
+                   if artifacts['features'][i] not in artifacts['category_maps'])
+    cases = [("empty record", {}), ("numeric string", {**record, numeric: str(record.get(numeric, 0))}),
+             ("null", {**record, numeric: None}), ("non-numeric string", {**record, numeric: "n/a"})]
+    categorical = next(iter(artifacts['category_maps']), None)
+    if categorical is not None:
+        cases.append(("unknown category", {**record, categorical: "not-a-label"}))
+    return cases
+
+def compare(record):
+    """'identical', 'different', 'both rejected' or 'accepted, legacy raised' for one input"""
+    batch = main.generate_explanations([record])[0]
+    try:
+        legacy = legacy_explanation(record)
+    except ValueError:
+        return 'both rejected' if 'error' in batch else 'accepted, legacy raised'
+    return 'identical' if legacy == batch else 'different'
+
+def timed(fn, repeat=3):
+    """Best of `repeat` runs, seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-row vs batch /analyze")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 1000])
+    args = parser.parse_args()
+
+    snapshot = main.resources
+    if snapshot.artifacts is None or snapshot.store is None:
+        raise SystemExit("Model or CSV not loaded - run train_model.py first.")
+    records = [snapshot.store.record(row) for row in range(len(snapshot.store))]
+
+    outcomes = [compare(record) for record in records]
+    print(f"Parity: {outcomes.count('identical')}/{len(records)} customers identical to the per-row code")
+    for label, record in edge_cases(records[0]):
+        print(f"   {label:20s} {compare(record)}")
+
+    print(f"\n{'Records':>8} {'Per-row':>12} {'Batch':>12} {'Speedup':>9} {'Batch rec/s':>12}")
+    for size in args.sizes:
+        sample = (records * (size // len(records) + 1))[:size]
+        per_row = timed(lambda: [legacy_explanation(r) for r in sample])
+        batched = timed(lambda: main.generate_explanations(sample))
+        print(f"{size:>8} {per_row * 1000:>10.2f}ms {batched * 1000:>10.2f}ms "
+              f"{per_row / batched:>8.1f}x {size / batched:>12,.0f}")
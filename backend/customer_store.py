@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+
+class CustomerStore:
+    """
+    Read-only customer table: typed column arrays plus a hash index
+    from customer ID to row number.
+
+    Numeric columns keep their compact dtypes (float32/int32), string
+    columns are held as integer codes into a small array of labels.
+    """
+
+    def __init__(self, ids, numeric, categorical):
+        self.ids = ids
+        self.numeric = numeric          # name -> 1D array
+        self.categorical = categorical  # name -> (codes, labels)
+        self.columns = list(numeric) + list(categorical)
+        # First occurrence wins for duplicated IDs
+        self.index = {}
+        for row, customer_id in enumerate(ids):
+            self.index.setdefault(customer_id, row)
+
+    @classmethod
+    def from_frame(cls, df, id_column='CUST_ID', column_order=None):
+        """Build the store from a DataFrame (e.g. from DataLoader)"""
+        ids = df[id_column].astype(str).to_numpy(dtype=object)
+        numeric, categorical = {}, {}
+        for col in df.columns:
+            if col == id_column:
+                continue
+            series = df[col]
+            if pd.api.types.is_numeric_dtype(series):
+                numeric[col] = series.to_numpy()
+            else:
+                codes, labels = pd.factorize(series)
+                categorical[col] = (codes, np.asarray(labels, dtype=object))
+        store = cls(ids, numeric, categorical)
+        # Keep the source column order for records
+        store.columns = [col for col in df.columns if col != id_column]
+        return store
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, customer_id):
+        return customer_id in self.index
+
+    def row(self, customer_id):
+        """Row number of a customer, or None"""
+        return self.index.get(customer_id)
+
+    def record(self, row):
+        """One customer as a dict of plain Python values"""
+        record = {}
+        for col in self.columns:
+            if col in self.numeric:
+                value = self.numeric[col][row]
+                # float32 via its shortest string form, so 7.8 stays 7.8
+                record[col] = float(str(value)) if value.dtype == np.float32 else value.item()
+            else:
+                codes, labels = self.categorical[col]
+                record[col] = labels[codes[row]] if codes[row] >= 0 else float('nan')
+        return record
+
+    def python_values(self, col):
+        """Whole column as Python values, matching record()"""
+        if col in self.numeric:
+            values = self.numeric[col]
+            if values.dtype == np.float32:
+                return [float(str(value)) for value in values]
+            return values.tolist()
+        codes, labels = self.categorical[col]
+        return [labels[code] if code >= 0 else float('nan') for code in codes]
+
+    def encoded_column(self, col, lookup, default=0):
+        """
+        Categorical column mapped through a label -> code dict
+
+        Each distinct label is looked up once, then broadcast by code.
+        """
+        codes, labels = self.categorical[col]
+        mapped = np.array([lookup.get(str(label), default) for label in labels] + [lookup.get('nan', default)],
+                          dtype=float)
+        # code -1 (missing) picks the trailing 'nan' entry
+        return mapped[codes]
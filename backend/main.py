@@ -1,9 +1,15 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import List
 import pandas as pd
 import pickle
+import math
 import os
+import sys
+import threading
+import time
+from collections import namedtuple
 import numpy as np
 
 app = FastAPI()
@@ -19,117 +25,141 @@ app.add_middleware(
 
 # Load Model and Data
 BASE_DIR = os.path.dirname(__file__)
+
+# Shared flattened tree evaluator from the ML pipeline
+sys.path.append(os.path.join(BASE_DIR, '../ml_backend'))
+from tree_engine import FlatTreeEnsemble
+from data_loader import DataLoader
+from customer_store import CustomerStore
+
 MODEL_PATH = os.path.join(BASE_DIR, 'credit_score_model.pkl')
 CSV_PATH = os.path.join(BASE_DIR, '../public/credit_score.csv')
 
-model_artifacts = None
-df_data = None
+# How often (seconds) to check the CSV and model files for changes
+STORE_REFRESH_SECONDS = float(os.getenv("STORE_REFRESH_SECONDS", "5"))
+
+# Batches up to this size use the flat evaluator, larger ones sklearn
+ENGINE_MAX_ROWS = 256
+
+# Model artifacts, every known customer and their precomputed scores.
+# Never mutated: a reload builds a new one and swaps it in with one assignment,
+# so a request that reads `resources` once sees a consistent set.
+Resources = namedtuple("Resources", ["artifacts", "store", "scores"])
+resources = Resources(None, None, None)
+store_state = {"signature": None, "checked_at": 0.0}
+store_lock = threading.Lock()
+
+def _source_signature():
+    """Size and mtime of the CSV and model files"""
+    signature = []
+    for path in (CSV_PATH, MODEL_PATH):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+def load_artifacts():
+    """Unpickle the model and precompute everything that doesn't depend on the input"""
+    with open(MODEL_PATH, 'rb') as f:
+        artifacts = pickle.load(f)
+    artifacts['engine'] = FlatTreeEnsemble.from_sklearn(artifacts['model'])
+    # Category label -> code dicts (replace le.transform / `in le.classes_`)
+    artifacts['category_maps'] = {
+        feat: {label: code for code, label in enumerate(le.classes_)}
+        for feat, le in artifacts['label_encoders'].items()
+    }
+    # Global importance ranking is the same for every customer and request
+    artifacts['importance_summary'] = importance_summary(
+        artifacts['features'], artifacts['model'].feature_importances_
+    )
+    top_names = [tf[0] for tf in artifacts['importance_summary'][0]]
+    artifacts['top_index'] = [
+        i for i, feat in enumerate(artifacts['features']) if feat in top_names
+    ]
+    return artifacts
 
 def load_resources():
-    global model_artifacts, df_data
+    global resources
+    signature = _source_signature()
+    # A source that fails to load keeps its previous version
+    artifacts, store = resources.artifacts, resources.store
     try:
-        with open(MODEL_PATH, 'rb') as f:
-            model_artifacts = pickle.load(f)
+        artifacts = load_artifacts()
         print("Model loaded successfully.")
     except Exception as e:
         print(f"Error loading model: {e}")
 
     try:
-        df_data = pd.read_csv(CSV_PATH)
-        # Create an index for faster lookup
-        if 'CUST_ID' in df_data.columns:
-            df_data.set_index('CUST_ID', inplace=True)
+        # Typed columnar cache (float32/int32/categorical), rebuilt when the CSV changes
+        df = DataLoader(CSV_PATH).load_data()
+        store = CustomerStore.from_frame(df)
+        del df
         print("CSV data loaded successfully.")
     except Exception as e:
         print(f"Error loading CSV data: {e}")
 
-load_resources()
+    scores = None
+    if artifacts is not None and store is not None:
+        try:
+            # Score every known customer in one batch
+            start = time.perf_counter()
+            scores = predict_matrix(artifacts, store_feature_matrix(artifacts, store))
+            print(f"Scored {len(store)} customers in {(time.perf_counter() - start) * 1000:.0f} ms.")
+        except Exception as e:
+            print(f"Error scoring customers: {e}")
 
-class AnalyzeRequest(BaseModel):
-    # Dynamic fields - we will convert incoming JSON to DataFrame
-    features: dict
+    # Publish model, customers and scores together
+    resources = Resources(artifacts, store, scores)
+    store_state["signature"] = signature
+    store_state["checked_at"] = time.monotonic()
 
-@app.get("/")
-def read_root():
-    return {"message": "Credit Score ML API is running"}
+def refresh_if_stale():
+    """Reload model, customers and scores when the source files change"""
+    if time.monotonic() - store_state["checked_at"] < STORE_REFRESH_SECONDS:
+        return
+    with store_lock:
+        if time.monotonic() - store_state["checked_at"] < STORE_REFRESH_SECONDS:
+            return
+        store_state["checked_at"] = time.monotonic()
+        if _source_signature() != store_state["signature"]:
+            print("Source files changed, reloading.")
+            load_resources()
 
-@app.get("/api/user/{user_id}")
-def get_user_data(user_id: str):
-    if df_data is None or user_id not in df_data.index:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    user_row = df_data.loc[user_id]
-    user_dict = user_row.to_dict()
-    
-    # We can also run the explanation logic here
-    explanation = generate_explanation(user_dict)
-    
-    return {
-        "user_id": user_id,
-        "data": user_dict,
-        "explanation": explanation
-    }
+def store_feature_matrix(artifacts, store):
+    """Model input matrix for every customer in the store"""
+    feature_names = artifacts['features']
+    label_encoders = artifacts['label_encoders']
+    X = np.zeros((len(store), len(feature_names)))
+    for i, feat in enumerate(feature_names):
+        if feat in label_encoders:
+            if feat in store.categorical:
+                X[:, i] = store.encoded_column(feat, artifacts['category_maps'][feat])
+            # numeric or absent: encodes to the fallback 0
+        elif feat in store.numeric:
+            X[:, i] = store.numeric[feat]
+    return X
 
-@app.post("/api/credit-score/analyze")
-def analyze_score(request: AnalyzeRequest):
-    # This endpoint allows analyzing custom input data
-    explanation = generate_explanation(request.features)
-    return explanation
+def predict_matrix(artifacts, X):
+    """Predict a processed input matrix"""
+    # sklearn rejects NaN (missing values in the CSV); the flat evaluator sends it right
+    if len(X) <= ENGINE_MAX_ROWS or np.isnan(X).any():
+        return artifacts['engine'].predict(X)
+    # sklearn's compiled loop wins for large batches
+    return artifacts['model'].predict(pd.DataFrame(X, columns=artifacts['features']))
 
-def generate_explanation(user_data):
-    if model_artifacts is None:
-        return {"error": "Model not loaded"}
-    
-    model = model_artifacts['model']
-    feature_names = model_artifacts['features']
-    label_encoders = model_artifacts['label_encoders']
-    
-    # Prepare input vector
-    input_data = []
-    
-    # We need to fill missing features with defaults or 0 if not provided
-    # and encode categoricals
-    
-    processed_row = {}
-    
-    for feat in feature_names:
-        val = user_data.get(feat, 0)
-        
-        # Handle encoding
-        if feat in label_encoders:
-            le = label_encoders[feat]
-            try:
-                val = str(val)
-                # Handle unknown labels if necessary, for now try/except
-                if val in le.classes_:
-                    val = le.transform([val])[0]
-                else:
-                    val = 0 # Fallback
-            except:
-                val = 0
-                
-        processed_row[feat] = float(val) if isinstance(val, (int, float)) else val
-        input_data.append(processed_row[feat])
-        
-    # Predict
-    prediction = model.predict([input_data])[0]
-    
-    # Explanation Logic
-    # 1. Feature Importance (Global)
-    importances = list(zip(feature_names, model.feature_importances_))
-    importances.sort(key=lambda x: x[1], reverse=True)
-    top_features = importances[:3]
-    
-    # 2. Local Explanation (Simple)
-    # Compare user values to average? 
-    # Or just explain based on high leverage features.
+def importance_summary(feature_names, importances):
+    """Top-3 global features with their explanation and recommendation text"""
+    ranking = list(zip(feature_names, importances))
+    ranking.sort(key=lambda x: x[1], reverse=True)
+    top_features = ranking[:3]
     
     why_text = []
     improve_text = []
     
     # Simple heuristic: meaningful factors
     for feat, imp in top_features:
-        val = processed_row[feat]
         # Just a generic explanation for now based on feature name
         # Ideally we'd know directionality (SHAP values), but for this quick impl:
         why_text.append(f"{feat} (Importance: {imp:.2f}) plays a major role.")
@@ -145,12 +175,160 @@ def generate_explanation(user_data):
              
     if not improve_text:
         improve_text.append("Maintain good financial habits.")
-        
+    
+    return top_features, " ".join(why_text), improve_text
+
+def stored_explanation(snapshot, row, user_dict):
+    """Explanation for a known customer from the precomputed score in `snapshot`"""
+    feature_names = snapshot.artifacts['features']
+    category_maps = snapshot.artifacts['category_maps']
+    _, explanation_text, recommendations = snapshot.artifacts['importance_summary']
+    
+    factors = []
+    for i in snapshot.artifacts['top_index']:
+        feat = feature_names[i]
+        val = user_dict.get(feat, 0)
+        if feat in category_maps:
+            val = category_maps[feat].get(str(val), 0.0)
+        else:
+            val = float(val)
+        factors.append(f"{feat}: {val}")
+    
     return {
-        "score": round(prediction, 1),
+        "score": round(snapshot.scores[row], 1),
         "analysis": {
-            "factors": [f"{f}: {v}" for f, v in zip(feature_names, input_data) if f in [tf[0] for tf in top_features]],
-            "explanation": " ".join(why_text),
-            "recommendations": improve_text
+            "factors": factors,
+            "explanation": explanation_text,
+            "recommendations": recommendations
+        }
+    }
+
+def _as_float(value):
+    """Numeric model input, or None for null, non-numeric and non-finite values"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+def _as_shown(value):
+    """A numeric input as `factors` shows it: numbers as floats, anything else as sent"""
+    return float(value) if isinstance(value, (int, float)) else value
+
+def records_matrix(artifacts, records):
+    """
+    Model input matrix for a list of feature dicts, built column by column
+    
+    Missing features default to 0 and unknown categories to code 0.
+    Null, non-numeric and non-finite values of numeric features are not
+    scored: their records are listed in `invalid` ({row: [features]}).
+    Returns the matrix, the top-feature values as shown in `factors` and
+    the invalid records.
+    """
+    feature_names = artifacts['features']
+    category_maps = artifacts['category_maps']
+    top_index = set(artifacts['top_index'])
+    X = np.empty((len(records), len(feature_names)))
+    shown = {}
+    invalid = {}
+    for i, feat in enumerate(feature_names):
+        if feat in category_maps:
+            lookup = category_maps[feat]
+            # Known labels show their integer code, the fallback shows 0.0
+            column = [lookup.get(str(record.get(feat, 0)), 0.0) for record in records]
+            X[:, i] = column
+            if i in top_index:
+                shown[i] = column
+        else:
+            values = [record.get(feat, 0) for record in records]
+            numbers = [_as_float(value) for value in values]
+            for row, number in enumerate(numbers):
+                if number is None:
+                    invalid.setdefault(row, []).append(feat)
+            # Invalid rows get a placeholder; their prediction is discarded
+            X[:, i] = [0.0 if number is None else number for number in numbers]
+            if i in top_index:
+                shown[i] = [_as_shown(value) for value in values]
+    return X, shown, invalid
+
+def generate_explanations(records):
+    """Score and explain a batch of feature dicts with one model call"""
+    artifacts = resources.artifacts
+    if artifacts is None:
+        return [{"error": "Model not loaded"} for _ in records]
+    if not records:
+        return []
+    
+    X, shown, invalid = records_matrix(artifacts, records)
+    predictions = predict_matrix(artifacts, X)
+    
+    feature_names = artifacts['features']
+    _, explanation_text, recommendations = artifacts['importance_summary']
+    factor_columns = [(feature_names[i], shown[i]) for i in artifacts['top_index']]
+    
+    return [
+        {"error": "Invalid feature values", "invalid_fields": invalid[row]}
+        if row in invalid else
+        {
+            "score": round(prediction, 1),
+            "analysis": {
+                "factors": [f"{feat}: {column[row]}" for feat, column in factor_columns],
+                "explanation": explanation_text,
+                "recommendations": recommendations
+            }
         }
+        for row, prediction in enumerate(predictions)
+    ]
+
+def generate_explanation(user_data):
+    """Score and explain a single feature dict"""
+    return generate_explanations([user_data])[0]
+
+load_resources()
+
+class AnalyzeRequest(BaseModel):
+    # Dynamic fields - we will convert incoming JSON to DataFrame
+    features: dict
+
+class BatchAnalyzeRequest(BaseModel):
+    records: List[dict]
+
+@app.get("/")
+def read_root():
+    return {"message": "Credit Score ML API is running"}
+
+@app.get("/api/user/{user_id}")
+def get_user_data(user_id: str):
+    refresh_if_stale()
+    snapshot = resources
+    row = snapshot.store.row(user_id) if snapshot.store is not None else None
+    if row is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    user_dict = snapshot.store.record(row)
+    
+    # Scores were computed for every customer at load time
+    if snapshot.scores is None:
+        explanation = {"error": "Model not loaded"}
+    else:
+        explanation = stored_explanation(snapshot, row, user_dict)
+    
+    return {
+        "user_id": user_id,
+        "data": user_dict,
+        "explanation": explanation
     }
+
+@app.post("/api/credit-score/analyze")
+def analyze_score(request: AnalyzeRequest):
+    # This endpoint allows analyzing custom input data
+    explanation = generate_explanation(request.features)
+    if "invalid_fields" in explanation:
+        raise HTTPException(status_code=422, detail=explanation)
+    return explanation
+
+@app.post("/api/credit-score/analyze/batch")
+def analyze_batch(request: BatchAnalyzeRequest):
+    # Many records in one pass: one input matrix, one model call;
+    # records with invalid values get a per-record error
+    return {"results": generate_explanations(request.records)}
@@ -17,7 +17,9 @@ def predict_now(user_id='C03PVPPHOY'):
         artifacts = pickle.load(f)
     print("Model loaded.")
 
-    df = pd.read_csv(csv_path)
+    sys.path.append(os.path.join(base_dir, '../ml_backend'))
+    from data_loader import DataLoader, row_to_record
+    df = DataLoader(csv_path).load_data()
     print(f"Dataset loaded. Found {len(df)} records.")
     
     # Find user
@@ -27,7 +29,7 @@ def predict_now(user_id='C03PVPPHOY'):
         return
         
     print(f"\n--- Analyzing User: {user_id} ---")
-    user_data = user.iloc[0].to_dict()
+    user_data = row_to_record(user.iloc[0])
     
     # Prepare input
     model = artifacts['model']
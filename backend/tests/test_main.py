@@ -0,0 +1,78 @@
+"""
+Input handling of the /analyze endpoints, on a small model written to a temp pickle
+"""
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import main  # noqa: E402
+
+FEATURES = ['INCOME', 'R_DEBT_INCOME', 'CAT_GAMBLING']
+
+
+@pytest.fixture()
+def model(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    encoder = LabelEncoder().fit(['High', 'Low', 'No'])
+    X = pd.DataFrame({
+        'INCOME': rng.uniform(0, 100, 300),
+        'R_DEBT_INCOME': rng.uniform(0, 10, 300),
+        'CAT_GAMBLING': rng.integers(0, 3, 300).astype(float)
+    })
+    y = 600 + X['INCOME'] - 20 * X['R_DEBT_INCOME'] + 10 * X['CAT_GAMBLING']
+    rf = RandomForestRegressor(n_estimators=10, random_state=42).fit(X, y)
+
+    path = tmp_path / 'model.pkl'
+    with open(path, 'wb') as f:
+        pickle.dump({'model': rf, 'features': FEATURES, 'label_encoders': {'CAT_GAMBLING': encoder}}, f)
+    monkeypatch.setattr(main, 'MODEL_PATH', str(path))
+    monkeypatch.setattr(main, 'resources', main.Resources(main.load_artifacts(), None, None))
+    return rf
+
+
+def _score(rf, row):
+    return round(rf.predict(pd.DataFrame([row], columns=FEATURES))[0], 1)
+
+
+def test_valid_records_match_sklearn(model):
+    results = main.generate_explanations([
+        {'INCOME': 50, 'R_DEBT_INCOME': 2.5, 'CAT_GAMBLING': 'Low'},
+        {'INCOME': '50', 'R_DEBT_INCOME': '2.5', 'CAT_GAMBLING': 'Low'},
+        {'CAT_GAMBLING': 'unknown label'}
+    ])
+    assert results[0]['score'] == _score(model, [50, 2.5, 1])
+    # Numeric strings score as numbers, missing features and unknown labels as 0
+    assert results[1]['score'] == results[0]['score']
+    assert results[2]['score'] == _score(model, [0, 0, 0])
+
+
+@pytest.mark.parametrize('value', [None, 'n/a', '', float('nan'), float('inf'), [1]])
+def test_invalid_numeric_value_is_a_per_record_error(model, value):
+    valid = {'INCOME': 50, 'R_DEBT_INCOME': 2.5, 'CAT_GAMBLING': 'Low'}
+    results = main.generate_explanations([valid, {**valid, 'R_DEBT_INCOME': value}])
+    assert results[0]['score'] == _score(model, [50, 2.5, 1])
+    assert results[1] == {'error': 'Invalid feature values', 'invalid_fields': ['R_DEBT_INCOME']}
+
+
+@pytest.mark.parametrize('value', [None, 'n/a'])
+def test_analyze_endpoints_reject_invalid_values(model, value):
+    client = TestClient(main.app)
+    features = {'INCOME': 50, 'R_DEBT_INCOME': value}
+
+    response = client.post('/api/credit-score/analyze', json={'features': features})
+    assert response.status_code == 422
+    assert response.json()['detail']['invalid_fields'] == ['R_DEBT_INCOME']
+
+    response = client.post('/api/credit-score/analyze/batch', json={'records': [features, {'INCOME': 50}]})
+    assert response.status_code == 200
+    first, second = response.json()['results']
+    assert first['invalid_fields'] == ['R_DEBT_INCOME']
+    assert second['score'] == _score(model, [50, 0, 0])
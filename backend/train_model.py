@@ -5,12 +5,15 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import LabelEncoder
 import pickle
 import os
+import sys
 
 def train_model():
     # Load dataset
     csv_path = os.path.join(os.path.dirname(__file__), '../public/credit_score.csv')
     print(f"Loading data from {csv_path}...")
-    df = pd.read_csv(csv_path)
+    sys.path.append(os.path.join(os.path.dirname(__file__), '../ml_backend'))
+    from data_loader import DataLoader
+    df = DataLoader(csv_path).load_data()
     
     # Identify relevant columns
     # We want to predict CREDIT_SCORE based on other factors
@@ -30,7 +33,7 @@ def train_model():
     # Simple preprocessing: Label Encode object columns
     label_encoders = {}
     for col in feature_df.columns:
-        if feature_df[col].dtype == 'object':
+        if not pd.api.types.is_numeric_dtype(feature_df[col]):
             le = LabelEncoder()
             feature_df[col] = le.fit_transform(feature_df[col].astype(str))
             label_encoders[col] = le
@@ -43,6 +46,11 @@ def train_model():
     rf = RandomForestRegressor(n_estimators=100, random_state=42)
     rf.fit(X, y)
     
+    # Make sure the flattened evaluator used by main.py reproduces the forest
+    from tree_engine import FlatTreeEnsemble
+    max_diff = FlatTreeEnsemble.from_sklearn(rf).check_parity(rf, X, atol=1e-6)
+    print(f"Flat tree engine parity: max diff {max_diff:g}")
+    
     # Save artifacts
     artifacts = {
         'model': rf,
@@ -2,19 +2,107 @@
 FastAPI Server for Credit Score ML Model
 Provides REST API endpoints for predictions and explanations
 """
-from fastapi import FastAPI, HTTPException
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Dict, List, Optional
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, List, Literal, Optional
 import pandas as pd
 import uvicorn
 from predict import CreditScorePredictor
+from batching import MicroBatcher
+from inference_pool import InferencePool, PoolOverloadedError
+from streaming import spool_body, stream_scores
+from columnar import MEDIA_TYPES as COLUMNAR_MEDIA_TYPES, body_format
+from shap_explainer import EXPLANATION_MODES
+from explanation_generator import resolve_fields
+from metrics import REGISTRY as METRICS, MetricsMiddleware, since_request_start, stage
 import config
 
+# Initialize predictor (loaded at startup, lazily as a fallback)
+predictor = None
+
+# Startup state reported by /ready and /health
+startup_state = {
+    "ready": False,
+    "timings": {}
+}
+
+def get_predictor():
+    """Lazy load predictor"""
+    global predictor
+    if predictor is None:
+        predictor = CreditScorePredictor()
+        predictor.load_models()
+    return predictor
+
+# CPU-bound inference runs on this pool, keeping the event loop responsive
+inference_pool = InferencePool(get_predictor)
+
+# Optional request coalescing (see config.BATCHING_ENABLED)
+# (one analyze batcher per explanation mode, so each flush is one SHAP call;
+# top_k and fields travel with each request and shape its own payload)
+analyze_batchers = {
+    explanation_mode: MicroBatcher(lambda requests, explanation_mode=explanation_mode: inference_pool.run(
+        'predict_with_explanation_many',
+        [user for user, _, _ in requests],
+        mode=explanation_mode,
+        top_k=[top_k for _, top_k, _ in requests],
+        fields=[fields for _, _, fields in requests]
+    ))
+    for explanation_mode in EXPLANATION_MODES
+}
+
+predict_batcher = MicroBatcher(lambda users: inference_pool.run('predict_score_many', users))
+
+def _timed_stage(name, fn, *args):
+    """Run one startup stage and log its wall time"""
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    startup_state["timings"][name] = round(elapsed * 1000, 2)
+    print(f"⏱️  Startup stage '{name}': {elapsed * 1000:.1f} ms")
+    return result
+
+def startup():
+    """Load models, warm up and start the inference pool"""
+    startup_state["ready"] = False
+    start = time.perf_counter()
+    if inference_pool.mode != 'process':
+        loaded = _timed_stage("load_models", get_predictor)
+        for name, elapsed in loaded.load_timings.items():
+            startup_state["timings"][f"load_models.{name}"] = round(elapsed * 1000, 2)
+        # Already warm when preloaded by the pre-fork launcher (serve.py)
+        if not loaded.warmed_up:
+            _timed_stage("warm_up", loaded.warm_up, config.WARMUP_ROWS)
+        # Latency histograms start with real traffic, not warm-up rows
+        METRICS.reset()
+    # Process workers load and warm up their own models in here
+    _timed_stage("inference_pool", inference_pool.start)
+    startup_state["ready"] = True
+    print(f"✅ Server ready in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+@asynccontextmanager
+async def lifespan(app):
+    """Eager model loading on startup, clean shutdown of batchers and pool"""
+    await asyncio.get_running_loop().run_in_executor(None, startup)
+    yield
+    startup_state["ready"] = False
+    for batcher in analyze_batchers.values():
+        await batcher.stop()
+    await predict_batcher.stop()
+    inference_pool.shutdown()
+
 app = FastAPI(
     title="Credit Score ML API",
     description="API for credit score prediction with SHAP explainability",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson encodes NumPy scalars/arrays natively and is several times faster
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware for frontend integration
@@ -26,18 +114,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize predictor (lazy loading)
-predictor = None
-
-def get_predictor():
-    """Lazy load predictor"""
-    global predictor
-    if predictor is None:
-        predictor = CreditScorePredictor()
-        predictor.load_models()
-    return predictor
+# Per-request stage timings: Server-Timing header and latency histograms
+# (outermost, so the recorded total covers the other middleware too)
+if config.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 # Request/Response Models
+# 'exact' (TreeSHAP) or 'fast' (path contributions); None -> config.EXPLANATION_MODE
+ExplanationMode = Literal[EXPLANATION_MODES]
+
 class UserData(BaseModel):
     """User financial data for prediction"""
     INCOME: Optional[float] = None
@@ -75,6 +160,9 @@ class PredictionResponse(BaseModel):
 class BatchPredictionRequest(BaseModel):
     """Request for batch predictions"""
     users: List[Dict]
+    explain: bool = False
+    top_k: int = Field(5, ge=1, le=20)
+    explain_mode: Optional[ExplanationMode] = None
 
 @app.get("/")
 async def root():
@@ -83,83 +171,238 @@ async def root():
         "message": "Credit Score ML API",
         "version": "1.0.0",
         "endpoints": {
-            "/predict": "POST - Predict credit score for a single user",
-            "/predict/batch": "POST - Predict credit scores for multiple users",
-            "/health": "GET - Health check"
+            "/api/credit-score/analyze": "POST - Predict credit score with SHAP explanation",
+            "/api/credit-score/predict": "POST - Predict credit score only (no explanation)",
+            "/api/credit-score/predict/batch": "POST - Predict credit scores for multiple users (JSON, Arrow IPC or Parquet)",
+            "/api/credit-score/predict/stream": "POST - Stream NDJSON in, stream NDJSON scores out",
+            "/api/credit-score/global": "GET - Global feature importance and partial dependence curves",
+            "/health": "GET - Health check",
+            "/metrics": "GET - Per-stage latency histograms (Prometheus text format)",
+            "/live": "GET - Liveness probe",
+            "/ready": "GET - Readiness probe (models loaded and warmed up)"
         }
     }
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    try:
-        predictor = get_predictor()
-        return {
-            "status": "healthy",
-            "model_loaded": predictor.model.model is not None
-        }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "error": str(e)
-        }
+    """Health check endpoint (never loads models itself)"""
+    return {
+        "status": "healthy" if startup_state["ready"] else "starting",
+        "model_loaded": startup_state["ready"],
+        "startup_ms": startup_state["timings"],
+        "inference_pool": inference_pool.stats(),
+        # Per-process cache; process-pool workers keep their own
+        "explanation_cache": predictor.explanation_cache.stats() if predictor is not None else None,
+        "latency_ms": METRICS.summary() if config.METRICS_ENABLED else None
+    }
+
+@app.get("/live")
+async def liveness():
+    """Liveness probe: the process is up and the event loop is serving"""
+    return {"status": "alive"}
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 503 until models are loaded and warmed up"""
+    if not startup_state["ready"]:
+        return JSONResponse(status_code=503, content={"status": "not ready"})
+    return {"status": "ready"}
 
 @app.post("/api/credit-score/analyze", response_model=PredictionResponse)
-async def analyze_credit_score(user_data: UserData):
+async def analyze_credit_score(user_data: UserData, mode: Optional[ExplanationMode] = None,
+                               top_k: int = Query(5, ge=1, le=20), fields: Optional[str] = None):
     """
     Analyze credit score for a user with SHAP explanations
     
+    `?mode=fast` uses path contributions instead of exact TreeSHAP: much
+    cheaper, same base value and total, approximate per-feature split.
+    `?top_k=3` limits the positive/negative factors; `?fields=a,b` returns
+    only those explanation keys (e.g. without the per-feature
+    `all_features` list), and the rest is never built.
+    
     Returns:
     - credit_score: Predicted score (300-900)
     - category: Risk category (Excellent, Good, Fair, Poor, Very Poor)
     - explanation: Detailed explanation with factors and recommendations
     """
+    # Body read and validated into UserData before this handler runs
+    since_request_start("validate")
+    try:
+        selected = resolve_fields([name.strip() for name in fields.split(",") if name.strip()] if fields else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
-        predictor = get_predictor()
-        
         # Convert Pydantic model to dict
         user_dict = user_data.dict(exclude_none=True)
         
         # Predict with explanation
-        result = predictor.predict_with_explanation(user_dict)
+        if config.BATCHING_ENABLED:
+            batcher = analyze_batchers[mode or config.EXPLANATION_MODE]
+            result = await batcher.submit((user_dict, top_k, selected))
+        else:
+            result = await inference_pool.run(
+                'predict_with_explanation', user_dict, mode=mode, top_k=top_k, fields=selected
+            )
         
-        return PredictionResponse(**result)
+        # Encoded as is: the payload is built by our own code, so re-validating
+        # it through PredictionResponse would only cost time
+        with stage("serialize"):
+            return ORJSONResponse(result)
     
+    except PoolOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
 @app.post("/api/credit-score/predict")
 async def predict_credit_score(user_data: UserData):
     """
-    Simple prediction without full explanation (faster)
+    Simple prediction without full explanation (faster, skips SHAP)
     """
+    since_request_start("validate")
     try:
-        predictor = get_predictor()
         user_dict = user_data.dict(exclude_none=True)
         
-        result = predictor.predict_with_explanation(user_dict)
+        if config.BATCHING_ENABLED:
+            result = await predict_batcher.submit(user_dict)
+        else:
+            result = await inference_pool.run('predict_score', user_dict)
         
         return {
             "score": result['credit_score'],
             "category": result['category']
         }
     
+    except PoolOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
-@app.post("/api/credit-score/predict/batch")
-async def predict_batch(request: BatchPredictionRequest):
+@app.post(
+    "/api/credit-score/predict/batch",
+    openapi_extra={"requestBody": {"content": {
+        "application/json": {"schema": BatchPredictionRequest.model_json_schema()},
+        **{media_type: {"schema": {"type": "string", "format": "binary"}} for media_type in COLUMNAR_MEDIA_TYPES}
+    }}}
+)
+async def predict_batch(request: Request, explain: bool = False, top_k: int = Query(5, ge=1, le=20),
+                        explain_mode: Optional[ExplanationMode] = None, id_column: str = "CUST_ID"):
     """
     Predict credit scores for multiple users
+    
+    JSON body: a BatchPredictionRequest. Set `explain` to also return top-k
+    SHAP factors for every user, computed in a single batched SHAP call.
+    
+    Arrow IPC or Parquet body (by Content-Type): one row per user, scored
+    column-wise; the response is a table in the same format (or the
+    columnar type named in Accept) with `id_column` (if present),
+    credit_score, category and - with `?explain=true` - top_positive /
+    top_negative factor lists.
     """
+    if body_format(request.headers.get("content-type")) is not None:
+        try:
+            content, media_type = await inference_pool.run(
+                'predict_columnar',
+                await request.body(),
+                request.headers.get("content-type"),
+                accept=request.headers.get("accept"),
+                explain=explain,
+                top_k=top_k,
+                mode=explain_mode,
+                id_column=id_column
+            )
+            return Response(content=content, media_type=media_type)
+        
+        except PoolOverloadedError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except ImportError:
+            raise HTTPException(status_code=415, detail="Columnar bodies need pyarrow installed on the server")
+        except ValueError as e:
+            # Malformed Arrow/Parquet (pyarrow.ArrowInvalid is a ValueError)
+            raise HTTPException(status_code=400, detail=f"Invalid columnar body: {str(e)}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Batch prediction error: {str(e)}")
+    
+    body = await request.body()
+    try:
+        with stage("validate"):
+            batch = BatchPredictionRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    
     try:
-        predictor = get_predictor()
-        result = predictor.predict_batch(request.users)
-        return result
+        result = await inference_pool.run(
+            'predict_batch',
+            batch.users,
+            explain=batch.explain,
+            top_k=batch.top_k,
+            mode=batch.explain_mode
+        )
+        with stage("serialize"):
+            return ORJSONResponse(result)
     
+    except PoolOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Batch prediction error: {str(e)}")
 
+@app.post("/api/credit-score/predict/stream")
+async def predict_stream(request: Request, explain: bool = False, top_k: int = Query(5, ge=1, le=20), chunk_size: Optional[int] = None,
+                         explain_mode: Optional[ExplanationMode] = None):
+    """
+    Score newline-delimited JSON (one user per line) as a stream
+    
+    The body is spooled to a temporary file as it arrives, then scored in
+    chunks of `chunk_size` rows; each chunk's results are streamed back as
+    NDJSON (`{"line": n, "credit_score": ..., "category": ...}`, or
+    `{"line": n, "error": ...}` for a bad row) before the next chunk is
+    parsed, so memory stays flat regardless of input size.
+    """
+    body = await spool_body(request.stream())
+    
+    def score_chunk(records, explain, top_k):
+        return inference_pool.run('predict_batch', records, explain=explain, top_k=top_k, mode=explain_mode)
+    
+    return StreamingResponse(
+        stream_scores(body, score_chunk, chunk_size=chunk_size, explain=explain, top_k=top_k),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/api/credit-score/global")
+async def get_global_explanation():
+    """
+    Model-wide view for dashboards
+    
+    Returns mean |SHAP| per feature over the training rows and partial
+    dependence curves (average score across a grid of raw feature values)
+    for the top features. Both are computed at train time and read from the
+    model bundle; nothing is scored per request.
+    """
+    try:
+        result = await inference_pool.run('get_global_explanation')
+    except PoolOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Model has no global explanation; retrain to create one")
+    with stage("serialize"):
+        return ORJSONResponse(result)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Latency histograms in Prometheus text format
+    
+    `ml_stage_duration_seconds{stage=...}` covers validate, queue,
+    transform, predict, shap, explain and serialize (plus parse for
+    columnar bodies); `ml_request_duration_seconds{path=...}` is the
+    end-to-end time per route. Per process: with serve.py, each worker
+    reports its own.
+    """
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (ML_METRICS_ENABLED=false)")
+    return PlainTextResponse(METRICS.prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/credit-score/current")
 async def get_current_score():
     """
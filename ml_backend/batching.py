@@ -0,0 +1,105 @@
+"""
+Request Micro-Batching Module - Coalesce concurrent requests into one model call
+"""
+import asyncio
+import contextvars
+import inspect
+import config
+
+
+class MicroBatcher:
+    """
+    Collect concurrent single-row requests and score them as one batch
+
+    Requests are queued on an asyncio queue and flushed when `max_batch_size`
+    items are waiting or `window_ms` has passed since the first one arrived.
+    `batch_fn` receives the list of payloads and must return (or resolve to,
+    if it is async) one result per payload, in order; each waiting request
+    gets its own result back. If a batch fails, it is split in half and
+    retried until the failing payloads are isolated, so only their requests
+    get the error.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=None, window_ms=None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size or config.BATCH_MAX_SIZE
+        self.window = (window_ms if window_ms is not None else config.BATCH_WINDOW_MS) / 1000.0
+        self._queue = None
+        self._task = None
+
+    def _ensure_started(self):
+        """Start the flush loop on the running event loop (first use)"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            # The flush loop outlives the request that starts it, so it runs in
+            # a fresh context rather than inheriting that request's state
+            loop = asyncio.get_running_loop()
+            self._task = contextvars.Context().run(loop.create_task, self._run())
+
+    async def submit(self, payload):
+        """Queue one payload and wait for its result"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((payload, future))
+        return await future
+
+    async def _collect(self):
+        """Wait for one item, then gather more until the size or time window closes"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+
+        while len(batch) < self.max_batch_size:
+            # Drain whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        """Flush loop: collect, score once, fan results back out"""
+        while True:
+            batch = await self._collect()
+            outcomes = await self._score_isolated([payload for payload, _ in batch])
+            for (_, future), (error, result) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    async def _score_isolated(self, payloads):
+        """(error, result) per payload, bisecting failed batches down to the bad payloads"""
+        try:
+            return [(None, result) for result in await self._score(payloads)]
+        except Exception as e:
+            if len(payloads) == 1:
+                return [(e, None)]
+        middle = len(payloads) // 2
+        return await self._score_isolated(payloads[:middle]) + await self._score_isolated(payloads[middle:])
+
+    async def _score(self, payloads):
+        """Run the batch function for one flushed batch"""
+        results = self.batch_fn(payloads)
+        if inspect.isawaitable(results):
+            results = await results
+        return results
+
+    async def stop(self):
+        """Cancel the flush loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
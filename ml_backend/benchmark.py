@@ -0,0 +1,401 @@
+"""
+Offline Benchmarks - timing and parity checks for the ML pipeline
+
+Kept out of the library modules so none of them depends on the API server
+or on benchmark-only helpers. Each subcommand loads what it measures:
+
+    python benchmark.py engines --rows 1000 100000 1000000
+    python benchmark.py tree-engine
+    python benchmark.py data-load path/to/extract.csv
+    python benchmark.py preprocess path/to/extract.csv --chunk-size 100000
+    python benchmark.py payloads
+    python benchmark.py columnar --rows 1000 10000 100000
+    python benchmark.py fidelity --output output/explanation_fidelity.json
+    python benchmark.py metrics
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import config
+from data_loader import DataLoader, frame_memory_mb
+from model_trainer import ESTIMATORS, CreditScoreModel
+from preprocessor import DataPreprocessor
+from shap_explainer import SHAPExplainer
+
+
+def synthetic_frame(df, n_rows, seed=config.RANDOM_STATE):
+    """
+    Synthetic dataset of n_rows shaped like df
+
+    Rows are resampled with replacement and every numeric column is scaled
+    by multiplicative noise (about 10%), so values do not simply repeat.
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(df), n_rows)
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy()[rows]
+        if col == 'CUST_ID':
+            values = np.arange(n_rows)
+        elif col != 'DEFAULT' and pd.api.types.is_numeric_dtype(df[col]):
+            noisy = values * rng.lognormal(0.0, 0.1, n_rows)
+            values = np.rint(noisy).astype(values.dtype) if pd.api.types.is_integer_dtype(df[col]) else noisy.astype(values.dtype)
+        columns[col] = values
+    return pd.DataFrame(columns)
+
+
+def median_ms(fn, repeat):
+    """Median wall time of `repeat` calls, ms"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def load_predictor():
+    from predict import CreditScorePredictor
+    predictor = CreditScorePredictor()
+    predictor.load_models()
+    return predictor
+
+
+def engines(args):
+    """Training time, inference latency and accuracy of 'gbr' vs 'hist' on synthetic datasets of increasing size"""
+    loader = DataLoader()
+    base = loader.load_data()
+    feature_cols = loader.get_features_for_modeling()
+
+    results = []
+    for n_rows in args.rows:
+        df = synthetic_frame(base, n_rows)
+        model = CreditScoreModel()
+        y = model.create_synthetic_target(df)
+        X = model.fit_preprocessor(df, feature_cols)
+        del df
+        train_idx, test_idx = model.split_indices(len(X))
+        X_test = X.iloc[test_idx].to_numpy()
+
+        for engine in ESTIMATORS:
+            if engine == 'gbr' and n_rows > args.gbr_max_rows:
+                print(f"\n⏭️  Skipping gbr at {n_rows:,} rows (--gbr-max-rows {args.gbr_max_rows:,})")
+                continue
+            metrics = model.fit(X, y, train_idx, test_idx, engine=engine)
+
+            # Single row through the flat engine, 10k-row batch through the estimator
+            batch = X_test[:10_000]
+            single_ms = median_ms(lambda: model.predict_processed(X_test[:1]), 200)
+            batch_ms = median_ms(lambda: model.predict_processed(batch), 5)
+
+            # TreeSHAP straight from the exported flat arrays
+            explainer = SHAPExplainer(model.engine, None, feature_cols)
+            explainer.create_explainer(None, explainer_type='tree')
+            shap_rows = X_test[:100]
+            shap_values = explainer.explain_batch(shap_rows)
+            additivity = np.abs(
+                shap_values.sum(axis=1) + explainer.explainer.expected_value - model.engine.predict(shap_rows)
+            ).max()
+            shap_ms = median_ms(lambda: explainer.explain_batch(shap_rows[:1]), 20)
+
+            results.append((n_rows, engine, metrics['fit_seconds'], single_ms, len(batch) / batch_ms * 1000,
+                            shap_ms, metrics['test_rmse'], metrics['test_r2'], additivity))
+        del X, X_test
+
+    print(f"\n📊 Engine benchmark ({os.cpu_count()} CPU)")
+    print(f"   {'rows':>9s} {'engine':6s} {'fit (s)':>8s} {'1 row (ms)':>10s} {'rows/s':>10s} "
+          f"{'SHAP 1 row (ms)':>15s} {'RMSE':>7s} {'R²':>7s} {'SHAP add.':>9s}")
+    for n_rows, engine, fit_s, single_ms, rows_per_s, shap_ms, rmse, r2, additivity in results:
+        print(f"   {n_rows:9,d} {engine:6s} {fit_s:8.2f} {single_ms:10.3f} {rows_per_s:10,.0f} "
+              f"{shap_ms:15.3f} {rmse:7.2f} {r2:7.4f} {additivity:9.1e}")
+
+
+def tree_engine(args):
+    """Flat engine parity and timing against a freshly trained model"""
+    from tree_engine import FlatTreeEnsemble, sklearn_predict
+
+    loader = DataLoader()
+    df = loader.load_data()
+    model = CreditScoreModel()
+    model.train(df, loader.get_features_for_modeling())
+    X = model.pipeline.transform_frame(df)
+    engine = FlatTreeEnsemble.from_sklearn(model.model)
+
+    max_diff = engine.check_parity(model.model, X)
+    print(f"\n✅ Flat engine matches sklearn on {len(X)} rows (max diff {max_diff:g})")
+
+    for label, fn in [("sklearn", lambda rows: sklearn_predict(model.model, rows)), ("flat", engine.predict)]:
+        for rows in (1, len(X)):
+            start = time.perf_counter()
+            for _ in range(50):
+                fn(X[:rows])
+            print(f"   {label:8s} {rows:5d} rows: {(time.perf_counter() - start) / 50 * 1000:.3f} ms")
+
+
+def data_load(args):
+    """Load time and memory: raw CSV vs columnar cache (first build and reuse)"""
+    start = time.perf_counter()
+    raw = pd.read_csv(args.csv)
+    raw_seconds = time.perf_counter() - start
+    raw_mb = frame_memory_mb(raw)
+    del raw
+
+    loader = DataLoader(args.csv, use_cache=True)
+    cache_path = loader.cache_path()
+    if cache_path.exists():
+        cache_path.unlink()
+    loader.load_data()
+    build = loader.load_stats
+    loader.load_data()
+    cached = loader.load_stats
+
+    print(f"\n📊 Dataset load ({len(loader.df):,} rows, cache file {cache_path.stat().st_size / 1e6:.1f} MB)")
+    print(f"   {'raw CSV':14s} {raw_seconds * 1000:9.0f} ms {raw_mb:9.1f} MB")
+    print(f"   {'cache build':14s} {build['seconds'] * 1000:9.0f} ms {build['memory_mb']:9.1f} MB")
+    print(f"   {'cache load':14s} {cached['seconds'] * 1000:9.0f} ms {cached['memory_mb']:9.1f} MB")
+
+
+def preprocess(args):
+    """Streaming (chunked) preprocessor fit vs in-memory fit: time, memory and differences"""
+    loader = DataLoader(args.csv, use_cache=False)
+    exclude = {'CUST_ID', 'CREDIT_SCORE', 'DEFAULT'}
+    feature_cols = [col for col in pd.read_csv(args.csv, nrows=0).columns if col not in exclude]
+
+    def measure(fn):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        return result, seconds, peak
+
+    streamed, stream_s, stream_mb = measure(
+        lambda: DataPreprocessor().fit_stream(loader.iter_chunks(args.chunk_size), feature_cols)
+    )
+    print(f"\n🌊 Streaming fit: {stream_s:.2f} s, peak {stream_mb:.0f} MB "
+          f"({int(streamed.scaler.n_samples_seen_):,} rows, chunks of {args.chunk_size:,})")
+    if args.stream_only:
+        return
+
+    df = loader.load_data()
+    in_memory = DataPreprocessor()
+    _, memory_s, memory_mb = measure(lambda: in_memory.fit_transform(df, feature_cols))
+    print(f"💾 In-memory fit: {memory_s:.2f} s, peak {memory_mb:.0f} MB (excluding the loaded frame)")
+
+    # Medians: rank of the sketch median among the data, and the value gap in std units
+    numeric_cols = list(in_memory.imputer.feature_names_in_)
+    # Compared at float32 precision: the chunks are downcast, the frame may not be
+    values = df[numeric_cols].to_numpy(dtype=np.float32)
+    sketch_medians = streamed.imputer.statistics_.astype(np.float32)
+    below = (values < sketch_medians).sum(axis=0)
+    at_or_below = (values <= sketch_medians).sum(axis=0)
+    half = np.sum(~np.isnan(values), axis=0) / 2
+    rank_error = np.maximum(0, np.maximum(below - half, half - at_or_below)) / len(values)
+    median_gap = np.abs(sketch_medians - in_memory.imputer.statistics_) / in_memory.scaler.scale_
+    mean_diff = np.abs(streamed.scaler.mean_ - in_memory.scaler.mean_) / in_memory.scaler.scale_
+    scale_diff = np.abs(streamed.scaler.scale_ / in_memory.scaler.scale_ - 1)
+    same_classes = all(
+        list(streamed.label_encoders[col].classes_) == list(le.classes_)
+        for col, le in in_memory.label_encoders.items()
+    )
+    sample = df.head(10_000)
+    output_diff = np.abs(streamed.compile().transform_frame(sample) - in_memory.compile().transform_frame(sample)).max()
+
+    print(f"   median rank error:      max {rank_error.max():.5f} of rows")
+    print(f"   median value gap:       max {median_gap.max():.2e} std")
+    print(f"   scaler mean difference: max {mean_diff.max():.2e} std")
+    print(f"   scaler scale ratio:     max |ratio - 1| {scale_diff.max():.2e}")
+    print(f"   label encoder classes:  {'identical' if same_classes else 'DIFFERENT'}")
+    print(f"   transformed output:     max abs diff {output_diff:.2e}")
+
+
+def payloads(args):
+    """
+    Payload size and build/encode time: the old path (full payload,
+    re-validated by the response model, stdlib JSON) against shaped
+    payloads encoded with orjson
+    """
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from api_server import PredictionResponse
+    from explanation_generator import EXPLANATION_FIELDS
+
+    predictor = load_predictor()
+    records = predictor.model.pipeline.synthetic_records(args.rows, random_state=config.RANDOM_STATE)
+    X = predictor.model.pipeline.transform_records(records)
+    scores = predictor.model.predict_processed(X)
+    shap_matrix = predictor.explainer.explain_batch(X)
+
+    def old_encode(result):
+        return JSONResponse(jsonable_encoder(PredictionResponse(**result))).body
+
+    def new_encode(result):
+        return ORJSONResponse(result).body
+
+    shapes = [
+        ("full payload, response model + json", 5, None, old_encode),
+        ("full payload, orjson", 5, None, new_encode),
+        ("without all_features, orjson", 5, [name for name in EXPLANATION_FIELDS if name != 'all_features'], new_encode),
+        ("top_k=3 factors only, orjson", 3, ['positive_factors', 'negative_factors', 'mode'], new_encode),
+    ]
+
+    def per_row_ms(fn, repeat=5):
+        # Median over a few passes (the first pass also pays for heap growth)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = fn()
+            timings.append((time.perf_counter() - start) / len(records) * 1000)
+        return output, float(np.median(timings))
+
+    print(f"\n📦 Explanation payloads ({len(records)} rows, exact SHAP computed once up front)")
+    for label, top_k, fields, encode in shapes:
+        results, build_ms = per_row_ms(lambda: [
+            predictor._build_result(row, record, int(score), 'exact', top_k, fields)
+            for row, record, score in zip(shap_matrix, records, scores)
+        ])
+        bodies, encode_ms = per_row_ms(lambda: [encode(result) for result in results])
+        size = sum(len(body) for body in bodies) / len(bodies)
+        print(f"   {label:<38} {size / 1024:6.1f} KB  build {build_ms:.3f} ms  encode {encode_ms:.3f} ms")
+
+
+def columnar(args):
+    """JSON vs Arrow vs Parquet batch bodies: size and server-side time"""
+    import orjson
+    import pyarrow as pa
+    from fastapi.responses import ORJSONResponse
+    from columnar import read_table, score_table, write_table
+
+    predictor = load_predictor()
+    source = pd.read_csv(config.CSV_FILE_PATH)
+
+    def timed(fn, repeat=3):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = fn()
+            timings.append(time.perf_counter() - start)
+        return output, min(timings)
+
+    print(f"\n{'Rows':>7}  {'Format':<8} {'Request':>10} {'Response':>10} {'Server time':>12} {'Rows/s':>10}")
+    for n_rows in args.rows:
+        df = synthetic_frame(source, n_rows, seed=n_rows).drop(columns=['CREDIT_SCORE', 'DEFAULT'], errors='ignore')
+
+        # JSON: what the endpoint does with a BatchPredictionRequest body
+        json_body = orjson.dumps({'users': df.to_dict('records')}, option=orjson.OPT_SERIALIZE_NUMPY)
+        response, seconds = timed(lambda: ORJSONResponse(
+            predictor.predict_batch(orjson.loads(json_body)['users'])
+        ).body)
+        print(f"{n_rows:>7}  {'json':<8} {len(json_body) / 1e6:>8.2f}MB {len(response) / 1e6:>8.2f}MB "
+              f"{seconds * 1000:>10.1f}ms {n_rows / seconds:>10,.0f}")
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        for fmt in ('arrow', 'parquet'):
+            body = write_table(table, fmt)
+            response, seconds = timed(lambda: write_table(score_table(predictor, read_table(body, fmt)), fmt))
+            print(f"{n_rows:>7}  {fmt:<8} {len(body) / 1e6:>8.2f}MB {len(response) / 1e6:>8.2f}MB "
+                  f"{seconds * 1000:>10.1f}ms {n_rows / seconds:>10,.0f}")
+
+
+def fidelity(args):
+    """Fast vs exact explanations on the training rows"""
+    model = CreditScoreModel()
+    model.load_bundle(config.MODEL_BUNDLE_PATH)
+    explainer = SHAPExplainer(model.engine, None, model.feature_names)
+    explainer.create_explainer(None, explainer_type='tree')
+
+    df = DataLoader().load_data()
+    X = model.pipeline.transform_frame(df)
+    train_idx, _ = model.split_indices(len(X))
+    if args.rows and args.rows < len(train_idx):
+        train_idx = np.random.default_rng(config.RANDOM_STATE).choice(train_idx, args.rows, replace=False)
+
+    report = explainer.fidelity_report(X[train_idx])
+    print(f"\n📏 Fast vs exact explanations on {report['rows']} training rows")
+    print(f"   exact {report['exact_ms_per_row']:.3f} ms/row, fast {report['fast_ms_per_row']:.3f} ms/row "
+          f"({report['exact_ms_per_row'] / report['fast_ms_per_row']:.1f}x)")
+    print(f"   |attribution| moved between features: {report['relative_l1_difference']:.1%}")
+    for k, agreement in report['top_k'].items():
+        print(f"   top-{k}: overlap {agreement['overlap']:.1%}, same ranking {agreement['same_ranking']:.1%}, "
+              f"same factors {agreement['same_factors']:.1%}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report saved to {args.output}")
+
+
+def metrics(args):
+    """Overhead of a timed stage against an empty block"""
+    from metrics import REGISTRY, begin, end, stage
+
+    def loop(timed):
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            with timed('bench'):
+                pass
+        return (time.perf_counter() - start) / args.iterations * 1e6
+
+    config.METRICS_ENABLED = False
+    disabled = loop(stage)
+    config.METRICS_ENABLED = True
+    enabled = loop(stage)
+    token = begin()
+    in_request = loop(stage)
+    end(token)
+
+    print(f"⏱️  Stage timer overhead per block: disabled {disabled:.3f} µs, "
+          f"enabled {enabled:.3f} µs, enabled inside a request {in_request:.3f} µs")
+    print(REGISTRY.summary())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the ML pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("engines", help=engines.__doc__)
+    command.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    command.add_argument("--gbr-max-rows", type=int, default=100_000,
+                         help="Skip GradientBoostingRegressor above this size (it is single-threaded and slow)")
+    command.set_defaults(run=engines)
+
+    command = commands.add_parser("tree-engine", help=tree_engine.__doc__)
+    command.set_defaults(run=tree_engine)
+
+    command = commands.add_parser("data-load", help=data_load.__doc__)
+    command.add_argument("csv", nargs="?", default=str(config.CSV_FILE_PATH))
+    command.set_defaults(run=data_load)
+
+    command = commands.add_parser("preprocess", help=preprocess.__doc__)
+    command.add_argument("csv", nargs="?", default=str(config.CSV_FILE_PATH))
+    command.add_argument("--chunk-size", type=int, default=config.PREPROCESS_CHUNK_SIZE)
+    command.add_argument("--stream-only", action="store_true", help="Skip the in-memory fit (data larger than RAM)")
+    command.set_defaults(run=preprocess)
+
+    command = commands.add_parser("payloads", help="Explanation payload size and build/encode time")
+    command.add_argument("--rows", type=int, default=200)
+    command.set_defaults(run=payloads)
+
+    command = commands.add_parser("columnar", help=columnar.__doc__)
+    command.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    command.set_defaults(run=columnar)
+
+    command = commands.add_parser("fidelity", help="Compare fast and exact explanations on the training data")
+    command.add_argument("--rows", type=int, default=None, help="Sample this many training rows")
+    command.add_argument("--output", default=None, help="Also write the report as JSON")
+    command.set_defaults(run=fidelity)
+
+    command = commands.add_parser("metrics", help="Measure stage timer overhead")
+    command.add_argument("--iterations", type=int, default=200000)
+    command.set_defaults(run=metrics)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
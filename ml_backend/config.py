@@ -18,12 +18,70 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 # Dataset
 CSV_FILE_PATH = BASE_DIR.parent / "public" / "credit_score.csv"
 
+# Trained model bundle (single memory-mappable file, see model_bundle.py)
+MODEL_BUNDLE_PATH = MODELS_DIR / "credit_score_model.bundle"
+
+# Columnar dataset cache: DataLoader stores the parsed CSV as typed column
+# arrays (float32/int32, categorical codes) keyed by the source fingerprint
+DATA_CACHE_ENABLED = os.getenv("ML_DATA_CACHE", "true").lower() == "true"
+DATA_CACHE_DIR = DATA_DIR / "cache"
+DATA_CACHE_DOWNCAST = os.getenv("ML_DATA_CACHE_DOWNCAST", "true").lower() == "true"
+
+# Out-of-core preprocessor fit (DataPreprocessor.fit_stream): rows per chunk
+# and quantile sketch size for the medians (rank error about 1/k)
+PREPROCESS_CHUNK_SIZE = int(os.getenv("ML_PREPROCESS_CHUNK_SIZE", "100000"))
+PREPROCESS_SKETCH_K = int(os.getenv("ML_PREPROCESS_SKETCH_K", "1024"))
+
+# Training pipeline stage cache: stage outputs keyed by their inputs and
+# config, so re-runs skip unchanged stages (see stage_cache.py)
+PIPELINE_CACHE_ENABLED = os.getenv("ML_PIPELINE_CACHE", "true").lower() == "true"
+PIPELINE_CACHE_DIR = DATA_CACHE_DIR / "pipeline"
+# Per-stage peak memory via tracemalloc; off by default because tracing
+# slows every allocation and inflates the stage timings
+PIPELINE_TRACE_MEMORY = os.getenv("ML_PIPELINE_TRACE_MEMORY", "false").lower() == "true"
+
 # Model parameters
 CREDIT_SCORE_MIN = 300
 CREDIT_SCORE_MAX = 900
 TEST_SIZE = 0.2
 RANDOM_STATE = 42
 
+# Boosting estimator: 'gbr' (GradientBoostingRegressor, exact splits, single
+# thread) or 'hist' (HistGradientBoostingRegressor, binned features,
+# multithreaded; much faster on large datasets)
+MODEL_ENGINE = os.getenv("ML_MODEL_ENGINE", "gbr")
+
+# Hyperparameter tuning (tuning.py): successive halving over random
+# candidates on a process pool. Candidates are ranked by validation RMSE +
+# TUNE_LATENCY_WEIGHT * single-row latency (ms); the chosen parameters and
+# timings are written to TUNING_REPORT_PATH.
+TUNE_ENABLED = os.getenv("ML_TUNE", "false").lower() == "true"
+TUNE_CANDIDATES = int(os.getenv("ML_TUNE_CANDIDATES", "16"))
+TUNE_FACTOR = int(os.getenv("ML_TUNE_FACTOR", "3"))
+TUNE_MIN_ROWS = int(os.getenv("ML_TUNE_MIN_ROWS", "200"))
+TUNE_LATENCY_WEIGHT = float(os.getenv("ML_TUNE_LATENCY_WEIGHT", "10"))
+TUNE_WORKERS = int(os.getenv("ML_TUNE_WORKERS", str(os.cpu_count() or 1)))
+TUNING_REPORT_PATH = MODELS_DIR / "tuning.json"
+
+# Global explanation stored in the bundle (global_explanations.py): mean
+# |SHAP| over up to GLOBAL_EXPLANATION_ROWS training rows (0 = all) and
+# partial dependence curves for the top GLOBAL_PDP_FEATURES features
+GLOBAL_EXPLANATION_ROWS = int(os.getenv("ML_GLOBAL_EXPLANATION_ROWS", "10000"))
+GLOBAL_PDP_FEATURES = int(os.getenv("ML_GLOBAL_PDP_FEATURES", "10"))
+GLOBAL_PDP_GRID_POINTS = int(os.getenv("ML_GLOBAL_PDP_GRID_POINTS", "20"))
+GLOBAL_PDP_BACKGROUND_ROWS = int(os.getenv("ML_GLOBAL_PDP_BACKGROUND_ROWS", "200"))
+
+# Incremental retraining (incremental.py): rows appended to the CSV since the
+# last training snapshot get INCREMENTAL_ESTIMATORS warm-started trees; a
+# drift score above INCREMENTAL_DRIFT_THRESHOLD, or more added rows than
+# INCREMENTAL_MAX_GROWTH x the last full fit, triggers a full refit instead
+TRAINING_SNAPSHOT_PATH = MODELS_DIR / "training_snapshot.joblib"
+INCREMENTAL_ESTIMATORS = int(os.getenv("ML_INCREMENTAL_ESTIMATORS", "10"))
+INCREMENTAL_MIN_ROWS = int(os.getenv("ML_INCREMENTAL_MIN_ROWS", "50"))
+INCREMENTAL_DRIFT_THRESHOLD = float(os.getenv("ML_INCREMENTAL_DRIFT_THRESHOLD", "0.2"))
+INCREMENTAL_MAX_GROWTH = float(os.getenv("ML_INCREMENTAL_MAX_GROWTH", "1.0"))
+INCREMENTAL_REFERENCE_ROWS = 2000  # held-out rows kept to check each update
+
 # User categories based on credit score
 CREDIT_CATEGORIES = {
     "Excellent": (750, 900),
@@ -33,3 +91,77 @@ CREDIT_CATEGORIES = {
     "Very Poor": (300, 599)
 }
 
+# Request micro-batching (API server)
+# Concurrent single-user requests are coalesced into one model/SHAP call,
+# flushed when BATCH_MAX_SIZE rows are queued or BATCH_WINDOW_MS elapses.
+BATCHING_ENABLED = os.getenv("ML_BATCHING_ENABLED", "false").lower() == "true"
+BATCH_MAX_SIZE = int(os.getenv("ML_BATCH_MAX_SIZE", "32"))
+BATCH_WINDOW_MS = float(os.getenv("ML_BATCH_WINDOW_MS", "2"))
+
+# Inference executor (API server)
+# 'thread' shares the loaded model across a thread pool, 'process' preloads
+# the model in every worker process, 'inline' runs on the event loop.
+INFERENCE_EXECUTOR = os.getenv("ML_INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.getenv("ML_INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_MAX_QUEUE = int(os.getenv("ML_INFERENCE_MAX_QUEUE", "256"))  # 0 = unbounded
+
+# Startup warm-up: synthetic rows pushed through predict/explain before the
+# server reports ready (0 disables warm-up)
+WARMUP_ROWS = int(os.getenv("ML_WARMUP_ROWS", "8"))
+
+# Tree inference engine: 'flat' evaluates the exported tree arrays with NumPy,
+# 'sklearn' always uses the estimator's own predict(). Batches larger than
+# TREE_ENGINE_MAX_ROWS go to sklearn, whose compiled loop wins at that size.
+# Bundle-loaded models have no estimator; they use sklearn tree predictors
+# rebuilt from the bundle arrays (tree_engine.CompiledTreeEnsemble).
+TREE_ENGINE = os.getenv("ML_TREE_ENGINE", "flat")
+TREE_ENGINE_MAX_ROWS = int(os.getenv("ML_TREE_ENGINE_MAX_ROWS", "256"))
+
+# Default explanation mode: 'exact' runs TreeSHAP, 'fast' uses path
+# contributions from the flat trees (~20x cheaper; same base value and sum,
+# approximate per-feature split). Requests can override it.
+EXPLANATION_MODE = os.getenv("ML_EXPLANATION_MODE", "exact")
+
+# Explanation keys returned by /analyze when a request does not pick its own
+# (comma-separated names from explanation_generator.EXPLANATION_FIELDS; empty
+# = all, including the per-feature all_features list)
+EXPLANATION_FIELDS = [name for name in os.getenv("ML_EXPLANATION_FIELDS", "").split(",") if name]
+
+# Explanation cache: LRU of model outputs (score and SHAP row) keyed by the
+# processed feature vector, explanation mode and model fingerprint; payloads
+# are rebuilt from each request's own values (size 0 disables, TTL in seconds)
+EXPLANATION_CACHE_SIZE = int(os.getenv("ML_EXPLANATION_CACHE_SIZE", "1024"))
+EXPLANATION_CACHE_TTL = float(os.getenv("ML_EXPLANATION_CACHE_TTL", "300"))
+
+# Latency metrics (API server): per-stage timers aggregated into fixed-bucket
+# histograms, served as Prometheus text at /metrics and per request in a
+# Server-Timing header. METRICS_ENABLED=false turns all of it off.
+METRICS_ENABLED = os.getenv("ML_METRICS_ENABLED", "true").lower() == "true"
+METRICS_SERVER_TIMING = os.getenv("ML_METRICS_SERVER_TIMING", "true").lower() == "true"
+METRICS_BUCKETS_MS = [float(b) for b in os.getenv(
+    "ML_METRICS_BUCKETS_MS", "0.05,0.1,0.25,0.5,1,2.5,5,10,25,50,100,250,500,1000,2500,5000,10000"
+).split(",")]
+
+# Pre-fork production server (serve.py)
+SERVE_HOST = os.getenv("ML_SERVE_HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("ML_SERVE_PORT", "8000"))
+SERVE_WORKERS = int(os.getenv("ML_SERVE_WORKERS", str(os.cpu_count() or 1)))
+SERVE_MAX_REQUESTS = int(os.getenv("ML_SERVE_MAX_REQUESTS", "0"))  # recycle a worker after N requests (0 = never)
+SERVE_MAX_REQUESTS_JITTER = int(os.getenv("ML_SERVE_MAX_REQUESTS_JITTER", "0"))
+SERVE_MEMORY_REPORT_INTERVAL = float(os.getenv("ML_SERVE_MEMORY_REPORT_INTERVAL", "0"))  # seconds (0 = off)
+# Crashed workers are re-forked after SERVE_RESPAWN_BACKOFF seconds, doubled
+# per crash in the last minute (capped at 30 s); more than SERVE_MAX_CRASHES
+# crashes in a minute shuts the server down (0 = never give up)
+SERVE_MAX_CRASHES = int(os.getenv("ML_SERVE_MAX_CRASHES", "5"))
+SERVE_RESPAWN_BACKOFF = float(os.getenv("ML_SERVE_RESPAWN_BACKOFF", "1"))
+
+# Streaming NDJSON batch scoring: rows scored per model call, the longest
+# input line accepted (bounds memory when a newline never arrives) and the
+# request body size kept in memory before spooling to a temporary file
+STREAM_CHUNK_SIZE = int(os.getenv("ML_STREAM_CHUNK_SIZE", "1000"))
+STREAM_MAX_LINE_BYTES = int(os.getenv("ML_STREAM_MAX_LINE_BYTES", str(1 << 20)))
+STREAM_SPOOL_MEMORY_BYTES = int(os.getenv("ML_STREAM_SPOOL_MEMORY_BYTES", str(8 << 20)))
+
+# Offline bulk scoring CLI (score.py): rows per chunk and worker processes
+SCORE_CHUNK_SIZE = int(os.getenv("ML_SCORE_CHUNK_SIZE", "10000"))
+SCORE_WORKERS = int(os.getenv("ML_SCORE_WORKERS", str(os.cpu_count() or 1)))
@@ -1,29 +1,197 @@
 """
 Data Loading and Feature Type Inference Module
 """
+import hashlib
+import os
+import time
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import config
+from model_bundle import BundleError, load_bundle, save_bundle
+
+# Bytes hashed from each end of the source file for its fingerprint
+FINGERPRINT_SAMPLE_BYTES = 1 << 20
+
+
+def fingerprint_source(path):
+    """
+    Cheap fingerprint of a (possibly very large) source file
+
+    Combines size and modification time with a hash of the first and last
+    megabyte, so edits, appends and replacements change it without reading
+    the whole file.
+    """
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if stat.st_size > FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(stat.st_size - FINGERPRINT_SAMPLE_BYTES, FINGERPRINT_SAMPLE_BYTES))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def downcast_frame(df):
+    """
+    Compact dtypes: float64 -> float32, int64 -> int32 (when in range),
+    strings -> categorical
+    """
+    int32 = np.iinfo(np.int32)
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_float_dtype(series):
+            series = series.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(series) and len(series) and \
+                int32.min <= series.min() and series.max() <= int32.max:
+            series = series.astype(np.int32)
+        elif series.dtype == object:
+            series = series.astype('category')
+        columns[col] = series
+    return pd.DataFrame(columns)
+
+
+def row_to_record(row):
+    """
+    Convert a DataFrame row to a dict of plain Python values
+
+    float32 values go through their shortest string form, so a CSV value of 7.8
+    comes back as 7.8 rather than 7.800000190734863.
+    """
+    record = {}
+    for key, value in row.items():
+        if isinstance(value, np.floating):
+            value = float(str(value)) if value.dtype == np.float32 else value.item()
+        elif isinstance(value, np.generic):
+            value = value.item()
+        record[key] = value
+    return record
+
+
+def frame_memory_mb(df):
+    """Deep memory usage of a DataFrame in MB"""
+    return df.memory_usage(deep=True).sum() / 1e6
+
 
 class DataLoader:
     """Load and infer feature types from credit score dataset"""
     
-    def __init__(self, csv_path=None):
+    def __init__(self, csv_path=None, use_cache=None):
         self.csv_path = csv_path or config.CSV_FILE_PATH
+        self.use_cache = config.DATA_CACHE_ENABLED if use_cache is None else use_cache
         self.df = None
         self.feature_types = {}
+        self.load_stats = {}
         
     def load_data(self):
-        """Load CSV data"""
+        """Load the dataset, from the columnar cache when it is current"""
         try:
-            self.df = pd.read_csv(self.csv_path)
-            print(f"✅ Loaded {len(self.df)} records with {len(self.df.columns)} columns")
+            start = time.perf_counter()
+            source = 'csv'
+            if self.use_cache:
+                cache_path = self.cache_path()
+                if cache_path.exists():
+                    try:
+                        self.df = self._read_cache(cache_path)
+                        source = 'cache'
+                    except (BundleError, OSError, ValueError, KeyError) as e:
+                        print(f"⚠️  Ignoring unreadable dataset cache {cache_path.name}: {e}")
+                if source == 'csv':
+                    self.df = self._build_cache(cache_path)
+            else:
+                self.df = pd.read_csv(self.csv_path)
+            
+            self.load_stats = {
+                'source': source,
+                'seconds': time.perf_counter() - start,
+                'memory_mb': frame_memory_mb(self.df)
+            }
+            print(f"✅ Loaded {len(self.df)} records with {len(self.df.columns)} columns "
+                  f"(from {source}, {self.load_stats['seconds'] * 1000:.0f} ms, {self.load_stats['memory_mb']:.1f} MB)")
             return self.df
         except Exception as e:
             print(f"❌ Error loading data: {e}")
             raise
     
+    def iter_chunks(self, chunk_size=None):
+        """
+        Read the CSV in chunks of rows (dtypes as load_data() would give)
+        
+        For datasets too large to load at once; the columnar cache is not used.
+        """
+        for chunk in pd.read_csv(self.csv_path, chunksize=chunk_size or config.PREPROCESS_CHUNK_SIZE):
+            yield downcast_frame(chunk) if config.DATA_CACHE_DOWNCAST else chunk
+    
+    def _cache_prefix(self):
+        """Cache name prefix unique to the source file: stem plus a hash of its resolved path"""
+        csv_path = Path(self.csv_path).resolve()
+        path_hash = hashlib.blake2b(str(csv_path).encode(), digest_size=6).hexdigest()
+        return f"{csv_path.stem}-{path_hash}-"
+    
+    def cache_path(self):
+        """Cache file for the current version of the source CSV"""
+        return Path(config.DATA_CACHE_DIR) / f"{self._cache_prefix()}{fingerprint_source(self.csv_path)}.bundle"
+    
+    def _build_cache(self, cache_path):
+        """Parse the CSV, downcast it and write the columnar cache"""
+        df = pd.read_csv(self.csv_path)
+        if config.DATA_CACHE_DOWNCAST:
+            df = downcast_frame(df)
+        
+        arrays = {}
+        columns = []
+        for col in df.columns:
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                labels = series.cat.categories.astype(str)
+                arrays[f"{col}.codes"] = series.cat.codes.to_numpy()
+                arrays[f"{col}.categories"] = np.array(labels.str.encode('utf-8').tolist(), dtype=bytes)
+                columns.append({'name': col, 'kind': 'categorical'})
+            elif series.dtype == object:
+                # Mixed/string column kept as-is (downcasting disabled)
+                arrays[f"{col}.codes"], uniques = pd.factorize(series)
+                arrays[f"{col}.categories"] = np.array([str(u).encode('utf-8') for u in uniques], dtype=bytes)
+                columns.append({'name': col, 'kind': 'object'})
+            else:
+                arrays[col] = series.to_numpy()
+                columns.append({'name': col, 'kind': 'numeric'})
+        
+        # Drop caches of older versions of this same file (other sources have
+        # their own path hash), then write the new one; save_bundle goes
+        # through a uniquely named temporary file, so concurrent builders do
+        # not collide
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        for stale in cache_path.parent.glob(f"{self._cache_prefix()}*.bundle"):
+            if stale != cache_path:
+                stale.unlink(missing_ok=True)
+        save_bundle(cache_path, arrays, {'source': str(self.csv_path), 'columns': columns})
+        print(f"💾 Dataset cache written to {cache_path}")
+        return df
+    
+    def _read_cache(self, cache_path):
+        """Rebuild the DataFrame from the columnar cache"""
+        # The fingerprint already ties the cache to its source; skip the
+        # full-data checksum pass to keep loads fast
+        arrays, manifest = load_bundle(cache_path, verify=False)
+        columns = {}
+        for column in manifest['metadata']['columns']:
+            name = column['name']
+            if column['kind'] == 'numeric':
+                columns[name] = arrays[name]
+            else:
+                labels = np.char.decode(arrays[f"{name}.categories"], 'utf-8').astype(object)
+                codes = np.asarray(arrays[f"{name}.codes"])
+                if column['kind'] == 'categorical':
+                    columns[name] = pd.Categorical.from_codes(codes, labels)
+                else:
+                    values = labels[np.maximum(codes, 0)]
+                    values[codes < 0] = np.nan
+                    columns[name] = values
+        # DataFrame construction copies the columns out of the memory map
+        return pd.DataFrame(columns)
+    
     def infer_feature_types(self):
         """Automatically infer feature types from data"""
         if self.df is None:
@@ -43,7 +211,7 @@ class DataLoader:
                 feature_types['id'].append(col)
             
             # Binary columns (0/1, Yes/No, High/Low)
-            elif self.df[col].dtype == 'object':
+            elif not pd.api.types.is_numeric_dtype(self.df[col]):
                 unique_vals = self.df[col].nunique()
                 if unique_vals <= 3:
                     feature_types['binary'].append(col)
@@ -91,4 +259,3 @@ class DataLoader:
         }
         
         return summary
-
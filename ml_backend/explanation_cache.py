@@ -0,0 +1,107 @@
+"""
+Explanation Cache Module - Bounded LRU cache for model outputs (score and SHAP row)
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import config
+
+
+class ExplanationCache:
+    """
+    In-process LRU cache with size and TTL eviction
+
+    Keys are a hash of the processed feature vector plus the fingerprint of
+    the loaded model artifacts, so entries from an older model can never be
+    returned. Different raw inputs can share a processed row (unseen category
+    and code 0, omitted field and its median), so only model outputs that
+    depend on the row alone may be stored - never anything echoing the raw
+    request. Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_size=None, ttl_seconds=None):
+        self.max_size = config.EXPLANATION_CACHE_SIZE if max_size is None else max_size
+        self.ttl = config.EXPLANATION_CACHE_TTL if ttl_seconds is None else ttl_seconds
+        self.fingerprint = ""
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def reset(self, fingerprint):
+        """Drop every entry and start keying on a new model fingerprint"""
+        with self._lock:
+            self._entries.clear()
+            self.fingerprint = fingerprint
+
+    def key(self, X_row, namespace=""):
+        """Cache key for one processed feature row"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.fingerprint.encode())
+        digest.update(namespace.encode())
+        digest.update(np.ascontiguousarray(X_row, dtype=np.float64).tobytes())
+        return digest.digest()
+
+    def get(self, key):
+        """Return the cached value or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries if full"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+def fingerprint_files(paths):
+    """Fingerprint model artifacts by their contents"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
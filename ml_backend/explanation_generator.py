@@ -6,6 +6,27 @@ import pandas as pd
 from shap_explainer import SHAPExplainer
 import config
 
+# Keys of a full explanation, in response order ('mode' is added by the predictor)
+EXPLANATION_FIELDS = (
+    'predicted_score', 'category', 'base_score', 'positive_factors', 'negative_factors',
+    'total_positive_impact', 'total_negative_impact', 'recommendations', 'explanation_text',
+    'all_features', 'mode'
+)
+
+def resolve_fields(fields=None):
+    """
+    Validate a field selection (None -> config.EXPLANATION_FIELDS, or all)
+    
+    Returns:
+        frozenset of field names
+    """
+    if fields is None:
+        fields = config.EXPLANATION_FIELDS or EXPLANATION_FIELDS
+    unknown = set(fields) - set(EXPLANATION_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown explanation fields {sorted(unknown)} (expected {list(EXPLANATION_FIELDS)})")
+    return frozenset(fields)
+
 class ExplanationGenerator:
     """Convert SHAP values into human-readable explanations"""
     
@@ -30,7 +51,19 @@ class ExplanationGenerator:
             'CAT_DEPENDENTS': 'Number of Dependents'
         }
     
-    def generate_explanation(self, shap_values, feature_values, predicted_score, base_score=None):
+    def summary_indices(self, shap_matrix, top_k=5):
+        """
+        Features each row's totals summarize: the top max(10, 2 * top_k)
+        by |impact|, largest first
+        
+        Shared by the single and batch paths, so /analyze and /predict/batch
+        report the same totals for the same customer.
+        """
+        n = max(10, 2 * top_k)
+        return np.argsort(np.abs(shap_matrix), axis=1)[:, ::-1][:, :n]
+    
+    def generate_explanation(self, shap_values, feature_values, predicted_score, base_score=None,
+                             top_k=5, fields=None):
         """
         Generate human-readable explanation from SHAP values
         
@@ -39,21 +72,23 @@ class ExplanationGenerator:
             feature_values: Actual feature values (dict or Series)
             predicted_score: Predicted credit score
             base_score: Base/expected score (optional)
+            top_k: Number of positive and negative factors to return
+            fields: Keys of EXPLANATION_FIELDS to include (default all); parts
+                not asked for (e.g. all_features) are never built
         
         Returns:
             Dictionary with explanation components
         """
+        fields = resolve_fields(fields)
+        
         if isinstance(shap_values, np.ndarray):
             shap_values = shap_values.flatten()
         
         if isinstance(feature_values, pd.Series):
             feature_values = feature_values.to_dict()
         
-        # Get feature importance (absolute SHAP values)
-        feature_importance = np.abs(shap_values)
-        
-        # Get top contributing features
-        top_indices = np.argsort(feature_importance)[::-1][:10]  # Top 10 features
+        # Get top contributing features (at least the top 10, split by sign)
+        top_indices = self.summary_indices(shap_values[None, :], top_k)[0]
         
         # Categorize factors
         positive_factors = []
@@ -82,30 +117,41 @@ class ExplanationGenerator:
         total_positive_impact = sum([f['impact'] for f in positive_factors])
         total_negative_impact = sum([f['impact'] for f in negative_factors])
         
-        # Generate recommendations
-        recommendations = self._generate_recommendations(negative_factors, feature_values)
+        explanation = {}
+        if 'predicted_score' in fields:
+            explanation['predicted_score'] = int(predicted_score)
+        if 'category' in fields:
+            explanation['category'] = self._categorize_score(predicted_score)
+        if 'base_score' in fields:
+            explanation['base_score'] = float(base_score) if base_score else None
+        if 'positive_factors' in fields:
+            explanation['positive_factors'] = positive_factors[:top_k]
+        if 'negative_factors' in fields:
+            explanation['negative_factors'] = negative_factors[:top_k]
+        if 'total_positive_impact' in fields:
+            explanation['total_positive_impact'] = float(total_positive_impact)
+        if 'total_negative_impact' in fields:
+            explanation['total_negative_impact'] = float(total_negative_impact)
+        
+        # Generate recommendations (the text quotes them too)
+        if 'recommendations' in fields or 'explanation_text' in fields:
+            recommendations = self._generate_recommendations(negative_factors, feature_values)
+            if 'recommendations' in fields:
+                explanation['recommendations'] = recommendations
         
         # Generate explanation text
-        explanation_text = self._generate_explanation_text(
-            predicted_score,
-            positive_factors[:5],
-            negative_factors[:5],
-            total_positive_impact,
-            total_negative_impact,
-            recommendations
-        )
-        
-        return {
-            'predicted_score': int(predicted_score),
-            'category': self._categorize_score(predicted_score),
-            'base_score': float(base_score) if base_score else None,
-            'positive_factors': positive_factors[:5],
-            'negative_factors': negative_factors[:5],
-            'total_positive_impact': float(total_positive_impact),
-            'total_negative_impact': float(total_negative_impact),
-            'recommendations': recommendations,
-            'explanation_text': explanation_text,
-            'all_features': [
+        if 'explanation_text' in fields:
+            explanation['explanation_text'] = self._generate_explanation_text(
+                predicted_score,
+                positive_factors[:5],
+                negative_factors[:5],
+                total_positive_impact,
+                total_negative_impact,
+                recommendations
+            )
+        
+        if 'all_features' in fields:
+            explanation['all_features'] = [
                 {
                     'feature': self.feature_names[i],
                     'description': self.feature_descriptions.get(self.feature_names[i], self.feature_names[i]),
@@ -114,7 +160,90 @@ class ExplanationGenerator:
                 }
                 for i in range(len(self.feature_names))
             ]
-        }
+        
+        return explanation
+    
+    def top_factors(self, shap_matrix, k=5):
+        """
+        Select the top-k positive and negative factors for every row at once
+        
+        Args:
+            shap_matrix: SHAP values, shape (n_rows, n_features)
+            k: Number of factors to keep per direction
+        
+        Returns:
+            (positive_idx, negative_idx, positive_mask, negative_mask), each of
+            shape (n_rows, k). Indices are ordered by descending |impact|; the
+            masks mark slots that hold a real positive / negative factor.
+        """
+        shap_matrix = np.atleast_2d(np.asarray(shap_matrix, dtype=float))
+        k = max(1, min(k, shap_matrix.shape[1]))
+        
+        def _top(values):
+            # argpartition picks the k largest per row, argsort orders only those
+            idx = np.argpartition(-values, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(values, idx, axis=1), axis=1)
+            return np.take_along_axis(idx, order, axis=1)
+        
+        positive_idx = _top(shap_matrix)
+        negative_idx = _top(-shap_matrix)
+        positive_mask = np.take_along_axis(shap_matrix, positive_idx, axis=1) > 0
+        negative_mask = np.take_along_axis(shap_matrix, negative_idx, axis=1) < 0
+        
+        return positive_idx, negative_idx, positive_mask, negative_mask
+    
+    def generate_batch_explanations(self, shap_matrix, feature_values_batch, predicted_scores,
+                                    base_score=None, top_k=5):
+        """
+        Generate compact explanations for a batch of predictions
+        
+        Args:
+            shap_matrix: SHAP values, shape (n_rows, n_features)
+            feature_values_batch: List of raw feature dicts, one per row
+            predicted_scores: Predicted credit scores (array)
+            base_score: Base/expected score (optional)
+            top_k: Number of positive and negative factors per row
+        
+        Returns:
+            List of explanation dictionaries (factors, totals, recommendations)
+        """
+        shap_matrix = np.atleast_2d(np.asarray(shap_matrix, dtype=float))
+        positive_idx, negative_idx, positive_mask, negative_mask = self.top_factors(shap_matrix, top_k)
+        
+        # Totals over the same top features as generate_explanation, summed
+        # in the same order (cumsum is sequential, like sum() over the list)
+        summary = np.take_along_axis(shap_matrix, self.summary_indices(shap_matrix, top_k), axis=1)
+        total_positive = np.cumsum(np.where(summary > 0, summary, 0.0), axis=1)[:, -1]
+        total_negative = np.cumsum(np.where(summary <= 0, summary, 0.0), axis=1)[:, -1]
+        
+        def _factors(row, indices, mask, feature_values):
+            factors = []
+            for idx in indices[mask]:
+                feature_name = self.feature_names[idx]
+                factors.append({
+                    'feature': feature_name,
+                    'description': self.feature_descriptions.get(feature_name, feature_name),
+                    'impact': float(shap_matrix[row, idx]),
+                    'value': feature_values.get(feature_name, 'N/A')
+                })
+            return factors
+        
+        explanations = []
+        for row, feature_values in enumerate(feature_values_batch):
+            positive_factors = _factors(row, positive_idx[row], positive_mask[row], feature_values)
+            negative_factors = _factors(row, negative_idx[row], negative_mask[row], feature_values)
+            explanations.append({
+                'predicted_score': int(predicted_scores[row]),
+                'category': self._categorize_score(predicted_scores[row]),
+                'base_score': float(base_score) if base_score else None,
+                'positive_factors': positive_factors,
+                'negative_factors': negative_factors,
+                'total_positive_impact': float(total_positive[row]),
+                'total_negative_impact': float(total_negative[row]),
+                'recommendations': self._generate_recommendations(negative_factors, feature_values)
+            })
+        
+        return explanations
     
     def _categorize_score(self, score):
         """Categorize credit score"""
@@ -202,4 +331,3 @@ class ExplanationGenerator:
                 text += f"{i}. {rec['action']} - {rec['reason']}\n"
         
         return text
-
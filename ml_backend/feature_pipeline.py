@@ -0,0 +1,217 @@
+"""
+Compiled Feature Pipeline Module - Array-native preprocessing for inference
+"""
+import numpy as np
+import pandas as pd
+
+
+class CompiledFeaturePipeline:
+    """
+    Flattened, array-only version of a fitted DataPreprocessor.
+
+    Holds the imputer medians, scaler mean/scale and category lookups as
+    arrays aligned to the model's feature order, so a request can be turned
+    into a float row without building a DataFrame.
+    """
+
+    def __init__(self, feature_names, numeric_cols, fill_values, mean, scale, category_maps):
+        self.feature_names = list(feature_names)
+        self.n_features = len(self.feature_names)
+        self.fill_values = fill_values
+        self.mean = mean
+        self.scale = scale
+        self.category_maps = category_maps
+
+        positions = {name: i for i, name in enumerate(self.feature_names)}
+        self.numeric_names = [name for name in self.feature_names if name in numeric_cols]
+        self.numeric_index = np.array([positions[name] for name in self.numeric_names], dtype=np.intp)
+        self.categorical_names = [name for name in self.feature_names if name in category_maps]
+        self.categorical_index = np.array([positions[name] for name in self.categorical_names], dtype=np.intp)
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor):
+        """Build the pipeline from a fitted DataPreprocessor"""
+        if not preprocessor.is_fitted:
+            raise ValueError("Preprocessor must be fitted before compiling")
+
+        feature_names = list(preprocessor.feature_names)
+        positions = {name: i for i, name in enumerate(feature_names)}
+        numeric_cols = list(getattr(preprocessor.imputer, 'feature_names_in_', []))
+
+        # Categorical positions pass through unchanged (mean 0, scale 1) and
+        # fall back to code 0 when missing, mirroring DataPreprocessor.transform
+        fill_values = np.zeros(len(feature_names))
+        mean = np.zeros(len(feature_names))
+        scale = np.ones(len(feature_names))
+        if numeric_cols:
+            numeric_index = [positions[name] for name in numeric_cols]
+            fill_values[numeric_index] = preprocessor.imputer.statistics_
+            mean[numeric_index] = preprocessor.scaler.mean_
+            scale[numeric_index] = preprocessor.scaler.scale_
+
+        category_maps = {
+            col: {label: code for code, label in enumerate(le.classes_)}
+            for col, le in preprocessor.label_encoders.items()
+        }
+
+        return cls(feature_names, set(numeric_cols), fill_values, mean, scale, category_maps)
+
+    def to_arrays(self):
+        """Statistics arrays for serialization"""
+        return {
+            'fill_values': self.fill_values,
+            'mean': self.mean,
+            'scale': self.scale
+        }
+
+    def metadata(self):
+        """JSON-serializable column metadata (names and category classes)"""
+        return {
+            'feature_names': self.feature_names,
+            'numeric_cols': self.numeric_names,
+            'categories': {
+                col: sorted(lookup, key=lookup.get) for col, lookup in self.category_maps.items()
+            }
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, metadata):
+        """Rebuild from to_arrays()/metadata() output (arrays may be memory-mapped)"""
+        category_maps = {
+            col: {label: code for code, label in enumerate(labels)}
+            for col, labels in metadata['categories'].items()
+        }
+        return cls(
+            metadata['feature_names'],
+            set(metadata['numeric_cols']),
+            arrays['fill_values'],
+            arrays['mean'],
+            arrays['scale'],
+            category_maps
+        )
+
+    def _finish(self, X):
+        """Impute missing values and scale in place"""
+        missing = np.isnan(X)
+        if missing.any():
+            X[missing] = np.broadcast_to(self.fill_values, X.shape)[missing]
+        X -= self.mean
+        X /= self.scale
+        return X
+
+    def _encode(self, col, value):
+        """Encode a single categorical value (unseen or missing -> 0)"""
+        if value is None:
+            return 0
+        return self.category_maps[col].get(str(value), 0)
+
+    def transform_record(self, record):
+        """
+        Transform a single record into a processed feature row
+
+        Args:
+            record: Dictionary of raw feature values (missing keys are imputed)
+
+        Returns:
+            2D float array of shape (1, n_features) in model feature order
+        """
+        X = np.empty((1, self.n_features))
+        X[0, self.numeric_index] = np.array(
+            [record.get(name) for name in self.numeric_names], dtype=float
+        )
+        for col, idx in zip(self.categorical_names, self.categorical_index):
+            X[0, idx] = self._encode(col, record.get(col))
+        return self._finish(X)
+
+    def transform_records(self, records):
+        """Transform a list of records into a processed feature matrix"""
+        X = np.empty((len(records), self.n_features))
+        if len(records) == 0:
+            return X
+        X[:, self.numeric_index] = np.array(
+            [[record.get(name) for name in self.numeric_names] for record in records],
+            dtype=float
+        )
+        for col, idx in zip(self.categorical_names, self.categorical_index):
+            X[:, idx] = [self._encode(col, record.get(col)) for record in records]
+        return self._finish(X)
+
+    def transform_frame(self, df):
+        """Transform a DataFrame column by column into a processed feature matrix"""
+        X = np.full((len(df), self.n_features), np.nan)
+        for name, idx in zip(self.numeric_names, self.numeric_index):
+            if name in df.columns:
+                X[:, idx] = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+        for col, idx in zip(self.categorical_names, self.categorical_index):
+            if col in df.columns:
+                codes = df[col].astype(str).map(self.category_maps[col])
+                X[:, idx] = codes.fillna(0).to_numpy(dtype=float)
+            else:
+                X[:, idx] = 0
+        return self._finish(X)
+
+    def transform_table(self, table):
+        """
+        Transform an Arrow table column by column into a processed feature matrix
+
+        Numeric columns are cast in Arrow and copied straight into the
+        matrix (nulls become NaN and are imputed); categorical columns are
+        matched against the known classes in Arrow (unseen or missing -> 0),
+        as in transform_frame. No per-row Python objects are created.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        X = np.full((table.num_rows, self.n_features), np.nan)
+        columns = set(table.column_names)
+        for name, idx in zip(self.numeric_names, self.numeric_index):
+            if name not in columns:
+                continue
+            column = table.column(name)
+            if pa.types.is_integer(column.type) or pa.types.is_floating(column.type) or pa.types.is_boolean(column.type):
+                X[:, idx] = pc.cast(column, pa.float64()).to_numpy(zero_copy_only=False)
+            else:
+                # Text columns: same coercion as transform_frame
+                X[:, idx] = pd.to_numeric(column.to_pandas(), errors='coerce').to_numpy(dtype=float)
+        for col, idx in zip(self.categorical_names, self.categorical_index):
+            if col in columns:
+                labels = pa.array(sorted(self.category_maps[col], key=self.category_maps[col].get))
+                codes = pc.index_in(pc.cast(table.column(col), pa.string()), value_set=labels)
+                X[:, idx] = pc.fill_null(codes, 0).to_numpy(zero_copy_only=False)
+            else:
+                X[:, idx] = 0
+        return self._finish(X)
+
+    def raw_values(self, index, values):
+        """
+        Map processed values of one feature back to raw units
+
+        Returns:
+            List of floats (numeric feature) or category labels
+        """
+        name = self.feature_names[index]
+        if name in self.category_maps:
+            labels = sorted(self.category_maps[name], key=self.category_maps[name].get)
+            return [labels[int(code)] for code in values]
+        return (np.asarray(values) * self.scale[index] + self.mean[index]).tolist()
+
+    def synthetic_records(self, n_rows, random_state=None):
+        """
+        Generate plausible raw records from the fitted statistics
+
+        Numeric features are drawn around the scaler mean/scale, categorical
+        features from the known classes. Used for warm-up traffic.
+        """
+        rng = np.random.default_rng(random_state)
+        numeric = (
+            self.mean[self.numeric_index]
+            + self.scale[self.numeric_index] * rng.standard_normal((n_rows, len(self.numeric_index)))
+        )
+        records = []
+        for row in numeric:
+            record = dict(zip(self.numeric_names, row.tolist()))
+            for col in self.categorical_names:
+                labels = list(self.category_maps[col])
+                record[col] = labels[rng.integers(len(labels))]
+            records.append(record)
+        return records
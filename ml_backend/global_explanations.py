@@ -0,0 +1,112 @@
+"""
+Global Explanation Module - Model-wide importance and partial dependence
+
+Computed once at train time and stored in the model bundle, so the API can
+serve the dashboard's global view of the model without running it.
+"""
+import time
+import numpy as np
+import config
+from tree_engine import sklearn_predict
+
+
+def feature_grid(values, categorical, grid_points):
+    """
+    Grid of processed values for one feature
+
+    Numeric features use quantiles between the 5th and 95th percentile (so
+    outliers do not stretch the axis); categorical features use their most
+    frequent codes. Duplicates are dropped, so binary features get two points.
+    """
+    values = values[~np.isnan(values)]
+    if categorical:
+        codes, counts = np.unique(values, return_counts=True)
+        return np.sort(codes[np.argsort(-counts, kind='stable')[:grid_points]])
+    return np.unique(np.quantile(values, np.linspace(0.05, 0.95, grid_points)))
+
+
+def partial_dependence(predict, background, feature_index, grid):
+    """
+    Average prediction with one feature set to each grid value
+
+    The background rows are repeated once per grid value into a single
+    (grid x background) matrix, scored with one predict call.
+
+    Returns:
+        Array of average predictions, one per grid value
+    """
+    stacked = np.repeat(background[None, :, :], len(grid), axis=0)
+    stacked[:, :, feature_index] = grid[:, None]
+    predictions = predict(stacked.reshape(-1, background.shape[1]))
+    return predictions.reshape(len(grid), len(background)).mean(axis=1)
+
+
+def compute_global_explanation(model, explainer, X, top_features=None, grid_points=None,
+                               background_rows=None, max_rows=None):
+    """
+    Global importance and partial dependence of a trained model
+
+    Args:
+        model: CreditScoreModel with a fitted estimator and compiled pipeline
+        explainer: SHAPExplainer for the same model
+        X: Processed training rows
+        top_features: Features (by mean |SHAP|) that get a partial dependence curve
+        grid_points: Maximum grid values per curve
+        background_rows: Rows averaged at every grid value
+        max_rows: Rows sampled from X for mean |SHAP| (0 = all)
+
+    Returns:
+        JSON-serializable dictionary (importance ranking, curves in raw
+        feature units and score points, settings and timings)
+    """
+    top_features = config.GLOBAL_PDP_FEATURES if top_features is None else top_features
+    grid_points = grid_points or config.GLOBAL_PDP_GRID_POINTS
+    background_rows = background_rows or config.GLOBAL_PDP_BACKGROUND_ROWS
+    max_rows = config.GLOBAL_EXPLANATION_ROWS if max_rows is None else max_rows
+
+    X = np.asarray(X, dtype=float)
+    rng = np.random.default_rng(config.RANDOM_STATE)
+    if max_rows and len(X) > max_rows:
+        X = X[rng.choice(len(X), max_rows, replace=False)]
+
+    start = time.perf_counter()
+    importance = np.abs(explainer.explain_batch(X, mode='exact')).mean(axis=0)
+    shap_seconds = time.perf_counter() - start
+
+    pipeline = model.pipeline
+    names = pipeline.feature_names
+    order = np.argsort(-importance, kind='stable')
+    background = X[rng.choice(len(X), min(background_rows, len(X)), replace=False)]
+
+    def predict(rows):
+        return np.clip(sklearn_predict(model.model, rows), config.CREDIT_SCORE_MIN, config.CREDIT_SCORE_MAX)
+
+    start = time.perf_counter()
+    curves = []
+    categorical_index = set(pipeline.categorical_index.tolist())
+    for index in order[:top_features]:
+        categorical = int(index) in categorical_index
+        grid = feature_grid(X[:, index], categorical, grid_points)
+        average = partial_dependence(predict, background, index, grid)
+        curves.append({
+            'feature': names[index],
+            'categorical': categorical,
+            'grid': pipeline.raw_values(index, grid),
+            'average_score': average.tolist()
+        })
+    pdp_seconds = time.perf_counter() - start
+
+    print(f"🌐 Global explanation: mean |SHAP| over {len(X)} rows in {shap_seconds:.2f} s, "
+          f"{len(curves)} partial dependence curves in {pdp_seconds:.2f} s")
+    return {
+        'rows': len(X),
+        'base_value': float(explainer.flat_engine().expected_value),
+        'importance': [
+            {'feature': names[i], 'mean_abs_shap': float(importance[i])} for i in order
+        ],
+        'partial_dependence': curves,
+        'settings': {
+            'top_features': top_features, 'grid_points': grid_points, 'background_rows': len(background)
+        },
+        'seconds': {'shap': shap_seconds, 'partial_dependence': pdp_seconds}
+    }
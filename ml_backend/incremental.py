@@ -0,0 +1,377 @@
+"""
+Incremental Training Module - Warm-started retraining on appended rows
+
+After a full training run, train_pipeline.py saves a training snapshot: the
+fitted estimator and preprocessor, where the source CSV ended, and the
+statistics of the rows trained on. `python incremental.py` then:
+
+1. Checks the CSV against the snapshot. Only bytes appended after the
+   snapshot's end are read; an edited or replaced file needs a full refit.
+2. Measures drift of the rows added since the last full fit (mean shift of
+   numeric features, unseen categories, growth of the target ranges).
+3. Below ML_INCREMENTAL_DRIFT_THRESHOLD it updates the scaler statistics
+   with the new rows (exact merged mean/variance), remaps the existing tree
+   thresholds to the new scaling so their splits are unchanged, and adds
+   ML_INCREMENTAL_ESTIMATORS trees fitted on the new rows (warm_start).
+   Above it, it runs the full training pipeline.
+
+Imputer medians and category encoders stay as fitted by the last full run;
+unseen categories map to code 0 as in serving and count towards drift.
+Retrain time depends on the number of new rows, not on the history.
+"""
+import argparse
+import hashlib
+import io
+import math
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_squared_error
+import config
+from data_loader import downcast_frame
+from global_explanations import compute_global_explanation
+from model_trainer import CreditScoreModel
+from running_stats import merge_moments, moments
+from shap_explainer import SHAPExplainer
+from tree_engine import sklearn_predict
+
+# Bytes hashed at the head and at the end of the trained part of the CSV
+MARKER_SAMPLE_BYTES = 1 << 16
+
+# Snapshot layout version
+SNAPSHOT_VERSION = 1
+
+
+def source_marker(path, size=None):
+    """
+    Where a CSV ended when it was trained on
+
+    Size plus hashes of its first bytes and of the bytes just before the end,
+    so a later check can tell pure appends from edits.
+    """
+    size = os.path.getsize(path) if size is None else size
+    with open(path, 'rb') as f:
+        head = f.read(min(size, MARKER_SAMPLE_BYTES))
+        tail_start = max(0, size - MARKER_SAMPLE_BYTES)
+        f.seek(tail_start)
+        tail = f.read(size - tail_start)
+    return {
+        'bytes': size,
+        'head': hashlib.blake2b(head, digest_size=16).hexdigest(),
+        'tail': hashlib.blake2b(tail, digest_size=16).hexdigest(),
+        'ends_with_newline': tail.endswith(b'\n')
+    }
+
+
+def source_status(path, marker):
+    """
+    Compare a CSV with a source marker
+
+    Returns:
+        'same', 'appended' (only bytes added after the marker) or 'changed'
+    """
+    size = os.path.getsize(path)
+    if size < marker['bytes'] or source_marker(path, marker['bytes']) != marker:
+        return 'changed'
+    if size == marker['bytes']:
+        return 'same'
+    # Rows appended to a file without a trailing newline would extend its last row
+    return 'appended' if marker['ends_with_newline'] else 'changed'
+
+
+def read_appended_rows(path, offset):
+    """Parse only the rows after byte `offset` (the CSV header is reused)"""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(offset)
+        body = f.read()
+    df = pd.read_csv(io.BytesIO(header + body))
+    return downcast_frame(df) if config.DATA_CACHE_DOWNCAST else df
+
+
+def rescale_thresholds(estimator, old_pipeline, new_pipeline):
+    """
+    Move tree thresholds from one feature scaling to another
+
+    A split `(x - m0) / s0 <= t` becomes `(x - m1) / s1 <= (t * s0 + m0 - m1) / s1`,
+    so every tree still routes a raw value the same way once the scaler is
+    updated. Works on (Hist)GradientBoostingRegressor in place.
+
+    Histogram thresholds are often data values themselves; the remapped
+    threshold is nudged up by a relative 1e-9 so such values stay on the
+    left despite rounding in the affine map.
+    """
+    def remap(feature, threshold):
+        moved = (threshold * old_pipeline.scale[feature] + old_pipeline.mean[feature]
+                 - new_pipeline.mean[feature]) / new_pipeline.scale[feature]
+        return moved + 1e-9 * np.maximum(np.abs(moved), 1.0)
+
+    if hasattr(estimator, '_predictors'):
+        for (predictor,) in estimator._predictors:
+            nodes = predictor.nodes
+            split = nodes['is_leaf'] == 0
+            nodes['num_threshold'][split] = remap(nodes['feature_idx'][split], nodes['num_threshold'][split])
+        # Bins are recomputed from the new rows on the next (warm-started) fit
+    else:
+        for tree in np.ravel(estimator.estimators_):
+            t = tree.tree_
+            split = t.children_left != -1
+            # tree_.threshold is a writable view on the tree's nodes
+            t.threshold[split] = remap(t.feature[split], t.threshold[split])
+
+
+def save_snapshot(model, df, feature_cols, feature_types, y, test_idx, source_path, source_bytes,
+                  metrics, key=None, path=None):
+    """
+    Save the training snapshot of a full fit
+
+    Args:
+        model: Trained CreditScoreModel (sklearn estimator and preprocessor)
+        df: Raw training data
+        feature_cols, feature_types: As passed to training
+        y: Synthetic target of df
+        test_idx: Test row positions (a sample is kept to check updates)
+        source_path, source_bytes: CSV trained on and its size when loaded
+        metrics: Metrics of the full fit
+        key: Pipeline key of the run that produced it
+    """
+    path = path or config.TRAINING_SNAPSHOT_PATH
+    pipeline = model.preprocessor.compile()
+    X = pipeline.transform_frame(df)
+    numeric = pipeline.numeric_index
+    reference_idx = np.asarray(test_idx)[:config.INCREMENTAL_REFERENCE_ROWS]
+
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'key': key,
+        'source': source_marker(source_path, source_bytes),
+        'engine': config.MODEL_ENGINE,
+        'estimator': model.model,
+        'preprocessor': model.preprocessor,
+        'feature_cols': feature_cols,
+        'feature_types': feature_types,
+        'target_ranges': model.target_ranges(df),
+        # Unscaled numeric statistics of the full fit: the drift reference
+        'reference': moments(X[:, numeric] * pipeline.scale[numeric] + pipeline.mean[numeric]),
+        'reference_rows': df.iloc[reference_idx].reset_index(drop=True),
+        'reference_target': np.asarray(y)[reference_idx],
+        'rows': len(df),
+        'full_fit_rows': len(df),
+        'added': {'count': 0, 'mean': 0.0, 'm2': 0.0},
+        'metrics': metrics,
+        'updates': []
+    }
+    joblib.dump(snapshot, path)
+    print(f"💾 Training snapshot saved to {path}")
+    return snapshot
+
+
+def snapshot_key(path=None):
+    """Pipeline key of the saved snapshot (or None)"""
+    try:
+        return joblib.load(path or config.TRAINING_SNAPSHOT_PATH).get('key')
+    except (OSError, EOFError, ValueError):
+        return None
+
+
+def drift_report(snapshot, delta, pipeline):
+    """
+    Drift of all rows added since the last full fit, including `delta`
+
+    - mean_shift: largest shift of a numeric feature mean, in reference
+      standard deviations, beyond two standard errors of the added rows
+    - unseen_categories: largest share of added rows with an unknown label
+    - range_growth: largest relative growth of a target normalization range
+    - growth: added rows relative to the rows of the last full fit
+
+    Returns:
+        (report dict with a 'score' = max of the first three, merged moments
+        of the added rows, unseen label counts per column)
+    """
+    numeric = pipeline.numeric_index
+    X = pipeline.transform_frame(delta)
+    raw = X[:, numeric] * pipeline.scale[numeric] + pipeline.mean[numeric]
+    added = merge_moments(snapshot['added'], moments(raw))
+    unseen_counts = dict(snapshot.get('unseen', {}))
+    for col, lookup in pipeline.category_maps.items():
+        if col in delta.columns:
+            unseen_counts[col] = unseen_counts.get(col, 0) + int((~delta[col].astype(str).isin(list(lookup))).sum())
+
+    reference = snapshot['reference']
+    reference_std = np.sqrt(reference['m2'] / max(reference['count'] - 1, 1))
+    reference_std = np.where(reference_std > 0, reference_std, 1.0)
+    shift = np.abs(added['mean'] - reference['mean']) / reference_std
+    mean_shift = float(np.max(np.maximum(shift - 2 / math.sqrt(added['count']), 0.0), initial=0.0))
+
+    unseen = max(unseen_counts.values(), default=0) / added['count']
+
+    range_growth = 0.0
+    for col, (low, high) in snapshot['target_ranges'].items():
+        if col in delta.columns:
+            new_low = min(low, float(delta[col].min()))
+            new_high = max(high, float(delta[col].max()))
+            range_growth = max(range_growth, (new_high - new_low) / max(high - low, 1e-10) - 1)
+
+    report = {
+        'mean_shift': mean_shift,
+        'unseen_categories': float(unseen),
+        'range_growth': float(range_growth),
+        'growth': added['count'] / snapshot['full_fit_rows']
+    }
+    report['score'] = max(report['mean_shift'], report['unseen_categories'], report['range_growth'])
+    return report, added, unseen_counts
+
+
+def _rmse(estimator, X, y):
+    return float(np.sqrt(mean_squared_error(y, sklearn_predict(estimator, X)))) if len(y) else float('nan')
+
+
+def update(csv_path=None, snapshot_path=None, force_full=False):
+    """
+    Bring the model up to date with the CSV
+
+    Returns:
+        'up_to_date', 'waiting' (too few new rows), 'incremental' or 'full'
+    """
+    csv_path = csv_path or config.CSV_FILE_PATH
+    snapshot_path = snapshot_path or config.TRAINING_SNAPSHOT_PATH
+    start = time.perf_counter()
+
+    snapshot = None
+    if not force_full and os.path.exists(snapshot_path):
+        snapshot = joblib.load(snapshot_path)
+        if snapshot.get('version') != SNAPSHOT_VERSION or snapshot.get('engine') != config.MODEL_ENGINE:
+            print("⚠️  Snapshot is from another version or engine")
+            snapshot = None
+    status = source_status(csv_path, snapshot['source']) if snapshot else 'changed'
+
+    if status == 'same':
+        print("✅ Model is up to date with the data")
+        return 'up_to_date'
+
+    reason = None
+    if snapshot is None:
+        reason = "no usable training snapshot" if not force_full else "full refit requested"
+    elif status == 'changed':
+        reason = "the CSV was modified, not only appended to"
+
+    if reason is None:
+        delta = read_appended_rows(csv_path, snapshot['source']['bytes'])
+        print(f"📥 {len(delta)} rows appended since the last training run")
+        if len(delta) < config.INCREMENTAL_MIN_ROWS:
+            print(f"⏳ Waiting for at least {config.INCREMENTAL_MIN_ROWS} new rows")
+            return 'waiting'
+
+        old_pipeline = snapshot['preprocessor'].compile()
+        drift, added, unseen_counts = drift_report(snapshot, delta, old_pipeline)
+        print(f"📊 Drift since last full fit: mean shift {drift['mean_shift']:.3f}, "
+              f"unseen categories {drift['unseen_categories']:.3f}, "
+              f"range growth {drift['range_growth']:.3f}, growth {drift['growth']:.2f}x")
+        if drift['score'] > config.INCREMENTAL_DRIFT_THRESHOLD:
+            reason = f"drift {drift['score']:.3f} > {config.INCREMENTAL_DRIFT_THRESHOLD}"
+        elif drift['growth'] > config.INCREMENTAL_MAX_GROWTH:
+            reason = f"data grew {drift['growth']:.2f}x since the last full fit"
+
+    if reason is not None:
+        print(f"🔁 Full refit: {reason}")
+        # Imported here: the pipeline saves snapshots through this module
+        import train_pipeline
+        train_pipeline.main(csv_path=csv_path)
+        return 'full'
+
+    # Incremental update
+    model = CreditScoreModel()
+    model.preprocessor = snapshot['preprocessor']
+    model.feature_names = snapshot['feature_cols']
+    model.model = estimator = snapshot['estimator']
+
+    # Scaler: merge the new rows' statistics, then move the trees to the new scaling
+    numeric_cols = list(model.preprocessor.imputer.feature_names_in_)
+    imputed = model.preprocessor.imputer.transform(delta[numeric_cols])
+    model.preprocessor.scaler.partial_fit(pd.DataFrame(imputed, columns=numeric_cols))
+    new_pipeline = model.preprocessor.compile()
+    reference_X_old = old_pipeline.transform_frame(snapshot['reference_rows'])
+    reference_before = sklearn_predict(estimator, reference_X_old)
+    rescale_thresholds(estimator, old_pipeline, new_pipeline)
+    reference_X = new_pipeline.transform_frame(snapshot['reference_rows'])
+    # Rows whose value rounds (float32) onto a threshold may switch sides
+    remap_changed = int((np.abs(sklearn_predict(estimator, reference_X) - reference_before) > 1e-6).sum())
+    print(f"   Threshold remap: {remap_changed}/{len(reference_before)} reference rows changed")
+
+    # New trees fitted on the new rows only, on top of the existing ones
+    X = new_pipeline.transform_frame(delta)
+    y = model.create_synthetic_target(delta, snapshot['target_ranges']).to_numpy()
+    train_idx, test_idx = model.split_indices(len(X))
+    rounds_param = 'max_iter' if hasattr(estimator, 'max_iter') else 'n_estimators'
+    n_before = getattr(estimator, rounds_param)
+    delta_before = _rmse(estimator, X[test_idx], y[test_idx])
+
+    fit_start = time.perf_counter()
+    estimator.set_params(warm_start=True, **{rounds_param: n_before + config.INCREMENTAL_ESTIMATORS})
+    estimator.fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - fit_start
+
+    delta_after = _rmse(estimator, X[test_idx], y[test_idx])
+    reference_rmse_before = float(np.sqrt(mean_squared_error(snapshot['reference_target'], reference_before)))
+    reference_rmse = _rmse(estimator, reference_X, snapshot['reference_target'])
+    print(f"🎯 Added {config.INCREMENTAL_ESTIMATORS} trees ({n_before} -> {n_before + config.INCREMENTAL_ESTIMATORS}) "
+          f"on {len(train_idx)} rows in {fit_seconds:.2f} s")
+    print(f"   New-rows test RMSE: {delta_before:.2f} -> {delta_after:.2f}")
+    print(f"   Reference test RMSE: {reference_rmse_before:.2f} -> {reference_rmse:.2f}")
+
+    model.pipeline = new_pipeline
+    model._build_engine()
+    if model.engine is not None:
+        model.engine.check_parity(estimator, X)
+
+    # Global view recomputed on the held-out reference rows plus the new
+    # training rows (earlier training rows are not kept in the snapshot)
+    explainer = SHAPExplainer(model.engine or estimator, None, snapshot['feature_cols'])
+    explainer.create_explainer(None, explainer_type='tree')
+    global_explanation = compute_global_explanation(model, explainer, np.vstack([reference_X, X[train_idx]]))
+
+    entry = {
+        'rows': len(delta),
+        'trees': config.INCREMENTAL_ESTIMATORS,
+        'fit_seconds': fit_seconds,
+        'new_rows_rmse_before': delta_before,
+        'new_rows_rmse_after': delta_after,
+        'reference_rmse_before': reference_rmse_before,
+        'reference_rmse': reference_rmse,
+        'remap_changed_rows': remap_changed,
+        'drift': drift
+    }
+    feature_info = {
+        'feature_names': snapshot['feature_cols'],
+        'feature_types': snapshot['feature_types'],
+        'metrics': {name: float(value) for name, value in snapshot['metrics'].items()},
+        'engine': snapshot['engine'],
+        'incremental_updates': len(snapshot['updates']) + 1
+    }
+    model.save_bundle(config.MODEL_BUNDLE_PATH, feature_info, global_explanation)
+
+    snapshot.update({
+        'source': source_marker(csv_path),
+        'estimator': estimator,
+        'preprocessor': model.preprocessor,
+        'rows': snapshot['rows'] + len(delta),
+        'added': added,
+        'unseen': unseen_counts,
+        'updates': snapshot['updates'] + [entry],
+        'key': None
+    })
+    entry['total_seconds'] = time.perf_counter() - start
+    joblib.dump(snapshot, snapshot_path)
+    print(f"✅ Incremental update done in {entry['total_seconds']:.2f} s "
+          f"({snapshot['rows']} rows trained on, {len(snapshot['updates'])} updates since the last full fit)")
+    return 'incremental'
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the model with newly appended rows")
+    parser.add_argument("--csv", help="Source CSV (default config.CSV_FILE_PATH)")
+    parser.add_argument("--full", action="store_true", help="Force a full refit")
+    args = parser.parse_args()
+    update(csv_path=args.csv, force_full=args.full)
@@ -0,0 +1,183 @@
+"""
+Inference Worker Pool Module - Run CPU-bound prediction off the event loop
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import config
+import metrics
+
+# Predictor owned by each process-pool worker (loaded once per worker)
+_worker_predictor = None
+
+
+def _init_worker():
+    """Process-pool initializer: load and warm up the models once in this worker"""
+    global _worker_predictor
+    from predict import CreditScorePredictor
+    _worker_predictor = CreditScorePredictor()
+    _worker_predictor.load_models()
+    _worker_predictor.warm_up(config.WARMUP_ROWS)
+
+
+def _worker_ping():
+    """No-op task used to start (and preload) every worker"""
+    return _worker_predictor is not None
+
+
+def _timed_call(predictor, method, args, kwargs, queue_wait=None):
+    """Run a predictor method; returns (result, stage timings or None)"""
+    if not config.METRICS_ENABLED:
+        return getattr(predictor, method)(*args, **kwargs), None
+    token = metrics.begin()
+    try:
+        if queue_wait is not None:
+            metrics.record('queue', queue_wait)
+        result = getattr(predictor, method)(*args, **kwargs)
+    finally:
+        timings = metrics.end(token)
+    return result, timings
+
+
+def _worker_call(method, args, kwargs):
+    """Run a predictor method inside a process-pool worker"""
+    started_at = time.time()
+    return (started_at, *_timed_call(_worker_predictor, method, args, kwargs))
+
+
+class PoolOverloadedError(RuntimeError):
+    """Raised when the inference queue is full"""
+
+
+class InferencePool:
+    """
+    Executor layer for predictor calls made from async request handlers
+
+    Modes:
+        'thread'  - thread pool sharing the in-process predictor
+        'process' - process pool, each worker loads its own predictor
+        'inline'  - run directly in the caller (no executor)
+    """
+
+    def __init__(self, predictor_factory, mode=None, workers=None, max_queue=None):
+        self.predictor_factory = predictor_factory
+        self.mode = mode or config.INFERENCE_EXECUTOR
+        self.workers = workers or config.INFERENCE_WORKERS
+        self.max_queue = max_queue if max_queue is not None else config.INFERENCE_MAX_QUEUE
+        self._executor = None
+        self._lock = threading.Lock()
+
+        # Counters exposed through stats()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.queue_wait_last = 0.0
+
+        if self.mode not in ('thread', 'process', 'inline'):
+            raise ValueError(f"Unknown inference executor: {self.mode}")
+
+    def start(self):
+        """Create the executor; process workers load their models here"""
+        if self._executor is not None:
+            return
+        if self.mode != 'process':
+            # Load the shared predictor before any worker thread needs it
+            self.predictor_factory()
+            if self.mode == 'inline':
+                return
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="inference"
+            )
+        else:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+            # Submit one no-op per worker so every process is up and preloaded
+            for future in [self._executor.submit(_worker_ping) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self):
+        """Stop the executor and wait for running tasks"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _record_wait(self, submitted_at, started_at):
+        """Track how long a task waited for a free worker"""
+        wait = max(0.0, started_at - submitted_at)
+        with self._lock:
+            self.queue_wait_last = wait
+            self.queue_wait_total += wait
+            self.queue_wait_max = max(self.queue_wait_max, wait)
+        return wait
+
+    def _call_local(self, method, submitted_at, args, kwargs):
+        """Run a predictor method on the in-process predictor"""
+        wait = self._record_wait(submitted_at, time.time())
+        return _timed_call(self.predictor_factory(), method, args, kwargs, queue_wait=wait)
+
+    async def run(self, method, *args, **kwargs):
+        """
+        Run `CreditScorePredictor.<method>(*args, **kwargs)` on the pool
+
+        Raises:
+            PoolOverloadedError: if max_queue tasks are already waiting
+        """
+        with self._lock:
+            if self.max_queue and self.in_flight - self.workers >= self.max_queue:
+                self.rejected += 1
+                raise PoolOverloadedError("Inference queue is full")
+            self.in_flight += 1
+
+        submitted_at = time.time()
+        try:
+            if self.mode == 'inline':
+                result, timings = self._call_local(method, submitted_at, args, kwargs)
+            else:
+                self.start()
+                loop = asyncio.get_running_loop()
+                if self.mode == 'thread':
+                    result, timings = await loop.run_in_executor(
+                        self._executor, self._call_local, method, submitted_at, args, kwargs
+                    )
+                else:
+                    started_at, result, timings = await loop.run_in_executor(
+                        self._executor, _worker_call, method, args, kwargs
+                    )
+                    wait = self._record_wait(submitted_at, started_at)
+                    if timings is not None:
+                        timings = {'queue': wait, **timings}
+            # Stages run in this process are already in the histograms;
+            # worker processes keep their own, so theirs are added here
+            metrics.merge(timings, observe=self.mode == 'process')
+            return result
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def stats(self):
+        """Pool sizing and queue metrics"""
+        with self._lock:
+            completed = self.completed
+            return {
+                'executor': self.mode,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'queued': max(0, self.in_flight - self.workers),
+                'completed': completed,
+                'rejected': self.rejected,
+                'queue_wait_ms': {
+                    'last': self.queue_wait_last * 1000,
+                    'avg': (self.queue_wait_total / completed * 1000) if completed else 0.0,
+                    'max': self.queue_wait_max * 1000
+                }
+            }
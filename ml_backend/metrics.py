@@ -0,0 +1,253 @@
+"""
+Latency Metrics Module - Per-stage timers, fixed-bucket histograms and Prometheus export
+
+Hot-path stages (validation, feature transform, model predict, SHAP,
+explanation text, serialization) are timed with `stage(name)`. Every
+measurement goes into a fixed-bucket histogram (constant memory however long
+the server runs) and into the timings of the request being served, which
+the middleware sends back as a `Server-Timing` header. With
+config.METRICS_ENABLED off, `stage()` returns a shared no-op and nothing is
+recorded.
+"""
+import bisect
+import contextvars
+import threading
+import time
+import config
+
+# Timings of the request (or pool task) currently being served, if any
+_current = contextvars.ContextVar('ml_request_timings', default=None)
+
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram with a fixed set of bounds (seconds)"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot: above the largest bound
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """Record one measurement"""
+        slot = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[slot] += 1
+            self.total += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """(cumulative bucket counts, sum, count) taken under the lock"""
+        with self._lock:
+            counts, total, count = list(self.counts), self.total, self.count
+        cumulative, running = [], 0
+        for value in counts:
+            running += value
+            cumulative.append(running)
+        return cumulative, total, count
+
+    def quantile(self, q):
+        """Approximate quantile (upper bound of the bucket holding it)"""
+        cumulative, _, count = self.snapshot()
+        if count == 0:
+            return 0.0
+        slot = bisect.bisect_left(cumulative, q * count)
+        return self.bounds[slot] if slot < len(self.bounds) else float('inf')
+
+
+class MetricsRegistry:
+    """Histograms keyed by (metric name, label value), created on first use"""
+
+    def __init__(self, bounds_ms=None):
+        self.bounds = tuple(sorted(b / 1000.0 for b in (bounds_ms or config.METRICS_BUCKETS_MS)))
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, metric, label):
+        """Histogram for one metric/label pair (created on first use)"""
+        key = (metric, label)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, LatencyHistogram(self.bounds))
+        return histogram
+
+    def reset(self):
+        """Drop every histogram (e.g. after warm-up traffic)"""
+        with self._lock:
+            self.histograms = {}
+
+    def observe(self, stage_name, seconds):
+        """Record one stage measurement"""
+        self.histogram('ml_stage_duration_seconds', stage_name).observe(seconds)
+
+    def observe_request(self, path, seconds):
+        """Record one end-to-end request duration"""
+        self.histogram('ml_request_duration_seconds', path).observe(seconds)
+
+    def summary(self):
+        """Count, mean and approximate p50/p99 (ms) per stage and path"""
+        result = {}
+        for (metric, label), histogram in sorted(self.histograms.items()):
+            _, total, count = histogram.snapshot()
+            result.setdefault('stages' if metric == 'ml_stage_duration_seconds' else 'requests', {})[label] = {
+                'count': count,
+                'mean_ms': total / count * 1000 if count else 0.0,
+                'p50_ms': histogram.quantile(0.5) * 1000,
+                'p99_ms': histogram.quantile(0.99) * 1000
+            }
+        return result
+
+    def prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        help_text = {
+            'ml_stage_duration_seconds': ('stage', 'Time spent in one inference stage'),
+            'ml_request_duration_seconds': ('path', 'End-to-end request latency by route')
+        }
+        lines = []
+        for metric, (label, description) in help_text.items():
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} histogram")
+            for (name, value), histogram in sorted(self.histograms.items()):
+                if name != metric:
+                    continue
+                cumulative, total, count = histogram.snapshot()
+                for bound, bucket in zip(self.bounds, cumulative):
+                    lines.append(f'{metric}_bucket{{{label}="{value}",le="{bound:g}"}} {bucket}')
+                lines.append(f'{metric}_bucket{{{label}="{value}",le="+Inf"}} {count}')
+                lines.append(f'{metric}_sum{{{label}="{value}"}} {total:.9f}')
+                lines.append(f'{metric}_count{{{label}="{value}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Timings(dict):
+    """{stage: seconds} for one request or pool task, plus when it started"""
+    __slots__ = ('start',)
+
+
+class _Stage:
+    """Context manager timing one stage into REGISTRY and the current request"""
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullStage:
+    """No-op stand-in used when metrics are disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name):
+    """Time a block: `with stage('shap'): ...`"""
+    if not config.METRICS_ENABLED:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def record(name, seconds, observe=True):
+    """Add a measured stage to the histograms (unless observe=False) and the current request"""
+    if observe:
+        REGISTRY.observe(name, seconds)
+    timings = _current.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def begin():
+    """Start collecting stage timings in this context; returns a token for end()"""
+    timings = _Timings()
+    timings.start = time.perf_counter()
+    return _current.set(timings)
+
+
+def end(token):
+    """Stop collecting; returns {stage: seconds} gathered since begin()"""
+    timings = _current.get()
+    _current.reset(token)
+    return dict(timings)
+
+
+def merge(timings, observe=True):
+    """Fold timings collected elsewhere (pool thread or worker process) into this context"""
+    if timings:
+        for name, seconds in timings.items():
+            record(name, seconds, observe=observe)
+
+
+def server_timing(timings):
+    """Server-Timing header value, durations in ms"""
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items())
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: collect each request's stage timings, add Server-Timing
+    and record the end-to-end latency per route
+
+    Unmatched paths (404s) are not recorded, so the number of histograms
+    stays bounded by the number of routes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not config.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        token = begin()
+        timings = _current.get()
+        start = timings.start
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start' and config.METRICS_SERVER_TIMING:
+                stages = dict(timings, total=time.perf_counter() - start)
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', server_timing(stages).encode('latin-1')))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end(token)
+            route = scope.get('route')
+            if route is not None:
+                REGISTRY.observe_request(route.path, time.perf_counter() - start)
+
+
+def since_request_start(name):
+    """
+    Record the time from the start of the request to now as stage `name`
+
+    Used for work done by the framework before the handler runs (reading
+    the body and validating it into the request model).
+    """
+    if not config.METRICS_ENABLED:
+        return
+    timings = _current.get()
+    if timings is not None:
+        record(name, time.perf_counter() - timings.start)
@@ -0,0 +1,150 @@
+"""
+Model Bundle Module - Single-file, memory-mappable model artifact format
+
+Layout:
+    8 bytes   magic (b"CSMBNDL\\0")
+    8 bytes   little-endian uint64 manifest length
+    N bytes   UTF-8 JSON manifest
+    padding   to a 64-byte boundary
+    data      raw arrays, each starting on a 64-byte boundary
+
+The manifest records the format version, free-form metadata, and for every
+array its dtype, shape and offset into the data section, plus a SHA-256
+checksum of the data section. Arrays are returned as read-only views of a
+single memory map, so worker processes share the same page-cache pages.
+Bundles are written to a temporary file and renamed over the target, so a
+process that has the old file mapped keeps reading the old, complete file.
+"""
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from pathlib import Path
+import numpy as np
+
+BUNDLE_MAGIC = b"CSMBNDL\0"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+class BundleError(ValueError):
+    """Raised when a bundle is malformed, of an unknown version or corrupted"""
+
+
+def _padding(size):
+    return (-size) % ALIGNMENT
+
+
+def save_bundle(path, arrays, metadata):
+    """
+    Write arrays and metadata to a single bundle file
+
+    The file is written next to `path` under a unique temporary name and
+    moved into place with os.replace, never truncated in place.
+
+    Args:
+        path: Output file path
+        arrays: Dict of name -> numpy array (numeric dtypes only)
+        metadata: JSON-serializable dict stored in the manifest
+
+    Returns:
+        Hex SHA-256 checksum of the data section
+    """
+    entries = {}
+    blobs = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            raise BundleError(f"Array '{name}' has an object dtype")
+        entries[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset
+        }
+        blobs.append(array)
+        offset += array.nbytes + _padding(array.nbytes)
+
+    # Checksum covers the data section exactly as written, padding included
+    digest = hashlib.sha256()
+    for array in blobs:
+        digest.update(memoryview(array).cast('B'))
+        digest.update(b"\0" * _padding(array.nbytes))
+    checksum = digest.hexdigest()
+
+    manifest = json.dumps({
+        'format_version': FORMAT_VERSION,
+        'checksum': checksum,
+        'data_size': offset,
+        'arrays': entries,
+        'metadata': metadata
+    }).encode('utf-8')
+    header_size = len(BUNDLE_MAGIC) + 8 + len(manifest)
+
+    path = Path(path)
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}-", suffix='.tmp',
+                                     delete=False) as f:
+        try:
+            f.write(BUNDLE_MAGIC)
+            f.write(struct.pack('<Q', len(manifest)))
+            f.write(manifest)
+            f.write(b"\0" * _padding(header_size))
+            for array in blobs:
+                f.write(memoryview(array).cast('B'))
+                f.write(b"\0" * _padding(array.nbytes))
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    try:
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+    return checksum
+
+
+def load_bundle(path, verify=True):
+    """
+    Memory-map a bundle file
+
+    Args:
+        path: Bundle file path
+        verify: Check the data section against the stored checksum
+
+    Returns:
+        (arrays, manifest) where arrays maps name -> read-only array view
+
+    Raises:
+        BundleError: on a bad magic, unsupported version or checksum mismatch
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(BUNDLE_MAGIC)) != BUNDLE_MAGIC:
+            raise BundleError(f"{path} is not a model bundle")
+        (manifest_size,) = struct.unpack('<Q', f.read(8))
+        manifest = json.loads(f.read(manifest_size).decode('utf-8'))
+
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise BundleError(f"Unsupported bundle format version: {manifest.get('format_version')}")
+
+    header_size = len(BUNDLE_MAGIC) + 8 + manifest_size
+    data_start = header_size + _padding(header_size)
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    data = mapped[data_start:data_start + manifest['data_size']]
+
+    if verify and hashlib.sha256(data).hexdigest() != manifest['checksum']:
+        raise BundleError(f"Checksum mismatch in {path}")
+
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        arrays[name] = np.frombuffer(
+            data, dtype=dtype, count=count, offset=entry['offset']
+        ).reshape(entry['shape'])
+
+    return arrays, manifest
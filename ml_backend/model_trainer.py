@@ -3,43 +3,78 @@ ML Model Training Module - Creates Synthetic Credit Score
 """
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import joblib
+import time
 import config
 from preprocessor import DataPreprocessor
+from tree_engine import FlatTreeEnsemble, CompiledTreeEnsemble, sklearn_predict
+from feature_pipeline import CompiledFeaturePipeline
+import model_bundle
 from data_loader import DataLoader
 
+# Boosting estimators selectable with config.MODEL_ENGINE
+ESTIMATORS = {
+    'gbr': GradientBoostingRegressor,
+    'hist': HistGradientBoostingRegressor
+}
+
 class CreditScoreModel:
     """Train and manage credit score prediction model"""
     
+    # Columns min-max normalized by create_synthetic_target
+    TARGET_RANGE_COLUMNS = ('INCOME', 'SAVINGS', 'DEBT')
+    
     def __init__(self):
         self.model = None
         self.preprocessor = DataPreprocessor()
+        self.pipeline = None
+        self.engine = None
         self.feature_names = []
         
-    def create_synthetic_target(self, df):
+    @classmethod
+    def target_ranges(cls, df):
+        """(min, max) of the columns the synthetic target normalizes"""
+        return {
+            col: (float(df[col].min()), float(df[col].max()))
+            for col in cls.TARGET_RANGE_COLUMNS if col in df.columns
+        }
+    
+    def create_synthetic_target(self, df, ranges=None):
         """
         Create synthetic credit score based on financial features
         Uses weighted combination of key financial indicators
+        
+        Args:
+            df: Raw data
+            ranges: Optional (min, max) per normalized column (see
+                target_ranges); defaults to the ranges of df itself, so
+                scoring newly arrived rows can reuse the training ranges
         """
+        ranges = ranges or self.target_ranges(df)
+        
+        def _normalized(col):
+            low, high = ranges[col]
+            return (df[col] - low) / (high - low + 1e-10)
+        
         # Key factors for credit score calculation
         score = 600  # Base score
         
         # Income factor (0-100 points)
         if 'INCOME' in df.columns:
-            income_normalized = (df['INCOME'] - df['INCOME'].min()) / (df['INCOME'].max() - df['INCOME'].min() + 1e-10)
+            income_normalized = _normalized('INCOME')
             score += income_normalized * 100
         
         # Savings factor (0-80 points)
         if 'SAVINGS' in df.columns:
-            savings_normalized = (df['SAVINGS'] - df['SAVINGS'].min()) / (df['SAVINGS'].max() - df['SAVINGS'].min() + 1e-10)
+            savings_normalized = _normalized('SAVINGS')
             score += savings_normalized * 80
         
         # Debt factor (negative impact, -100 to 0 points)
         if 'DEBT' in df.columns:
-            debt_normalized = (df['DEBT'] - df['DEBT'].min()) / (df['DEBT'].max() - df['DEBT'].min() + 1e-10)
+            debt_normalized = _normalized('DEBT')
             score -= debt_normalized * 100
         
         # Debt-to-Income ratio (negative impact, -50 to 0 points)
@@ -67,8 +102,13 @@ class CreditScoreModel:
         
         return score.astype(int)
     
-    def train(self, df, feature_cols):
-        """Train the credit score prediction model"""
+    def train(self, df, feature_cols, tune=None):
+        """
+        Train the credit score prediction model
+        
+        With tune (default config.TUNE_ENABLED) the hyperparameters are first
+        chosen by successive halving on the training rows (see tuning.py).
+        """
         print("\n🚀 Training Credit Score Model...")
         
         # Create synthetic target
@@ -81,30 +121,69 @@ class CreditScoreModel:
         
         # Preprocess features
         print("\n🔧 Preprocessing features...")
+        X = self.fit_preprocessor(df, feature_cols)
+        
+        # Split data
+        train_idx, test_idx = self.split_indices(len(X))
+        
+        params = None
+        if config.TUNE_ENABLED if tune is None else tune:
+            # Imported here: tuning builds estimators through this class
+            import tuning
+            search = tuning.successive_halving(X, y, train_idx)
+            tuning.save_report(search)
+            params = search['best_params']
+        
+        return self.fit(X, y, train_idx, test_idx, params=params)
+    
+    def fit_preprocessor(self, df, feature_cols):
+        """Fit the preprocessor and return the processed feature frame"""
         X_processed = self.preprocessor.fit_transform(df, feature_cols)
         X = X_processed[feature_cols]
         
         self.feature_names = feature_cols
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=config.TEST_SIZE, random_state=config.RANDOM_STATE
+        self.pipeline = self.preprocessor.compile()
+        return X
+    
+    @staticmethod
+    def split_indices(n_rows):
+        """Row positions of the train/test split (same rows as train_test_split on the data)"""
+        return train_test_split(
+            np.arange(n_rows), test_size=config.TEST_SIZE, random_state=config.RANDOM_STATE
         )
+    
+    def fit(self, X, y, train_idx, test_idx, engine=None, params=None):
+        """
+        Fit the regressor on processed features and report metrics
+        
+        Args:
+            X: Processed feature frame (from fit_preprocessor)
+            y: Target scores aligned with X
+            train_idx, test_idx: Row positions (from split_indices)
+            engine: 'gbr' or 'hist' (default config.MODEL_ENGINE)
+            params: Estimator hyperparameters (default model_params())
+        
+        Returns:
+            Dictionary of train/test metrics and fit time
+        """
+        X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+        y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
         
         print(f"\n📈 Training set: {len(X_train)} samples")
         print(f"📊 Test set: {len(X_test)} samples")
         
         # Train model (using Gradient Boosting for better performance)
-        print("\n🎯 Training Gradient Boosting Regressor...")
-        self.model = GradientBoostingRegressor(
-            n_estimators=100,
-            max_depth=5,
-            learning_rate=0.1,
-            random_state=config.RANDOM_STATE,
-            subsample=0.8
-        )
+        self.model = self.make_estimator(engine, params)
+        print(f"\n🎯 Training {type(self.model).__name__}...")
         
+        start = time.perf_counter()
         self.model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        print(f"   Fitted in {fit_seconds:.2f} s")
+        self._build_engine()
+        if self.engine is not None:
+            max_diff = self.engine.check_parity(self.model, X_test)
+            print(f"   Flat tree engine parity: max diff {max_diff:g}")
         
         # Evaluate
         y_pred_train = self.model.predict(X_train)
@@ -128,23 +207,76 @@ class CreditScoreModel:
             'test_rmse': test_rmse,
             'train_r2': train_r2,
             'test_r2': test_r2,
-            'test_mae': test_mae
+            'test_mae': test_mae,
+            'fit_seconds': fit_seconds
         }
     
+    @staticmethod
+    def model_params(engine=None):
+        """Gradient Boosting hyperparameters for the configured engine"""
+        engine = engine or config.MODEL_ENGINE
+        if engine not in ESTIMATORS:
+            raise ValueError(f"Unknown model engine '{engine}' (expected one of {sorted(ESTIMATORS)})")
+        if engine == 'hist':
+            # Same number of rounds and rate; leaf-wise trees capped in depth
+            # so the flat engine walks a bounded number of levels. Early
+            # stopping would hold out a validation split, so it is off.
+            return {
+                'max_iter': 100,
+                'max_depth': 6,
+                'max_leaf_nodes': 31,
+                'learning_rate': 0.1,
+                'early_stopping': False,
+                'random_state': config.RANDOM_STATE
+            }
+        return {
+            'n_estimators': 100,
+            'max_depth': 5,
+            'learning_rate': 0.1,
+            'random_state': config.RANDOM_STATE,
+            'subsample': 0.8
+        }
+    
+    @classmethod
+    def make_estimator(cls, engine=None, params=None):
+        """Unfitted estimator for the configured engine (default or given hyperparameters)"""
+        engine = engine or config.MODEL_ENGINE
+        return ESTIMATORS[engine](**(params or cls.model_params(engine)))
+    
     def predict(self, df):
         """Predict credit scores for new data"""
         if self.model is None:
             raise ValueError("Model must be trained before prediction")
         
-        X_processed = self.preprocessor.transform(df)
-        X = X_processed[self.feature_names]
+        if self.pipeline is not None:
+            X = self.pipeline.transform_frame(df)
+        else:
+            X_processed = self.preprocessor.transform(df)
+            X = X_processed[self.feature_names]
         
-        predictions = self.model.predict(X)
+        return self.predict_processed(X)
+    
+    def predict_processed(self, X):
+        """Predict credit scores for an already preprocessed feature matrix"""
+        if self.model is None:
+            raise ValueError("Model must be trained before prediction")
+        
+        if self.engine is not None and config.TREE_ENGINE == 'flat' and len(X) <= config.TREE_ENGINE_MAX_ROWS:
+            predictions = self.engine.predict(X)
+        else:
+            predictions = sklearn_predict(self.model, X)
         # Ensure predictions are in valid range
         predictions = np.clip(predictions, config.CREDIT_SCORE_MIN, config.CREDIT_SCORE_MAX)
         
         return predictions.astype(int)
     
+    def _build_engine(self):
+        """Export the fitted trees for the flat inference engine"""
+        if config.TREE_ENGINE == 'flat':
+            self.engine = FlatTreeEnsemble.from_sklearn(self.model)
+        else:
+            self.engine = None
+    
     def categorize_score(self, score):
         """Categorize credit score into risk categories"""
         for category, (min_score, max_score) in config.CREDIT_CATEGORIES.items():
@@ -159,11 +291,64 @@ class CreditScoreModel:
         print(f"\n✅ Model saved to {model_path}")
         print(f"✅ Preprocessor saved to {preprocessor_path}")
     
+    def save_bundle(self, bundle_path, feature_info=None, global_explanation=None):
+        """
+        Save the trees and preprocessing statistics as one model bundle
+        
+        Args:
+            bundle_path: Output file
+            feature_info: Training metadata (feature names, metrics, ...)
+            global_explanation: Precomputed global view (global_explanations.py)
+        
+        Returns:
+            Bundle checksum
+        """
+        engine = self.engine or FlatTreeEnsemble.from_sklearn(self.model)
+        pipeline = self.pipeline or self.preprocessor.compile()
+        
+        arrays = {f"tree.{name}": array for name, array in engine.to_arrays().items()}
+        arrays.update({f"pipeline.{name}": array for name, array in pipeline.to_arrays().items()})
+        metadata = {
+            'tree': engine.params(),
+            'pipeline': pipeline.metadata(),
+            'feature_info': feature_info or {},
+            'global': global_explanation
+        }
+        
+        checksum = model_bundle.save_bundle(bundle_path, arrays, metadata)
+        print(f"\n✅ Model bundle saved to {bundle_path}")
+        return checksum
+    
+    def load_bundle(self, bundle_path, verify=True):
+        """
+        Load trees and preprocessing statistics from a model bundle
+        
+        The arrays stay memory-mapped and the flat tree engine serves small
+        batches; larger batches (or ML_TREE_ENGINE=sklearn) use sklearn's
+        compiled tree predictors, rebuilt from the same arrays on first use.
+        
+        Returns:
+            Bundle manifest
+        """
+        arrays, manifest = model_bundle.load_bundle(bundle_path, verify=verify)
+        metadata = manifest['metadata']
+        
+        def _section(prefix):
+            return {name[len(prefix):]: array for name, array in arrays.items() if name.startswith(prefix)}
+        
+        self.engine = FlatTreeEnsemble.from_arrays(_section("tree."), metadata['tree'])
+        self.pipeline = CompiledFeaturePipeline.from_arrays(_section("pipeline."), metadata['pipeline'])
+        self.feature_names = self.pipeline.feature_names
+        self.model = CompiledTreeEnsemble(self.engine, len(self.feature_names))
+        print(f"\n✅ Model bundle loaded from {bundle_path}")
+        return manifest
+    
     def load(self, model_path, preprocessor_path):
         """Load model and preprocessor"""
         self.model = joblib.load(model_path)
         self.preprocessor.load(preprocessor_path)
         self.feature_names = self.preprocessor.feature_names
+        self.pipeline = self.preprocessor.compile()
+        self._build_engine()
         print(f"\n✅ Model loaded from {model_path}")
         print(f"✅ Preprocessor loaded from {preprocessor_path}")
-
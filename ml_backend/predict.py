@@ -4,11 +4,14 @@ Prediction Module - Use trained model to predict credit scores
 import pandas as pd
 import numpy as np
 import joblib
+import time
 from pathlib import Path
 import config
 from model_trainer import CreditScoreModel
 from shap_explainer import SHAPExplainer
-from explanation_generator import ExplanationGenerator
+from explanation_generator import ExplanationGenerator, resolve_fields
+from explanation_cache import ExplanationCache, fingerprint_files
+from metrics import stage
 
 class CreditScorePredictor:
     """Predict credit scores with SHAP explanations"""
@@ -18,102 +21,368 @@ class CreditScorePredictor:
         self.explainer = None
         self.explanation_generator = None
         self.feature_names = []
+        self.base_value = None
+        self.load_timings = {}
+        self.model_fingerprint = None
+        self.feature_info = {}
+        self.global_explanation = None
+        self.warmed_up = False
+        self.explanation_cache = ExplanationCache()
         
     def load_models(self):
-        """Load trained models and explainers"""
+        """Load trained models and explainers (model bundle, or legacy pickles)"""
+        timings = {}
+        
+        if config.MODEL_BUNDLE_PATH.exists():
+            self.model_fingerprint = self._load_bundle(timings)
+        else:
+            self.model_fingerprint = self._load_pickles(timings)
+        
+        # Base value (expected value) is fixed for a loaded explainer
+        base_value = self.explainer.explainer.expected_value
+        if isinstance(base_value, np.ndarray):
+            base_value = base_value[0]
+        self.base_value = base_value
+        
+        # Create explanation generator
+        self.explanation_generator = ExplanationGenerator(
+            self.explainer.explainer,
+            self.feature_names
+        )
+        
+        self.load_timings = timings
+        
+        # A new model invalidates every cached explanation
+        self.explanation_cache.reset(self.model_fingerprint)
+        print("✅ All models loaded successfully")
+    
+    def _load_bundle(self, timings):
+        """Load from the single memory-mapped bundle; returns the model fingerprint"""
+        # Load model (trees and preprocessing statistics stay memory-mapped)
+        start = time.perf_counter()
+        manifest = self.model.load_bundle(config.MODEL_BUNDLE_PATH)
+        self.feature_names = self.model.feature_names
+        self.feature_info = manifest['metadata'].get('feature_info', {})
+        self.global_explanation = manifest['metadata'].get('global')
+        timings['bundle'] = time.perf_counter() - start
+        
+        # Build the TreeSHAP explainer from the same tree arrays
+        start = time.perf_counter()
+        self.explainer = SHAPExplainer(self.model.engine, None, self.feature_names)
+        self.explainer.create_explainer(None, explainer_type='tree')
+        timings['explainer'] = time.perf_counter() - start
+        
+        return manifest['checksum'][:16]
+    
+    def _load_pickles(self, timings):
+        """Load the legacy four-pickle layout; returns the model fingerprint"""
         model_path = config.MODELS_DIR / "credit_score_model.pkl"
         preprocessor_path = config.MODELS_DIR / "preprocessor.pkl"
         explainer_path = config.MODELS_DIR / "shap_explainer.pkl"
         feature_info_path = config.MODELS_DIR / "feature_info.pkl"
         
         # Load model
+        start = time.perf_counter()
         self.model.load(model_path, preprocessor_path)
         self.feature_names = self.model.feature_names
+        timings['model'] = time.perf_counter() - start
         
         # Load explainer
+        start = time.perf_counter()
         self.explainer = SHAPExplainer(
             self.model.model,
             self.model.preprocessor,
             self.feature_names
         )
         self.explainer.explainer = joblib.load(explainer_path)
+        timings['explainer'] = time.perf_counter() - start
         
         # Load feature info
-        feature_info = joblib.load(feature_info_path)
+        start = time.perf_counter()
+        self.feature_info = joblib.load(feature_info_path)
+        timings['feature_info'] = time.perf_counter() - start
         
-        # Create explanation generator
-        self.explanation_generator = ExplanationGenerator(
-            self.explainer.explainer,
-            self.feature_names
-        )
+        return fingerprint_files([model_path, preprocessor_path, explainer_path])
+    
+    def warm_up(self, n_rows=8):
+        """
+        Push synthetic rows through every inference path
         
-        print("✅ All models loaded successfully")
+        The first sklearn/SHAP calls pay one-off initialization costs; running
+        them here keeps that off the first real request.
+        
+        Returns:
+            Elapsed time in seconds
+        """
+        if self.model.model is None:
+            self.load_models()
+        
+        start = time.perf_counter()
+        if n_rows > 0:
+            records = self.model.pipeline.synthetic_records(n_rows, random_state=config.RANDOM_STATE)
+            self.predict_score(records[0])
+            self.predict_with_explanation(records[0])
+            self.predict_with_explanation(records[0], mode='fast')
+            self.predict_score_many(records)
+            self.predict_with_explanation_many(records)
+            self.predict_batch(records, explain=True)
+            self.warmed_up = True
+        return time.perf_counter() - start
     
-    def predict_with_explanation(self, user_data):
+    def predict_with_explanation(self, user_data, mode=None, top_k=5, fields=None):
         """
         Predict credit score with full explanation
         
         Args:
             user_data: Dictionary or DataFrame with user features
+            mode: 'exact' (TreeSHAP) or 'fast' (path contributions);
+                default config.EXPLANATION_MODE
+            top_k: Positive/negative factors per explanation
+            fields: Explanation keys to build (default config.EXPLANATION_FIELDS, or all)
         
         Returns:
             Dictionary with prediction and explanation
         """
         if self.model.model is None:
             self.load_models()
+        mode = self.explainer.resolve_mode(mode)
+        fields = resolve_fields(fields)
+        
+        # Turn the request into a processed feature row exactly once
+        with stage('transform'):
+            if isinstance(user_data, dict):
+                feature_values = user_data
+                X = self.model.pipeline.transform_record(user_data)
+            else:
+                feature_values = user_data.iloc[0].to_dict()
+                X = self.model.pipeline.transform_frame(user_data.iloc[:1])
         
-        # Convert to DataFrame if needed
-        if isinstance(user_data, dict):
-            user_df = pd.DataFrame([user_data])
+        # Identical processed rows reuse the cached score and SHAP row
+        cache_key = self.explanation_cache.key(X, namespace=mode)
+        cached = self.explanation_cache.get(cache_key)
+        if cached is not None:
+            predicted_score, shap_values = cached
         else:
-            user_df = user_data.copy()
+            # Predict score
+            with stage('predict'):
+                predictions = self.model.predict_processed(X)
+            predicted_score = int(predictions[0])
+            
+            # Get SHAP values
+            with stage('shap'):
+                shap_values = self.explainer.explain_prediction(X, mode=mode)
+            self.explanation_cache.put(cache_key, self._cache_entry(predicted_score, shap_values))
         
-        # Predict score
-        predictions = self.model.predict(user_df)
-        predicted_score = int(predictions[0])
+        # The payload echoes this request's raw values, so it is never cached
+        return self._build_result(shap_values, feature_values, predicted_score, mode, top_k, fields)
+    
+    @staticmethod
+    def _cache_entry(predicted_score, shap_values):
+        """Model outputs only: (score, read-only SHAP row)"""
+        shap_values = np.array(shap_values, dtype=float)
+        shap_values.setflags(write=False)
+        return predicted_score, shap_values
+    
+    def _build_result(self, shap_values, feature_values, predicted_score, mode, top_k=5, fields=None):
+        """Wrap the generated explanation into the prediction payload"""
+        fields = resolve_fields(fields)
+        with stage('explain'):
+            explanation = self.explanation_generator.generate_explanation(
+                shap_values,
+                feature_values,
+                predicted_score,
+                self.base_value,
+                top_k=top_k,
+                fields=fields
+            )
+        if 'mode' in fields:
+            explanation['mode'] = mode
         
-        # Get SHAP values
-        X_processed = self.model.preprocessor.transform(user_df)
-        X = X_processed[self.feature_names]
-        shap_values = self.explainer.explain_prediction(X)
+        return {
+            'credit_score': predicted_score,
+            'category': self.model.categorize_score(predicted_score),
+            'explanation': explanation
+        }
+    
+    def get_global_explanation(self):
+        """
+        Global importance and partial dependence curves stored in the bundle
         
-        # Get base value (expected value)
-        base_value = self.explainer.explainer.expected_value
-        if isinstance(base_value, np.ndarray):
-            base_value = base_value[0]
+        Precomputed at train time, so nothing is scored here. None for
+        models saved without one (legacy pickles, older bundles).
+        """
+        if self.model.model is None:
+            self.load_models()
+        return self.global_explanation
+    
+    def predict_score(self, user_data):
+        """
+        Predict credit score only, without SHAP values or explanation
         
-        # Generate explanation
-        feature_values = user_df.iloc[0].to_dict()
-        explanation = self.explanation_generator.generate_explanation(
-            shap_values,
-            feature_values,
-            predicted_score,
-            base_value
-        )
+        Args:
+            user_data: Dictionary or DataFrame with user features
+        
+        Returns:
+            Dictionary with credit score and category
+        """
+        if self.model.model is None:
+            self.load_models()
+        
+        with stage('transform'):
+            if isinstance(user_data, dict):
+                X = self.model.pipeline.transform_record(user_data)
+            else:
+                X = self.model.pipeline.transform_frame(user_data.iloc[:1])
+        
+        with stage('predict'):
+            predicted_score = int(self.model.predict_processed(X)[0])
         
         return {
             'credit_score': predicted_score,
-            'category': explanation['category'],
-            'explanation': explanation
+            'category': self.model.categorize_score(predicted_score)
         }
     
-    def predict_batch(self, user_data_batch):
-        """Predict scores for multiple users"""
+    def predict_with_explanation_many(self, user_data_list, mode=None, top_k=5, fields=None):
+        """
+        Full explanations for several independent requests in one pass
+        
+        Runs one model prediction and one SHAP call on the stacked matrix,
+        then builds the same per-request payload as predict_with_explanation.
+        `top_k` and `fields` apply to every request; when `top_k` is a list,
+        both are lists with one entry per request (coalesced requests asking
+        for different payload shapes).
+        """
         if self.model.model is None:
             self.load_models()
-        
-        if isinstance(user_data_batch, list):
-            user_df = pd.DataFrame(user_data_batch)
+        mode = self.explainer.resolve_mode(mode)
+        if isinstance(top_k, list):
+            top_ks, field_sets = top_k, [resolve_fields(selected) for selected in fields]
         else:
-            user_df = user_data_batch.copy()
+            top_ks, field_sets = [top_k] * len(user_data_list), [resolve_fields(fields)] * len(user_data_list)
+        
+        with stage('transform'):
+            X = self.model.pipeline.transform_records(user_data_list)
+        
+        # Only rows missing from the cache go through the model and SHAP
+        keys = [self.explanation_cache.key(row, namespace=mode) for row in X]
+        outputs = [self.explanation_cache.get(key) for key in keys]
+        missing = [i for i, output in enumerate(outputs) if output is None]
+        if missing:
+            X_missing = X[missing]
+            with stage('predict'):
+                predictions = self.model.predict_processed(X_missing)
+            with stage('shap'):
+                shap_matrix = np.atleast_2d(self.explainer.explain_batch(X_missing, mode=mode))
+            for i, predicted_score, shap_values in zip(missing, predictions, shap_matrix):
+                outputs[i] = self._cache_entry(int(predicted_score), shap_values)
+                self.explanation_cache.put(keys[i], outputs[i])
+        
+        return [
+            self._build_result(shap_values, user_data, predicted_score, mode, request_top_k, request_fields)
+            for user_data, (predicted_score, shap_values), request_top_k, request_fields
+            in zip(user_data_list, outputs, top_ks, field_sets)
+        ]
+    
+    def predict_score_many(self, user_data_list):
+        """Score-only results for several independent requests in one pass"""
+        if self.model.model is None:
+            self.load_models()
         
-        predictions = self.model.predict(user_df)
+        with stage('transform'):
+            X = self.model.pipeline.transform_records(user_data_list)
+        with stage('predict'):
+            predictions = self.model.predict_processed(X)
+        
+        return [
+            {'credit_score': int(score), 'category': self.model.categorize_score(score)}
+            for score in predictions
+        ]
+    
+    def predict_batch(self, user_data_batch, explain=False, top_k=5, mode=None):
+        """
+        Predict scores for multiple users
+        
+        Args:
+            user_data_batch: List of dictionaries or DataFrame with user features
+            explain: Also compute SHAP-based explanations for every row
+            top_k: Number of positive/negative factors per explanation
+            mode: Explanation mode, 'exact' or 'fast'
+        
+        Returns:
+            Dictionary with scores, categories and (optionally) explanations
+        """
+        if self.model.model is None:
+            self.load_models()
+        
+        with stage('transform'):
+            if isinstance(user_data_batch, list):
+                records = user_data_batch
+                X = self.model.pipeline.transform_records(records)
+            else:
+                records = None
+                X = self.model.pipeline.transform_frame(user_data_batch)
+        
+        with stage('predict'):
+            predictions = self.model.predict_processed(X)
         categories = [self.model.categorize_score(score) for score in predictions]
         
-        return {
+        result = {
             'scores': predictions.tolist(),
             'categories': categories
         }
+        
+        if explain:
+            if records is None:
+                records = user_data_batch.to_dict('records')
+            # One TreeSHAP (or path contribution) call over the stacked matrix
+            mode = self.explainer.resolve_mode(mode)
+            with stage('shap'):
+                shap_matrix = self.explainer.explain_batch(X, mode=mode)
+            result['explanation_mode'] = mode
+            with stage('explain'):
+                result['explanations'] = self.explanation_generator.generate_batch_explanations(
+                    shap_matrix,
+                    records,
+                    predictions,
+                    self.base_value,
+                    top_k=top_k
+                )
+        
+        return result
+
+    def predict_columnar(self, body, content_type, accept=None, explain=False, top_k=5, mode=None,
+                         id_column='CUST_ID'):
+        """
+        Score an Arrow IPC or Parquet batch body
+
+        Args:
+            body: Request body bytes
+            content_type: Media type of the body (see columnar.MEDIA_TYPES)
+            accept: Preferred response media type (default: same as the body)
+            explain: Add top-k positive/negative factor columns
+            top_k: Number of factors per direction
+            mode: Explanation mode, 'exact' or 'fast'
+            id_column: Input column copied through to the output
+
+        Returns:
+            (response bytes, response media type)
+        """
+        import columnar
+
+        if self.model.model is None:
+            self.load_models()
+
+        fmt = columnar.body_format(content_type)
+        if fmt is None:
+            raise ValueError(f"Unsupported batch body type '{content_type}'")
+        out_fmt = columnar.body_format(accept) or fmt
+
+        with stage('parse'):
+            table = columnar.read_table(body, fmt)
+        scored = columnar.score_table(self, table, explain=explain, top_k=top_k, mode=mode, id_column=id_column)
+        with stage('serialize'):
+            content = columnar.write_table(scored, out_fmt)
+        return content, columnar.FORMAT_MEDIA_TYPES[out_fmt]
 
 # Example usage
 if __name__ == "__main__":
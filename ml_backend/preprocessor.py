@@ -7,6 +7,79 @@ from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.impute import SimpleImputer
 import joblib
 import config
+from feature_pipeline import CompiledFeaturePipeline
+from running_stats import QuantileSketch, merge_moments, nan_moments
+
+
+class PreprocessorStats:
+    """
+    One-pass, mergeable statistics for fitting a DataPreprocessor
+
+    Collects per numeric column the moments of the present values and a
+    quantile sketch (for the imputer median), and per categorical column
+    the set of labels. Update it chunk by chunk; statistics of separate
+    shards (other processes or machines) can be merged before fitting.
+    """
+
+    def __init__(self, feature_cols, sketch_k=None):
+        self.feature_cols = list(feature_cols)
+        self.sketch_k = sketch_k or config.PREPROCESS_SKETCH_K
+        self.numeric_cols = None
+        self.categorical_cols = None
+        self.moments = {'count': 0, 'mean': 0.0, 'm2': 0.0}
+        self.sketches = {}
+        self.vocabularies = {}
+        self.rows = 0
+
+    def _split_columns(self, data):
+        numeric = data.select_dtypes(include=[np.number]).columns.tolist()
+        categorical = data.select_dtypes(include=['object', 'category']).columns.tolist()
+        if self.numeric_cols is None:
+            self.numeric_cols, self.categorical_cols = numeric, categorical
+            self.sketches = {
+                col: QuantileSketch(self.sketch_k, seed=config.RANDOM_STATE) for col in numeric
+            }
+            self.vocabularies = {col: set() for col in categorical}
+            return
+        # A column missing everywhere in one chunk is parsed as float
+        for col in set(numeric) ^ set(self.numeric_cols):
+            if not data[col].isna().all():
+                raise ValueError(f"Column '{col}' changes between numeric and categorical across chunks")
+
+    def update(self, chunk):
+        """Add a chunk of raw rows (DataFrame)"""
+        data = chunk[self.feature_cols]
+        self._split_columns(data)
+        values = data[self.numeric_cols].to_numpy(dtype=float)
+        self.moments = merge_moments(self.moments, nan_moments(values))
+        for i, col in enumerate(self.numeric_cols):
+            self.sketches[col].update(values[:, i])
+        for col in self.categorical_cols:
+            self.vocabularies[col].update(data[col].astype(str).unique())
+        self.rows += len(data)
+        return self
+
+    def merge(self, other):
+        """Fold in the statistics of another shard"""
+        if other.numeric_cols is None:
+            return self
+        if self.numeric_cols is None:
+            self.__dict__.update(other.__dict__)
+            return self
+        if other.numeric_cols != self.numeric_cols or other.categorical_cols != self.categorical_cols:
+            raise ValueError("Shards have different column types")
+        self.moments = merge_moments(self.moments, other.moments)
+        for col, sketch in other.sketches.items():
+            self.sketches[col].merge(sketch)
+        for col, labels in other.vocabularies.items():
+            self.vocabularies[col] |= labels
+        self.rows += other.rows
+        return self
+
+    def medians(self):
+        """Approximate median of every numeric column"""
+        return np.array([self.sketches[col].quantile(0.5) for col in self.numeric_cols])
+
 
 class DataPreprocessor:
     """Preprocess data for ML pipeline"""
@@ -24,7 +97,7 @@ class DataPreprocessor:
         
         # Separate numeric and categorical features
         numeric_cols = df[feature_cols].select_dtypes(include=[np.number]).columns.tolist()
-        categorical_cols = df[feature_cols].select_dtypes(include=['object']).columns.tolist()
+        categorical_cols = df[feature_cols].select_dtypes(include=['object', 'category']).columns.tolist()
         
         # Process numeric features
         df_processed = df.copy()
@@ -53,6 +126,64 @@ class DataPreprocessor:
         
         return df_processed
     
+    def fit_stream(self, chunks, feature_cols, sketch_k=None):
+        """
+        Fit from an iterable of DataFrame chunks in one pass (out of core)
+
+        Only the statistics are kept, never the rows. Equivalent to
+        fit_transform within these tolerances:
+        - imputer medians: approximate (quantile sketch, rank within about
+          1/sketch_k of the rows of the true median);
+        - scaler mean/variance: exact up to float rounding, given the
+          medians (missing values count as the median, as in fit_transform);
+        - label encoders: identical classes.
+
+        Returns:
+            self (fitted); transform chunk by chunk with compile()
+        """
+        stats = PreprocessorStats(feature_cols, sketch_k)
+        for chunk in chunks:
+            stats.update(chunk)
+        return self.fit_stats(stats)
+
+    def fit_stats(self, stats):
+        """Fit the imputer, scaler and encoders from PreprocessorStats"""
+        if not stats.rows:
+            raise ValueError("No rows to fit the preprocessor on")
+        numeric_cols = stats.numeric_cols
+        medians = stats.medians()
+
+        self.imputer = SimpleImputer(strategy='median')
+        self.scaler = StandardScaler()
+        self.label_encoders = {}
+
+        if len(numeric_cols) > 0:
+            # A one-row fit sets up the estimators; the statistics replace it
+            self.imputer.fit(pd.DataFrame([medians], columns=numeric_cols))
+
+            # Scaler sees imputed data: missing entries count as the median
+            missing = stats.rows - stats.moments['count']
+            imputed = merge_moments(stats.moments, {'count': missing, 'mean': medians, 'm2': 0.0})
+            var = imputed['m2'] / stats.rows
+            mean = imputed['mean']
+            self.scaler.fit(pd.DataFrame(np.zeros((1, len(numeric_cols))), columns=numeric_cols))
+            self.scaler.mean_ = mean
+            self.scaler.var_ = var
+            # Same near-constant test as StandardScaler
+            eps = np.finfo(np.float64).eps
+            constant = var <= stats.rows * eps * var + (stats.rows * mean * eps) ** 2
+            self.scaler.scale_ = np.where(constant, 1.0, np.sqrt(var))
+            self.scaler.n_samples_seen_ = stats.rows
+
+        for col in stats.categorical_cols:
+            le = LabelEncoder()
+            le.fit(sorted(stats.vocabularies[col]))
+            self.label_encoders[col] = le
+
+        self.feature_names = stats.feature_cols
+        self.is_fitted = True
+        return self
+
     def transform(self, df):
         """Transform new data using fitted preprocessor"""
         if not self.is_fitted:
@@ -62,7 +193,7 @@ class DataPreprocessor:
         
         # Get feature columns
         numeric_cols = [col for col in self.feature_names if col in df.columns and pd.api.types.is_numeric_dtype(df[col])]
-        categorical_cols = [col for col in self.feature_names if col in df.columns and df[col].dtype == 'object']
+        categorical_cols = [col for col in self.feature_names if col in df.columns and not pd.api.types.is_numeric_dtype(df[col])]
         
         # Handle missing values
         if len(numeric_cols) > 0:
@@ -88,6 +219,10 @@ class DataPreprocessor:
         
         return df_processed
     
+    def compile(self):
+        """Compile fitted statistics into an array-native inference pipeline"""
+        return CompiledFeaturePipeline.from_preprocessor(self)
+    
     def save(self, filepath):
         """Save preprocessor to disk"""
         joblib.dump({
@@ -108,4 +243,3 @@ class DataPreprocessor:
         self.feature_names = data['feature_names']
         self.is_fitted = data['is_fitted']
         print(f"✅ Preprocessor loaded from {filepath}")
-
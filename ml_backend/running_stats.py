@@ -0,0 +1,114 @@
+"""
+Running Statistics Module - Mergeable one-pass summaries
+
+Moments (count, mean, M2) and quantile sketches that are updated chunk by
+chunk and merged across chunks, processes or machines, for statistics of
+data that never sits in memory at once.
+"""
+import numpy as np
+
+
+def moments(values):
+    """(count, mean, M2) summary of a 2D array without missing values"""
+    mean = values.mean(axis=0)
+    return {'count': len(values), 'mean': mean, 'm2': ((values - mean) ** 2).sum(axis=0)}
+
+
+def nan_moments(values):
+    """(count, mean, M2) per column of a 2D array, ignoring NaN"""
+    present = ~np.isnan(values)
+    count = present.sum(axis=0)
+    filled = np.where(present, values, 0.0)
+    mean = filled.sum(axis=0) / np.maximum(count, 1)
+    m2 = (np.where(present, values - mean, 0.0) ** 2).sum(axis=0)
+    return {'count': count, 'mean': mean, 'm2': m2}
+
+
+def merge_moments(a, b):
+    """
+    Merge two (count, mean, M2) summaries (Chan et al. parallel update)
+
+    Each summary is a dict with a row count (scalar or per column),
+    per-column means and per-column sums of squared deviations.
+    """
+    count = a['count'] + b['count']
+    weight = np.where(count > 0, b['count'] / np.maximum(count, 1), 0.0)
+    delta = b['mean'] - a['mean']
+    return {
+        'count': count,
+        'mean': a['mean'] + delta * weight,
+        'm2': a['m2'] + b['m2'] + delta ** 2 * a['count'] * weight
+    }
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch (KLL compactor hierarchy)
+
+    Values enter level 0 with weight 1; a level holding more than its
+    capacity is sorted and every other value (random offset) moves up one
+    level with double weight. Memory is about 3k values whatever the input
+    size, and the rank error of a quantile is about 1/k of the count (with
+    k=1024: within 0.2% of the rows on either side of the true median).
+    """
+
+    def __init__(self, k=1024, seed=None):
+        self.k = int(k)
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        # Lower levels hold geometrically fewer values than the top one
+        depth = len(self.levels) - 1 - level
+        return max(8, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """Add a 1D array of values (NaN is skipped)"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        for level, values in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], values])
+        self.count += other.count
+        self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            values = self.levels[level]
+            if len(values) > self._capacity(level):
+                values = np.sort(values)
+                # An odd value out stays at this level
+                keep = values[:1] if len(values) % 2 else values[:0]
+                pairs = values[len(keep):]
+                promoted = pairs[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q):
+        """Approximate q-quantile (NaN when the sketch is empty)"""
+        if self.count == 0:
+            return float('nan')
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(v), 2.0 ** level) for level, v in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        target = q * cumulative[-1]
+        # Average the two middle values like np.median when they straddle q
+        below = values[order][np.searchsorted(cumulative, target, side='left')]
+        above = values[order][min(np.searchsorted(cumulative, target, side='right'), len(values) - 1)]
+        return float((below + above) / 2)
+
+    def __len__(self):
+        return sum(len(values) for values in self.levels)
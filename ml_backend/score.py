@@ -0,0 +1,154 @@
+"""
+Offline Bulk Scoring CLI
+
+Reads a customer CSV in chunks, scores the chunks on a process pool (each
+worker loads the model once) and appends the results to an output CSV in
+input order. Only `workers * 2` chunks are in flight at a time, so memory
+use depends on the chunk size, not on the file size.
+
+Usage:
+    python score.py ../public/credit_score.csv -o output/scores.csv
+    python score.py customers.csv --explain --top-k 3 --workers 4 --chunk-size 20000
+"""
+import argparse
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import config
+from shap_explainer import EXPLANATION_MODES
+
+# Predictor owned by each worker process (loaded once per worker)
+_worker_predictor = None
+
+
+def _init_worker():
+    """Process-pool initializer: load the models once in this worker"""
+    global _worker_predictor
+    from predict import CreditScorePredictor
+    _worker_predictor = CreditScorePredictor()
+    _worker_predictor.load_models()
+
+
+def _format_factors(names, shap_row, indices, mask):
+    return ";".join(f"{names[idx]}={shap_row[idx]:+.2f}" for idx in indices[mask])
+
+
+def score_chunk(df, id_column=None, explain=False, top_k=5, explain_mode=None):
+    """
+    Score one chunk of raw rows
+
+    Args:
+        df: DataFrame chunk of the input file
+        id_column: Column copied through to the output (if present)
+        explain: Add the top-k positive/negative SHAP factors per row
+        top_k: Number of factors per direction
+        explain_mode: 'exact' (TreeSHAP) or 'fast' (path contributions)
+
+    Returns:
+        DataFrame with credit_score, category and optional factor columns
+    """
+    predictor = _worker_predictor
+    model = predictor.model
+    X = model.pipeline.transform_frame(df)
+    scores = model.predict_processed(X)
+
+    out = pd.DataFrame(index=df.index)
+    if id_column and id_column in df.columns:
+        out[id_column] = df[id_column].to_numpy()
+    out['credit_score'] = scores
+    out['category'] = [model.categorize_score(score) for score in scores]
+
+    if explain:
+        shap_matrix = np.atleast_2d(predictor.explainer.explain_batch(X, mode=explain_mode))
+        positive_idx, negative_idx, positive_mask, negative_mask = \
+            predictor.explanation_generator.top_factors(shap_matrix, top_k)
+        names = model.feature_names
+        out['top_positive'] = [
+            _format_factors(names, shap_matrix[row], positive_idx[row], positive_mask[row])
+            for row in range(len(df))
+        ]
+        out['top_negative'] = [
+            _format_factors(names, shap_matrix[row], negative_idx[row], negative_mask[row])
+            for row in range(len(df))
+        ]
+
+    return out
+
+
+def score_file(input_path, output_path, chunk_size=None, workers=None, explain=False, top_k=5,
+               id_column='CUST_ID', explain_mode=None):
+    """
+    Score a CSV file chunk by chunk on a process pool
+
+    Returns:
+        Dictionary with rows scored, elapsed seconds and rows/sec
+    """
+    chunk_size = chunk_size or config.SCORE_CHUNK_SIZE
+    workers = workers or config.SCORE_WORKERS
+    max_pending = workers * 2
+
+    print(f"🚀 Scoring {input_path} with {workers} workers ({chunk_size} rows per chunk)")
+    start = time.perf_counter()
+    rows = 0
+    chunks = 0
+    pending = deque()
+
+    def write(future, first):
+        result = future.result()
+        result.to_csv(out, header=first, index=False)
+        return len(result)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker
+    ) as pool, open(output_path, 'w', newline='') as out:
+        for chunk in pd.read_csv(input_path, chunksize=chunk_size):
+            # Bound the read-ahead: wait for the oldest chunk before reading more
+            if len(pending) >= max_pending:
+                rows += write(pending.popleft(), chunks == 0)
+                chunks += 1
+                if chunks % 10 == 0:
+                    print(f"   {rows:,} rows ({rows / (time.perf_counter() - start):,.0f} rows/sec)")
+            pending.append(pool.submit(score_chunk, chunk, id_column, explain, top_k, explain_mode))
+
+        while pending:
+            rows += write(pending.popleft(), chunks == 0)
+            chunks += 1
+
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed else 0.0
+    print(f"✅ Scored {rows:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/sec) -> {output_path}")
+    return {'rows': rows, 'seconds': elapsed, 'rows_per_sec': rate}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a customer CSV file offline")
+    parser.add_argument("input", nargs="?", default=str(config.CSV_FILE_PATH), help="Input CSV file")
+    parser.add_argument("-o", "--output", default=str(config.OUTPUT_DIR / "scores.csv"), help="Output CSV file")
+    parser.add_argument("--chunk-size", type=int, default=config.SCORE_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=config.SCORE_WORKERS)
+    parser.add_argument("--explain", action="store_true", help="Add top-k SHAP factors per row")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--explain-mode", choices=EXPLANATION_MODES, default=None,
+                        help="'exact' TreeSHAP or 'fast' path contributions (default ML_EXPLANATION_MODE)")
+    parser.add_argument("--id-column", default="CUST_ID", help="Input column copied to the output")
+    args = parser.parse_args(argv)
+
+    score_file(
+        args.input,
+        args.output,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        explain=args.explain,
+        top_k=args.top_k,
+        id_column=args.id_column,
+        explain_mode=args.explain_mode
+    )
+
+
+if __name__ == "__main__":
+    main()
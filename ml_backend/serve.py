@@ -0,0 +1,298 @@
+"""
+Pre-fork Production Server for the Credit Score ML API
+
+Loads and warms up the model once in a parent process, freezes the garbage
+collector so the loaded objects are never touched again, then forks N
+uvicorn workers that share one listening socket and the model pages
+copy-on-write.
+
+Usage:
+    python serve.py --workers 4 --port 8000 --max-requests 10000
+
+Signals (sent to the parent):
+    SIGTERM / SIGINT  graceful shutdown of all workers
+    SIGHUP            rolling restart (one worker replaced at a time)
+    SIGUSR1           print a per-worker memory report
+"""
+import argparse
+import gc
+import os
+import random
+import signal
+import socket
+import sys
+import time
+import traceback
+from collections import deque
+import config
+
+
+def read_memory(pid):
+    """Rss/Pss/shared/private memory of a process in MB (Linux only)"""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        'rss': fields.get('Rss', 0.0),
+        'pss': fields.get('Pss', 0.0),
+        'shared': fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0),
+        'private': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)
+    }
+
+
+class PreforkServer:
+    """Parent process that preloads the model and supervises forked workers"""
+
+    def __init__(self, host, port, workers, max_requests=0, max_requests_jitter=0,
+                 memory_report_interval=0, max_crashes=None, respawn_backoff=None):
+        self.host = host
+        self.port = port
+        self.n_workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.memory_report_interval = memory_report_interval
+        self.max_crashes = config.SERVE_MAX_CRASHES if max_crashes is None else max_crashes
+        self.respawn_backoff = config.SERVE_RESPAWN_BACKOFF if respawn_backoff is None else respawn_backoff
+        self.workers = {}  # pid -> slot
+        self.pending = {}  # slot -> monotonic time its replacement is due
+        self.crashes = deque()  # monotonic times of recent worker crashes
+        self.socket = None
+        self.stopping = False
+        self.restart_requested = False
+        self.report_requested = False
+
+    def preload(self):
+        """Load and warm up the model in the parent, before any fork"""
+        # One inference thread per worker process: parallelism comes from forking
+        config.INFERENCE_EXECUTOR = 'thread'
+        config.INFERENCE_WORKERS = 1
+        import api_server
+
+        start = time.perf_counter()
+        predictor = api_server.get_predictor()
+        predictor.warm_up(config.WARMUP_ROWS)
+        print(f"✅ Model preloaded in parent {os.getpid()} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        return api_server.app
+
+    def bind(self):
+        """Open the listening socket shared by every worker"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        self.socket = sock
+
+    def spawn(self, slot, app):
+        """Fork one worker serving `app` on the shared socket"""
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = slot
+            return pid
+
+        # Child: default signal handling, uvicorn installs its own TERM/INT handlers
+        for sig in (signal.SIGHUP, signal.SIGUSR1, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+
+        import uvicorn
+        limit = None
+        if self.max_requests:
+            limit = self.max_requests + random.randint(0, self.max_requests_jitter)
+        server = uvicorn.Server(uvicorn.Config(
+            app,
+            lifespan="on",
+            limit_max_requests=limit,
+            log_level="info"
+        ))
+        code = 1
+        try:
+            server.run(sockets=[self.socket])
+            # uvicorn returns without raising when lifespan startup fails
+            code = 0 if server.started else 3
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def memory_report(self):
+        """Print memory usage of the parent and every worker"""
+        print("\n📊 Memory report (MB)")
+        print(f"   {'process':>10s} {'pid':>7s} {'rss':>8s} {'pss':>8s} {'shared':>8s} {'private':>8s}")
+        rows = [("parent", os.getpid())] + [
+            (f"worker {slot}", pid) for pid, slot in sorted(self.workers.items(), key=lambda item: item[1])
+        ]
+        for label, pid in rows:
+            usage = read_memory(pid)
+            if usage is None:
+                print(f"   {label:>10s} {pid:>7d}  (unavailable)")
+                continue
+            print(f"   {label:>10s} {pid:>7d} {usage['rss']:8.1f} {usage['pss']:8.1f} "
+                  f"{usage['shared']:8.1f} {usage['private']:8.1f}")
+
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def _handle_restart(self, signum, frame):
+        self.restart_requested = True
+
+    def _handle_report(self, signum, frame):
+        self.report_requested = True
+
+    def _rolling_restart(self, app):
+        """Replace workers one at a time so capacity never drops to zero"""
+        print("🔄 Rolling restart of workers")
+        for pid, slot in list(self.workers.items()):
+            self.spawn(slot, app)
+            self._stop_worker(pid)
+
+    def _stop_worker(self, pid, timeout=30):
+        """Ask one worker to finish in-flight requests and exit"""
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            done, _ = os.waitpid(pid, os.WNOHANG)
+            if done:
+                break
+            time.sleep(0.1)
+        else:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.pop(pid, None)
+
+    def _worker_exited(self, pid, status):
+        """
+        Schedule the replacement of a worker that exited
+
+        Clean exits (max-requests recycling) are replaced at once. Crashes
+        are replaced after a backoff that doubles with every crash in the
+        last minute.
+
+        Returns:
+            False once more than max_crashes workers crashed within a minute
+        """
+        slot = self.workers.pop(pid)
+        code = os.waitstatus_to_exitcode(status)
+        now = time.monotonic()
+        if code == 0:
+            print(f"♻️  Worker {slot} (pid {pid}) exited; respawning")
+            self.pending[slot] = now
+            return True
+
+        self.crashes.append(now)
+        while self.crashes and now - self.crashes[0] > 60:
+            self.crashes.popleft()
+        if self.max_crashes and len(self.crashes) > self.max_crashes:
+            print(f"❌ {len(self.crashes)} worker crashes in the last minute; giving up")
+            return False
+        delay = min(self.respawn_backoff * 2 ** (len(self.crashes) - 1), 30.0)
+        print(f"⚠️  Worker {slot} (pid {pid}) crashed with exit code {code}; respawning in {delay:.1f} s")
+        self.pending[slot] = now + delay
+        return True
+
+    def run(self):
+        """
+        Preload, fork the workers and supervise them until shut down
+
+        Returns:
+            Process exit status: 0 after a requested shutdown, 1 if workers kept crashing
+        """
+        exit_status = 0
+        app = self.preload()
+        self.bind()
+
+        # Move every loaded object out of the collector's reach so that GC
+        # passes in the workers do not write to (and un-share) model pages
+        gc.collect()
+        gc.freeze()
+
+        print(f"🚀 Forking {self.n_workers} workers on http://{self.host}:{self.port}")
+        for slot in range(self.n_workers):
+            self.spawn(slot, app)
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_restart)
+        signal.signal(signal.SIGUSR1, self._handle_report)
+
+        next_report = time.monotonic() + self.memory_report_interval
+        while not self.stopping:
+            # Re-fork workers that exited (recycled after max requests or crashed)
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid and pid in self.workers and not self._worker_exited(pid, status):
+                exit_status = 1
+                break
+            for slot, due in list(self.pending.items()):
+                if time.monotonic() >= due:
+                    del self.pending[slot]
+                    self.spawn(slot, app)
+
+            if self.restart_requested:
+                self.restart_requested = False
+                self._rolling_restart(app)
+
+            if self.report_requested or (
+                self.memory_report_interval and time.monotonic() >= next_report
+            ):
+                self.report_requested = False
+                next_report = time.monotonic() + self.memory_report_interval
+                self.memory_report()
+
+            if not pid:
+                time.sleep(0.2)
+
+        print("🛑 Shutting down workers")
+        for pid in list(self.workers):
+            self._stop_worker(pid)
+        self.socket.close()
+        return exit_status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-fork production server for the Credit Score ML API")
+    parser.add_argument("--host", default=config.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS)
+    parser.add_argument("--max-requests", type=int, default=config.SERVE_MAX_REQUESTS,
+                        help="Recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--max-requests-jitter", type=int, default=config.SERVE_MAX_REQUESTS_JITTER)
+    parser.add_argument("--memory-report-interval", type=float, default=config.SERVE_MEMORY_REPORT_INTERVAL,
+                        help="Seconds between per-worker memory reports (0 = only on SIGUSR1)")
+    parser.add_argument("--max-crashes", type=int, default=config.SERVE_MAX_CRASHES,
+                        help="Shut down after more than this many worker crashes in a minute (0 = never)")
+    parser.add_argument("--respawn-backoff", type=float, default=config.SERVE_RESPAWN_BACKOFF,
+                        help="Seconds before re-forking a crashed worker, doubled per recent crash")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork(); use 'python api_server.py' on this platform")
+
+    sys.exit(PreforkServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        memory_report_interval=args.memory_report_interval,
+        max_crashes=args.max_crashes,
+        respawn_backoff=args.respawn_backoff
+    ).run())
+
+
+if __name__ == "__main__":
+    main()
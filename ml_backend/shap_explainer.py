@@ -1,13 +1,19 @@
 """
 SHAP Explainability Module
 """
+import time
 import numpy as np
 import pandas as pd
 import shap
 import joblib
 from model_trainer import CreditScoreModel
+from tree_engine import FlatTreeEnsemble
 import config
 
+# 'exact': path-dependent TreeSHAP; 'fast': Saabas path contributions from
+# the flat trees (same base value, same sum, approximate per-feature split)
+EXPLANATION_MODES = ('exact', 'fast')
+
 class SHAPExplainer:
     """Generate SHAP explanations for credit score predictions"""
     
@@ -17,6 +23,7 @@ class SHAPExplainer:
         self.feature_names = feature_names
         self.explainer = None
         self.shap_values = None
+        self._flat_engine = None
         
     def create_explainer(self, X_background, explainer_type='tree'):
         """
@@ -26,8 +33,12 @@ class SHAPExplainer:
         print("\n🔍 Creating SHAP Explainer...")
         
         if explainer_type == 'tree':
-            # TreeExplainer for tree-based models (faster)
-            self.explainer = shap.TreeExplainer(self.model)
+            # TreeExplainer for tree-based models (faster); a flat tree
+            # engine is described to SHAP directly from its arrays
+            if hasattr(self.model, 'to_shap_model'):
+                self.explainer = shap.TreeExplainer(self.model.to_shap_model())
+            else:
+                self.explainer = shap.TreeExplainer(self.model)
         else:
             # KernelExplainer (slower but works for any model)
             self.explainer = shap.KernelExplainer(
@@ -38,19 +49,41 @@ class SHAPExplainer:
         print("✅ SHAP Explainer created")
         return self.explainer
     
-    def explain_prediction(self, X_instance):
+    def resolve_mode(self, mode=None):
+        """Validate an explanation mode (None -> config.EXPLANATION_MODE)"""
+        mode = mode or config.EXPLANATION_MODE
+        if mode not in EXPLANATION_MODES:
+            raise ValueError(f"Unknown explanation mode '{mode}' (expected one of {EXPLANATION_MODES})")
+        return mode
+    
+    def flat_engine(self):
+        """Flat tree arrays of the model (exported once for sklearn estimators)"""
+        if self._flat_engine is None:
+            if hasattr(self.model, 'path_contributions'):
+                self._flat_engine = self.model
+            else:
+                self._flat_engine = FlatTreeEnsemble.from_sklearn(self.model)
+        return self._flat_engine
+    
+    def explain_prediction(self, X_instance, mode=None):
         """
         Generate SHAP values for a single prediction
         X_instance: Single row of features (DataFrame or array)
+        mode: 'exact' (TreeSHAP) or 'fast' (path contributions)
         """
-        if self.explainer is None:
+        mode = self.resolve_mode(mode)
+        if mode == 'exact' and self.explainer is None:
             raise ValueError("Explainer must be created first. Call create_explainer()")
         
-        # Ensure X_instance is in correct format
+        # Ensure X_instance is in correct format (arrays are assumed to be
+        # in feature order already and are passed through without pandas)
         if isinstance(X_instance, pd.DataFrame):
             X_instance = X_instance[self.feature_names]
         else:
-            X_instance = pd.DataFrame(X_instance, columns=self.feature_names)
+            X_instance = np.asarray(X_instance, dtype=float).reshape(1, -1)
+        
+        if mode == 'fast':
+            return self.flat_engine().path_contributions(np.asarray(X_instance, dtype=float))
         
         # Get SHAP values
         shap_values = self.explainer.shap_values(X_instance)
@@ -61,18 +94,77 @@ class SHAPExplainer:
         
         return shap_values
     
-    def explain_batch(self, X_batch):
+    def explain_batch(self, X_batch, mode=None):
         """Generate SHAP values for multiple predictions"""
-        if self.explainer is None:
+        mode = self.resolve_mode(mode)
+        if mode == 'exact' and self.explainer is None:
             raise ValueError("Explainer must be created first. Call create_explainer()")
         
         if isinstance(X_batch, pd.DataFrame):
             X_batch = X_batch[self.feature_names]
         
+        # TreeSHAP's additivity check fails on zero rows
+        if len(X_batch) == 0:
+            return np.zeros((0, len(self.feature_names)))
+        
+        if mode == 'fast':
+            return self.flat_engine().path_contributions(np.asarray(X_batch, dtype=float))
+        
         shap_values = self.explainer.shap_values(X_batch)
         
         if isinstance(shap_values, list):
             shap_values = shap_values[0]
         
         return shap_values
-
+    
+    def fidelity_report(self, X, ks=(1, 3, 5)):
+        """
+        Compare fast path contributions against exact TreeSHAP on X
+        
+        For each k: how many of the exact top-k features (by |value|) the fast
+        top-k also contains, how often the ranked top-k lists are identical,
+        and how often the top-k positive and negative factor sets (as shown
+        to users) are identical.
+        
+        Returns:
+            Dictionary of agreement rates and timings
+        """
+        X = np.asarray(X, dtype=float)
+        
+        start = time.perf_counter()
+        exact = self.explain_batch(X, mode='exact')
+        exact_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        fast = self.explain_batch(X, mode='fast')
+        fast_seconds = time.perf_counter() - start
+        
+        def ranked(values):
+            # Stable descending order of |value| per row
+            return np.argsort(-np.abs(values), axis=1, kind='stable')
+        
+        def factor_sets(values, k):
+            # The top-k positive and top-k negative features of every row
+            order = np.argsort(values, axis=1, kind='stable')
+            top, bottom = order[:, ::-1][:, :k], order[:, :k]
+            positive = np.take_along_axis(values, top, axis=1) > 0
+            negative = np.take_along_axis(values, bottom, axis=1) < 0
+            return [(frozenset(t[p]), frozenset(b[n])) for t, p, b, n in zip(top, positive, bottom, negative)]
+        
+        exact_rank, fast_rank = ranked(exact), ranked(fast)
+        report = {
+            'rows': len(X),
+            'exact_ms_per_row': exact_seconds / len(X) * 1000,
+            'fast_ms_per_row': fast_seconds / len(X) * 1000,
+            # Share of total |attribution| moved between features
+            'relative_l1_difference': float(np.abs(exact - fast).sum() / np.abs(exact).sum()),
+            'top_k': {}
+        }
+        for k in ks:
+            overlap = [len(set(e[:k]) & set(f[:k])) / k for e, f in zip(exact_rank, fast_rank)]
+            same_factors = [e == f for e, f in zip(factor_sets(exact, k), factor_sets(fast, k))]
+            report['top_k'][k] = {
+                'overlap': float(np.mean(overlap)),
+                'same_ranking': float(np.mean(np.all(exact_rank[:, :k] == fast_rank[:, :k], axis=1))),
+                'same_factors': float(np.mean(same_factors))
+            }
+        return report
@@ -0,0 +1,118 @@
+"""
+Pipeline Stage Cache Module - Disk-cached, timed pipeline stages
+"""
+import hashlib
+import json
+import time
+import tracemalloc
+from pathlib import Path
+import joblib
+import config
+
+# Bump to invalidate every cached stage after changing stage code
+CACHE_VERSION = 1
+
+
+def stage_key(name, inputs=(), params=None):
+    """
+    Cache key of a stage: hash of its name, its inputs' keys and its config
+
+    Args:
+        name: Stage name
+        inputs: Keys of the stages (or sources) this stage consumes
+        params: JSON-serializable configuration the output depends on
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(json.dumps(
+        {'version': CACHE_VERSION, 'stage': name, 'inputs': list(inputs), 'params': params or {}},
+        sort_keys=True, default=str
+    ).encode())
+    return digest.hexdigest()
+
+
+class StageRunner:
+    """
+    Run named pipeline stages with an on-disk cache and per-stage timings
+
+    A stage whose key (inputs + config) matches a cached output is loaded
+    from disk instead of recomputed. Every stage reports wall time; with
+    trace_memory on, also peak traced memory (tracemalloc, which covers
+    NumPy buffers). Tracing slows allocation-heavy stages down, so time
+    and memory are best measured in separate runs.
+    """
+
+    def __init__(self, cache_dir=None, enabled=None, trace_memory=None):
+        self.cache_dir = Path(cache_dir or config.PIPELINE_CACHE_DIR)
+        self.enabled = config.PIPELINE_CACHE_ENABLED if enabled is None else enabled
+        self.trace_memory = config.PIPELINE_TRACE_MEMORY if trace_memory is None else trace_memory
+        self.report = []
+
+    def _path(self, name, key):
+        return self.cache_dir / f"{name}-{key}.joblib"
+
+    def run(self, name, fn, inputs=(), params=None, cache=True, is_current=None):
+        """
+        Run (or load) one stage
+
+        Args:
+            name: Stage name
+            fn: Zero-argument callable producing the stage output
+            inputs: Keys of the stages it depends on
+            params: Configuration the output depends on
+            cache: Whether this stage's output is written to disk
+            is_current: Optional callable(key) -> bool for stages whose
+                output is an artifact of its own (e.g. the model bundle);
+                when it returns True the stage is skipped
+
+        Returns:
+            (output, key); output is None for a skipped is_current stage
+        """
+        key = stage_key(name, inputs, params)
+        path = self._path(name, key)
+        use_cache = self.enabled and cache and is_current is None
+
+        tracing = tracemalloc.is_tracing()
+        if self.trace_memory:
+            if not tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+
+        status = 'ran'
+        output = None
+        if self.enabled and is_current is not None and is_current(key):
+            status = 'cached'
+        elif use_cache and path.exists():
+            try:
+                output = joblib.load(path)
+                status = 'cached'
+            except Exception as e:
+                print(f"⚠️  Ignoring unreadable cache for stage '{name}': {e}")
+        if status == 'ran':
+            output = fn()
+            if use_cache:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                for stale in self.cache_dir.glob(f"{name}-*.joblib"):
+                    stale.unlink()
+                joblib.dump(output, path)
+
+        elapsed = time.perf_counter() - start
+        peak_mb = None
+        if self.trace_memory:
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+            if not tracing:
+                tracemalloc.stop()
+
+        self.report.append({'stage': name, 'status': status, 'seconds': elapsed, 'peak_mb': peak_mb})
+        memory = f" (peak {peak_mb:.1f} MB)" if peak_mb is not None else ""
+        print(f"⏱️  Stage '{name}' {status} in {elapsed * 1000:.0f} ms{memory}")
+        return output, key
+
+    def print_report(self):
+        """Per-stage summary table"""
+        print(f"\n   {'stage':12s} {'status':>7s} {'time (ms)':>10s} {'peak (MB)':>10s}")
+        for entry in self.report:
+            peak = f"{entry['peak_mb']:10.1f}" if entry['peak_mb'] is not None else f"{'-':>10s}"
+            print(f"   {entry['stage']:12s} {entry['status']:>7s} {entry['seconds'] * 1000:10.0f} {peak}")
+        total = sum(entry['seconds'] for entry in self.report)
+        print(f"   {'total':12s} {'':>7s} {total * 1000:10.0f}")
@@ -0,0 +1,153 @@
+"""
+Streaming Batch Scoring Module - NDJSON in, NDJSON out, bounded memory
+"""
+import inspect
+import json
+import tempfile
+import orjson
+import config
+
+
+class LineTooLongError(ValueError):
+    """Raised when an input line exceeds config.STREAM_MAX_LINE_BYTES"""
+
+
+async def spool_body(byte_chunks, max_memory_bytes=None):
+    """
+    Copy an async stream of request body chunks into a temporary file
+
+    Small bodies stay in memory, larger ones roll over to disk. The body is
+    received completely before any result is sent, because most HTTP clients
+    do not read the response until they have finished uploading (scoring
+    while receiving would stall once the unread results filled the socket).
+
+    Returns:
+        File object positioned at the start
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory_bytes or config.STREAM_SPOOL_MEMORY_BYTES)
+    async for chunk in byte_chunks:
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def iter_ndjson(f, max_line_bytes=None, block_size=1 << 16):
+    """
+    Split a binary file of NDJSON into parsed lines, one block at a time
+
+    Only the current partial line is buffered. Blank lines are skipped.
+
+    Yields:
+        (line_number, record, error) with exactly one of record/error set
+
+    Raises:
+        LineTooLongError: if a line grows past max_line_bytes
+    """
+    max_line_bytes = max_line_bytes or config.STREAM_MAX_LINE_BYTES
+    buffer = b""
+    line_number = 0
+    for block in iter(lambda: f.read(block_size), b""):
+        buffer += block
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        if len(buffer) > max_line_bytes:
+            raise LineTooLongError(f"Line {line_number + len(lines) + 1} exceeds {max_line_bytes} bytes")
+        for line in lines:
+            line_number += 1
+            # A whole line can arrive inside one block, so check complete lines too
+            if len(line) > max_line_bytes:
+                raise LineTooLongError(f"Line {line_number} exceeds {max_line_bytes} bytes")
+            if line.strip():
+                yield (line_number, *_parse_line(line))
+    if buffer.strip():
+        yield (line_number + 1, *_parse_line(buffer))
+
+
+def _parse_line(line):
+    """Parse one NDJSON line into (record, error)"""
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return None, f"Invalid JSON: {e}"
+    if not isinstance(record, dict):
+        return None, "Each line must be a JSON object"
+    return record, None
+
+
+async def stream_scores(f, score_fn, chunk_size=None, explain=False, top_k=5):
+    """
+    Score an NDJSON file chunk by chunk
+
+    Args:
+        f: Binary file object with one JSON object per line
+        score_fn: Callable (records, explain, top_k) -> predict_batch-style
+            result dict (may be async)
+        chunk_size: Rows per model call
+        explain: Include top-k SHAP factors per row
+        top_k: Number of positive/negative factors per explanation
+
+    Yields:
+        NDJSON-encoded results (bytes) for one chunk at a time, one line per
+        input line, in input order
+    """
+    chunk_size = chunk_size or config.STREAM_CHUNK_SIZE
+    pending = []  # (line_number, record, error)
+    try:
+        for item in iter_ndjson(f):
+            pending.append(item)
+            if len(pending) >= chunk_size:
+                yield await _score_chunk(pending, score_fn, explain, top_k)
+                pending = []
+    except LineTooLongError as e:
+        # Headers are already sent: finish what was read, then report and stop
+        if pending:
+            yield await _score_chunk(pending, score_fn, explain, top_k)
+        yield orjson.dumps({'error': str(e)}) + b"\n"
+        return
+    finally:
+        f.close()
+    if pending:
+        yield await _score_chunk(pending, score_fn, explain, top_k)
+
+
+async def _score_chunk(items, score_fn, explain, top_k):
+    """Score the valid rows of one chunk and encode every row's result"""
+    valid = [(line_number, record) for line_number, record, error in items if error is None]
+    results = {}
+    if valid:
+        records = [record for _, record in valid]
+        try:
+            rows = _split_batch(await _call(score_fn, records, explain, top_k))
+        except Exception:
+            # Isolate the offending rows instead of failing the whole chunk
+            rows = []
+            for record in records:
+                try:
+                    rows.extend(_split_batch(await _call(score_fn, [record], explain, top_k)))
+                except Exception as e:
+                    rows.append({'error': f"Prediction error: {e}"})
+        results = {line_number: row for (line_number, _), row in zip(valid, rows)}
+
+    lines = []
+    for line_number, _, error in items:
+        row = results.get(line_number, {'error': error})
+        lines.append(orjson.dumps({'line': line_number, **row}, option=orjson.OPT_SERIALIZE_NUMPY))
+    return b"\n".join(lines) + b"\n"
+
+
+async def _call(fn, *args):
+    result = fn(*args)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+def _split_batch(batch):
+    """Turn a predict_batch result dict into one dict per row"""
+    rows = [
+        {'credit_score': int(score), 'category': category}
+        for score, category in zip(batch['scores'], batch['categories'])
+    ]
+    for row, explanation in zip(rows, batch.get('explanations', [])):
+        row['explanation'] = explanation
+    return rows
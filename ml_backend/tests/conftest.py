@@ -0,0 +1,71 @@
+"""
+Shared fixtures: a small model trained end to end in a temporary directory
+"""
+import os
+import sys
+import pandas as pd
+import pytest
+
+# Normalized: config derives paths from its own location
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config  # noqa: E402
+
+# Rows of the sample CSV the shared model is trained on
+TRAIN_ROWS = 300
+
+
+def use_temp_paths(monkeypatch, root):
+    """Point every file location in config at `root` (models, caches, output)"""
+    paths = {
+        'DATA_DIR': root / 'data', 'MODELS_DIR': root / 'models', 'OUTPUT_DIR': root / 'output'
+    }
+    for path in paths.values():
+        path.mkdir(parents=True, exist_ok=True)
+    paths.update({
+        'MODEL_BUNDLE_PATH': paths['MODELS_DIR'] / 'credit_score_model.bundle',
+        'TUNING_REPORT_PATH': paths['MODELS_DIR'] / 'tuning.json',
+        'TRAINING_SNAPSHOT_PATH': paths['MODELS_DIR'] / 'training_snapshot.joblib',
+        'DATA_CACHE_DIR': paths['DATA_DIR'] / 'cache',
+        'PIPELINE_CACHE_DIR': paths['DATA_DIR'] / 'cache' / 'pipeline',
+    })
+    for name, path in paths.items():
+        monkeypatch.setattr(config, name, path)
+    return paths
+
+
+def write_sample_csv(path, rows=TRAIN_ROWS, skip=0):
+    """The first `rows` customers (after `skip`) of the bundled CSV"""
+    df = pd.read_csv(config.CSV_FILE_PATH).iloc[skip:skip + rows]
+    df.to_csv(path, index=False)
+    return path
+
+
+def train_small_model(monkeypatch, root, rows=TRAIN_ROWS):
+    """Run the training pipeline on a sample CSV with all outputs under `root`"""
+    import train_pipeline
+    use_temp_paths(monkeypatch, root)
+    csv_path = write_sample_csv(root / 'customers.csv', rows)
+    monkeypatch.setattr(config, 'TUNE_ENABLED', False)
+    monkeypatch.setattr(config, 'GLOBAL_EXPLANATION_ROWS', 100)
+    train_pipeline.main(use_cache=False, tune=False, csv_path=csv_path)
+    return csv_path
+
+
+@pytest.fixture(scope='session')
+def trained_model(tmp_path_factory):
+    """Session-wide model bundle; yields the training CSV path with config patched"""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        yield train_small_model(monkeypatch, tmp_path_factory.mktemp('trained'))
+
+
+@pytest.fixture(scope='session')
+def api_client(trained_model):
+    """TestClient for api_server (startup loads the session model)"""
+    from fastapi.testclient import TestClient
+    import api_server
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(api_server, 'predictor', None)
+        with TestClient(api_server.app) as client:
+            yield client
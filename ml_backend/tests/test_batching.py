@@ -0,0 +1,85 @@
+"""
+MicroBatcher: results fan back out per request, failures are isolated
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from batching import MicroBatcher  # noqa: E402
+
+
+def _run(batch_fn, payloads, max_batch_size=8, window_ms=20):
+    """Submit every payload concurrently; returns (results or exceptions, batcher)"""
+    async def main():
+        batcher = MicroBatcher(batch_fn, max_batch_size=max_batch_size, window_ms=window_ms)
+        try:
+            return await asyncio.gather(*(batcher.submit(p) for p in payloads), return_exceptions=True)
+        finally:
+            await batcher.stop()
+    return asyncio.run(main())
+
+
+def test_results_go_back_to_their_own_request():
+    calls = []
+
+    def square(payloads):
+        calls.append(list(payloads))
+        return [p * p for p in payloads]
+
+    assert _run(square, list(range(8))) == [p * p for p in range(8)]
+    # Coalesced into one call
+    assert calls == [list(range(8))]
+
+
+def test_async_batch_fn_and_size_limit():
+    calls = []
+
+    async def double(payloads):
+        calls.append(len(payloads))
+        await asyncio.sleep(0)
+        return [p * 2 for p in payloads]
+
+    assert _run(double, list(range(10)), max_batch_size=4) == [p * 2 for p in range(10)]
+    assert max(calls) <= 4 and sum(calls) == 10
+
+
+def test_failing_payload_is_isolated():
+    calls = []
+
+    def fragile(payloads):
+        calls.append(len(payloads))
+        if 'bad' in payloads:
+            raise ValueError('bad payload')
+        return [p.upper() for p in payloads]
+
+    payloads = ['a', 'b', 'c', 'bad', 'd', 'e', 'f', 'g']
+    results = _run(fragile, payloads)
+
+    assert [r for i, r in enumerate(results) if i != 3] == ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+    assert isinstance(results[3], ValueError)
+    # One full call, then halving down to the bad payload (8 -> 4 -> 2 -> 1)
+    assert calls[0] == 8 and 1 in calls and len(calls) <= 1 + 2 * 3
+
+
+def test_every_payload_failing():
+    def broken(payloads):
+        raise RuntimeError('model unavailable')
+
+    results = _run(broken, [1, 2, 3])
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_batcher_survives_a_failed_flush():
+    async def main():
+        batcher = MicroBatcher(lambda ps: [1 / p for p in ps], max_batch_size=4, window_ms=5)
+        try:
+            with pytest.raises(ZeroDivisionError):
+                await batcher.submit(0)
+            return await batcher.submit(4)
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(main()) == 0.25
@@ -0,0 +1,117 @@
+"""
+Tests for Arrow IPC / Parquet batch bodies: format negotiation, table
+round trips and scoring through /api/credit-score/predict/batch
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import columnar  # noqa: E402
+from columnar import FORMAT_MEDIA_TYPES, body_format, read_table, write_table  # noqa: E402
+from model_trainer import CreditScoreModel  # noqa: E402
+
+FORMATS = list(FORMAT_MEDIA_TYPES)
+BATCH_URL = "/api/credit-score/predict/batch"
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('application/vnd.apache.arrow.stream', 'arrow'),
+    ('Application/Vnd.Apache.Arrow.File; charset=binary', 'arrow_file'),
+    ('application/json, application/x-parquet;q=0.9', 'parquet'),
+    ('application/json', None),
+    ('', None),
+    (None, None),
+])
+def test_body_format(header, expected):
+    assert body_format(header) == expected
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_table_round_trip(fmt):
+    table = pa.table({
+        'CUST_ID': ['C1', 'C2', None],
+        'INCOME': [1.5, None, 3.0],
+        'CAT_GAMBLING': pa.array(['No', 'High', 'No']).dictionary_encode()
+    })
+    assert read_table(write_table(table, fmt), fmt).equals(table)
+
+
+def test_unknown_format_raises():
+    with pytest.raises(ValueError, match="Unknown columnar format"):
+        write_table(pa.table({'a': [1]}), 'csv')
+    with pytest.raises(ValueError, match="Unknown columnar format"):
+        read_table(b'', 'csv')
+
+
+@pytest.fixture(scope='module')
+def customers(trained_model):
+    """Raw feature rows of the training CSV, without the target columns"""
+    return pd.read_csv(trained_model).head(60).drop(columns=['CREDIT_SCORE', 'DEFAULT'], errors='ignore')
+
+
+def post_table(client, df, fmt, accept=None, **params):
+    body = write_table(pa.Table.from_pandas(df, preserve_index=False), fmt)
+    headers = {'content-type': FORMAT_MEDIA_TYPES[fmt]}
+    if accept:
+        headers['accept'] = accept
+    return client.post(BATCH_URL, content=body, headers=headers, params=params)
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_columnar_request_round_trip(api_client, customers, fmt):
+    response = post_table(api_client, customers, fmt)
+    assert response.status_code == 200
+    assert response.headers['content-type'] == FORMAT_MEDIA_TYPES[fmt]
+
+    result = read_table(response.content, fmt)
+    assert result.column_names == ['CUST_ID', 'credit_score', 'category']
+    assert result.column('CUST_ID').to_pylist() == customers['CUST_ID'].tolist()
+
+    # Same scores and categories as the JSON body
+    expected = api_client.post(BATCH_URL, json={'users': customers.to_dict('records')}).json()
+    assert result.column('credit_score').to_pylist() == expected['scores']
+    assert result.column('category').to_pylist() == expected['categories']
+
+
+def test_accept_selects_response_format(api_client, customers):
+    response = post_table(api_client, customers, 'arrow', accept='application/vnd.apache.parquet')
+    assert response.headers['content-type'] == FORMAT_MEDIA_TYPES['parquet']
+    assert read_table(response.content, 'parquet').num_rows == len(customers)
+
+
+def test_missing_columns_are_imputed(api_client, customers):
+    response = post_table(api_client, customers[['CUST_ID', 'INCOME', 'DEBT']], 'arrow')
+    assert response.status_code == 200
+    assert read_table(response.content, 'arrow').num_rows == len(customers)
+
+
+def test_explain_columns_match_json(api_client, customers):
+    response = post_table(api_client, customers, 'arrow', explain='true', top_k=3, explain_mode='exact')
+    result = read_table(response.content, 'arrow')
+    expected = api_client.post(BATCH_URL, json={
+        'users': customers.to_dict('records'), 'explain': True, 'top_k': 3, 'explain_mode': 'exact'
+    }).json()['explanations']
+
+    for column, key in (('top_positive', 'positive_factors'), ('top_negative', 'negative_factors')):
+        for factors, explanation in zip(result.column(column).to_pylist(), expected):
+            assert [f['feature'] for f in factors] == [f['feature'] for f in explanation[key]]
+            np.testing.assert_allclose([f['impact'] for f in factors], [f['impact'] for f in explanation[key]])
+
+
+def test_invalid_body_is_400(api_client):
+    response = api_client.post(BATCH_URL, content=b'not arrow',
+                               headers={'content-type': FORMAT_MEDIA_TYPES['arrow']})
+    assert response.status_code == 400
+    assert response.json()['detail'].startswith('Invalid columnar body')
+
+
+def test_category_column_matches_categorize_score():
+    scores = np.array([300, 599, 600, 700, 749, 750, 900, 250, 901])
+    expected = [CreditScoreModel().categorize_score(score) for score in scores]
+    assert columnar._category_column(scores).to_pylist() == expected
+    assert expected[-2:] == ['Unknown', 'Unknown']
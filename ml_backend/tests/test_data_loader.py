@@ -0,0 +1,114 @@
+"""
+Tests for the DataLoader columnar cache: reuse while the source is
+unchanged, rebuild when its fingerprint changes
+"""
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import config  # noqa: E402
+from data_loader import DataLoader, fingerprint_source  # noqa: E402
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'DATA_CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setattr(config, 'DATA_CACHE_DOWNCAST', True)
+    path = tmp_path / 'customers.csv'
+    pd.DataFrame({
+        'CUST_ID': ['C1', 'C2', 'C3'],
+        'INCOME': [1000.5, 2000.25, 3000.0],
+        'CAT_GAMBLING': ['No', 'High', 'No'],
+        'DEFAULT': [0, 1, 0]
+    }).to_csv(path, index=False)
+    return path
+
+
+def load(path):
+    loader = DataLoader(path, use_cache=True)
+    return loader.load_data(), loader
+
+
+def rewrite(path, old, new, mtime_ns):
+    """Replace text in the CSV and give it a new modification time"""
+    path.write_text(path.read_text().replace(old, new))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def cache_files():
+    return sorted(config.DATA_CACHE_DIR.glob('*.bundle'))
+
+
+def test_second_load_reads_cache(source):
+    first, loader = load(source)
+    assert loader.load_stats['source'] == 'csv'
+    assert cache_files() == [loader.cache_path()]
+
+    second, loader = load(source)
+    assert loader.load_stats['source'] == 'cache'
+    pd.testing.assert_frame_equal(first, second)
+    assert isinstance(second['CAT_GAMBLING'].dtype, pd.CategoricalDtype)
+
+
+def test_edit_rebuilds_and_drops_old_cache(source):
+    _, loader = load(source)
+    old_cache = loader.cache_path()
+    old_fingerprint = fingerprint_source(source)
+
+    # Same size, different contents and mtime
+    rewrite(source, '2000.25', '2999.25', os.stat(source).st_mtime_ns + 10**9)
+    assert fingerprint_source(source) != old_fingerprint
+
+    df, loader = load(source)
+    assert loader.load_stats['source'] == 'csv'
+    assert df['INCOME'].tolist() == [1000.5, 2999.25, 3000.0]
+    assert cache_files() == [loader.cache_path()]
+    assert not old_cache.exists()
+
+
+def test_touch_alone_rebuilds(source):
+    _, loader = load(source)
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    _, loader = load(source)
+    assert loader.load_stats['source'] == 'csv'
+
+
+def test_append_rebuilds_with_new_rows(source):
+    load(source)
+    with open(source, 'a') as f:
+        f.write('C4,4000.0,Low,1\n')
+
+    df, loader = load(source)
+    assert loader.load_stats['source'] == 'csv'
+    assert df['CUST_ID'].tolist() == ['C1', 'C2', 'C3', 'C4']
+    assert 'Low' in df['CAT_GAMBLING'].cat.categories
+
+
+def test_other_sources_keep_their_cache(source, tmp_path):
+    other = tmp_path / 'other.csv'
+    other.write_text(source.read_text())
+    _, other_loader = load(other)
+    _, loader = load(source)
+
+    rewrite(source, 'C3', 'C9', os.stat(source).st_mtime_ns + 10**9)
+    _, loader = load(source)
+
+    assert other_loader.cache_path().exists()
+    assert cache_files() == sorted([other_loader.cache_path(), loader.cache_path()])
+
+
+def test_unreadable_cache_is_rebuilt(source):
+    _, loader = load(source)
+    loader.cache_path().write_bytes(b'not a bundle')
+
+    df, loader = load(source)
+    assert loader.load_stats['source'] == 'csv'
+    assert len(df) == 3
+
+    _, loader = load(source)
+    assert loader.load_stats['source'] == 'cache'
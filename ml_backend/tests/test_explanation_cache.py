@@ -0,0 +1,96 @@
+"""
+ExplanationCache: TTL expiry, LRU eviction and model fingerprint resets
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import explanation_cache  # noqa: E402
+from explanation_cache import ExplanationCache, fingerprint_files  # noqa: E402
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    """Controllable replacement for time.monotonic inside the cache module"""
+    now = [1000.0]
+    monkeypatch.setattr(explanation_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def _row(i):
+    return np.full(4, float(i))
+
+
+def test_hit_and_miss():
+    cache = ExplanationCache(max_size=4, ttl_seconds=0)
+    key = cache.key(_row(1))
+    assert cache.get(key) is None
+    cache.put(key, 'one')
+    assert cache.get(key) == 'one'
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_ttl_expiry(clock):
+    cache = ExplanationCache(max_size=4, ttl_seconds=10)
+    key = cache.key(_row(1))
+    cache.put(key, 'one')
+
+    clock[0] += 10
+    assert cache.get(key) == 'one'
+    clock[0] += 0.5
+    assert cache.get(key) is None
+    stats = cache.stats()
+    assert stats['expirations'] == 1 and stats['size'] == 0
+
+
+def test_lru_eviction():
+    cache = ExplanationCache(max_size=2, ttl_seconds=0)
+    keys = [cache.key(_row(i)) for i in range(3)]
+    cache.put(keys[0], 0)
+    cache.put(keys[1], 1)
+    # Touch 0 so that 1 is the least recently used
+    assert cache.get(keys[0]) == 0
+    cache.put(keys[2], 2)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == 0 and cache.get(keys[2]) == 2
+    assert cache.stats()['evictions'] == 1 and cache.stats()['size'] == 2
+
+
+def test_reset_on_new_model_fingerprint():
+    cache = ExplanationCache(max_size=4, ttl_seconds=0)
+    cache.reset('model-a')
+    old_key = cache.key(_row(1))
+    cache.put(old_key, 'from model a')
+
+    cache.reset('model-b')
+    new_key = cache.key(_row(1))
+    assert new_key != old_key
+    assert cache.get(old_key) is None and cache.get(new_key) is None
+    assert cache.stats()['size'] == 0
+
+
+def test_key_depends_on_row_and_namespace():
+    cache = ExplanationCache(max_size=4, ttl_seconds=0)
+    assert cache.key(_row(1)) == cache.key(_row(1).astype(np.float32))
+    assert cache.key(_row(1)) != cache.key(_row(2))
+    assert cache.key(_row(1), namespace='exact') != cache.key(_row(1), namespace='fast')
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ExplanationCache(max_size=0, ttl_seconds=0)
+    key = cache.key(_row(1))
+    cache.put(key, 'one')
+    assert not cache.enabled and cache.get(key) is None
+
+
+def test_fingerprint_files_follows_contents(tmp_path):
+    path = tmp_path / 'model.bundle'
+    path.write_bytes(b'weights v1')
+    first = fingerprint_files([path])
+    assert fingerprint_files([path]) == first
+    path.write_bytes(b'weights v2')
+    assert fingerprint_files([path]) != first
@@ -0,0 +1,57 @@
+"""
+SHAP explanations on a small fitted model: batch edge cases and summary totals
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from explanation_generator import ExplanationGenerator  # noqa: E402
+from shap_explainer import SHAPExplainer  # noqa: E402
+
+FEATURES = [f'F{i}' for i in range(12)]
+
+
+@pytest.fixture(scope='module')
+def explainer():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, len(FEATURES)))
+    y = 600 + 40 * X[:, 0] - 25 * X[:, 1] + 10 * X[:, 2] * X[:, 3] + rng.normal(size=300)
+    model = GradientBoostingRegressor(n_estimators=30, max_depth=3, random_state=0).fit(X, y)
+    explainer = SHAPExplainer(model, None, FEATURES)
+    explainer.create_explainer(X[:50])
+    return explainer, X
+
+
+@pytest.mark.parametrize('mode', ['exact', 'fast'])
+def test_explain_batch_empty(explainer, mode):
+    shap_explainer, X = explainer
+    shap_matrix = shap_explainer.explain_batch(X[:0], mode=mode)
+    assert shap_matrix.shape == (0, len(FEATURES))
+
+    generator = ExplanationGenerator(shap_explainer, FEATURES)
+    assert generator.generate_batch_explanations(shap_matrix, [], np.array([])) == []
+
+
+@pytest.mark.parametrize('mode', ['exact', 'fast'])
+def test_explain_batch_rows(explainer, mode):
+    shap_explainer, X = explainer
+    assert shap_explainer.explain_batch(X[:7], mode=mode).shape == (7, len(FEATURES))
+
+
+@pytest.mark.parametrize('top_k', [1, 5, 8])
+def test_single_and_batch_totals_agree(explainer, top_k):
+    shap_explainer, X = explainer
+    generator = ExplanationGenerator(shap_explainer, FEATURES)
+    shap_matrix = shap_explainer.explain_batch(X[:20])
+    records = [dict(zip(FEATURES, row)) for row in X[:20]]
+    scores = np.full(20, 650)
+
+    batch = generator.generate_batch_explanations(shap_matrix, records, scores, top_k=top_k)
+    for row, explanation in enumerate(batch):
+        single = generator.generate_explanation(shap_matrix[row], records[row], 650, top_k=top_k)
+        assert explanation['total_positive_impact'] == single['total_positive_impact']
+        assert explanation['total_negative_impact'] == single['total_negative_impact']
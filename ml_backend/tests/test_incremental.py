@@ -0,0 +1,145 @@
+"""
+Tests for incremental training: append detection and the warm-started
+update on rows appended to a temporary CSV
+"""
+import os
+import sys
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import config  # noqa: E402
+import incremental  # noqa: E402
+from conftest import TRAIN_ROWS, train_small_model  # noqa: E402
+from model_trainer import CreditScoreModel  # noqa: E402
+
+
+def append_rows(csv_path, rows, skip=TRAIN_ROWS):
+    """Append `rows` further customers of the bundled CSV (no header)"""
+    df = pd.read_csv(config.CSV_FILE_PATH).iloc[skip:skip + rows]
+    df.to_csv(csv_path, mode='a', header=False, index=False)
+    return df
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'source.csv'
+    path.write_bytes(b'a,b\n1,2\n3,4\n')
+    return path
+
+
+def test_source_status_same(source):
+    marker = incremental.source_marker(source)
+    assert incremental.source_status(source, marker) == 'same'
+
+
+def test_source_status_appended(source):
+    marker = incremental.source_marker(source)
+    with open(source, 'ab') as f:
+        f.write(b'5,6\n')
+    assert incremental.source_status(source, marker) == 'appended'
+
+
+@pytest.mark.parametrize('contents', [
+    b'a,b\n1,2\n3,5\n',        # edited in place, same size
+    b'a,b\n1,2\n',             # truncated
+    b'a,b\n9,2\n3,4\n5,6\n',   # edited and appended
+])
+def test_source_status_changed(source, contents):
+    marker = incremental.source_marker(source)
+    source.write_bytes(contents)
+    assert incremental.source_status(source, marker) == 'changed'
+
+
+def test_append_without_trailing_newline_is_a_change(tmp_path):
+    path = tmp_path / 'source.csv'
+    path.write_bytes(b'a,b\n1,2\n3,4')
+    marker = incremental.source_marker(path)
+    with open(path, 'ab') as f:
+        f.write(b'\n5,6\n')
+    assert incremental.source_status(path, marker) == 'changed'
+
+
+def test_read_appended_rows_reuses_header(source, monkeypatch):
+    monkeypatch.setattr(config, 'DATA_CACHE_DOWNCAST', False)
+    offset = os.path.getsize(source)
+    with open(source, 'ab') as f:
+        f.write(b'5,6\n7,8\n')
+    delta = incremental.read_appended_rows(source, offset)
+    assert list(delta.columns) == ['a', 'b']
+    assert delta.to_numpy().tolist() == [[5, 6], [7, 8]]
+
+
+@pytest.fixture
+def trained(tmp_path, monkeypatch):
+    """A fresh model and snapshot per test (the tests append to its CSV)"""
+    csv_path = train_small_model(monkeypatch, tmp_path)
+    # Thresholds out of the way: only the warm-start path is under test here
+    monkeypatch.setattr(config, 'INCREMENTAL_DRIFT_THRESHOLD', float('inf'))
+    monkeypatch.setattr(config, 'INCREMENTAL_MAX_GROWTH', float('inf'))
+    return csv_path
+
+
+def test_update_without_new_rows(trained):
+    assert incremental.update(trained) == 'up_to_date'
+
+
+def test_update_waits_for_enough_rows(trained):
+    append_rows(trained, config.INCREMENTAL_MIN_ROWS - 1)
+    assert incremental.update(trained) == 'waiting'
+    # Nothing was consumed: the rows are picked up once enough arrive
+    snapshot = joblib.load(config.TRAINING_SNAPSHOT_PATH)
+    assert incremental.source_status(trained, snapshot['source']) == 'appended'
+
+
+def test_warm_start_on_appended_rows(trained):
+    before = joblib.load(config.TRAINING_SNAPSHOT_PATH)
+    trees_before = before['estimator'].n_estimators
+    appended = append_rows(trained, 200)
+
+    assert incremental.update(trained) == 'incremental'
+
+    snapshot = joblib.load(config.TRAINING_SNAPSHOT_PATH)
+    assert snapshot['estimator'].n_estimators == trees_before + config.INCREMENTAL_ESTIMATORS
+    assert snapshot['rows'] == TRAIN_ROWS + 200
+    assert snapshot['full_fit_rows'] == TRAIN_ROWS
+    assert snapshot['source']['bytes'] == os.path.getsize(trained)
+    assert [entry['rows'] for entry in snapshot['updates']] == [200]
+    # Remapped thresholds keep the old trees' splits; only rows whose
+    # float32 value rounds onto a threshold may switch sides
+    assert snapshot['updates'][0]['remap_changed_rows'] <= len(snapshot['reference_rows']) // 10
+
+    # The served bundle is the updated model
+    model = CreditScoreModel()
+    manifest = model.load_bundle(config.MODEL_BUNDLE_PATH)
+    assert manifest['metadata']['feature_info']['incremental_updates'] == 1
+    X = model.pipeline.transform_frame(appended)
+    np.testing.assert_allclose(model.engine.predict(X), snapshot['estimator'].predict(X), atol=1e-6)
+
+    assert incremental.update(trained) == 'up_to_date'
+
+
+def test_updates_accumulate(trained):
+    append_rows(trained, 100)
+    assert incremental.update(trained) == 'incremental'
+    append_rows(trained, 100, skip=TRAIN_ROWS + 100)
+    assert incremental.update(trained) == 'incremental'
+
+    snapshot = joblib.load(config.TRAINING_SNAPSHOT_PATH)
+    assert snapshot['rows'] == TRAIN_ROWS + 200
+    assert snapshot['added']['count'] == 200
+    assert len(snapshot['updates']) == 2
+
+
+def test_edited_source_refits_fully(trained):
+    df = pd.read_csv(trained)
+    df.loc[0, 'INCOME'] += 1
+    df.to_csv(trained, index=False)
+
+    assert incremental.update(trained) == 'full'
+    snapshot = joblib.load(config.TRAINING_SNAPSHOT_PATH)
+    assert snapshot['updates'] == []
+    assert incremental.source_status(trained, snapshot['source']) == 'same'
@@ -0,0 +1,144 @@
+"""
+Tests for latency metrics: histograms, the Prometheus text output of
+/metrics and the Server-Timing header
+"""
+import os
+import re
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import config  # noqa: E402
+import metrics  # noqa: E402
+from metrics import LatencyHistogram, MetricsRegistry, server_timing  # noqa: E402
+
+PREDICT_URL = "/api/credit-score/predict"
+USER = {'INCOME': 50000, 'SAVINGS': 10000, 'DEBT': 20000}
+
+
+def parse_server_timing(header):
+    """{name: ms} from a Server-Timing header value"""
+    return {name: float(ms) for name, ms in re.findall(r'([\w.]+);dur=([\d.]+)', header)}
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = LatencyHistogram((0.001, 0.01, 0.1))
+    for seconds in (0.0005, 0.001, 0.005, 0.05, 0.5):
+        histogram.observe(seconds)
+    cumulative, total, count = histogram.snapshot()
+    # Bounds are inclusive upper limits (Prometheus `le`)
+    assert cumulative == [2, 3, 4, 5]
+    assert count == 5 and total == pytest.approx(0.5565)
+    assert histogram.quantile(0.4) == 0.001
+    assert histogram.quantile(0.8) == 0.1
+    assert histogram.quantile(1.0) == float('inf')
+    assert LatencyHistogram((0.001,)).quantile(0.5) == 0.0
+
+
+def test_prometheus_text():
+    registry = MetricsRegistry(bounds_ms=[1, 10])
+    registry.observe('predict', 0.002)
+    registry.observe('predict', 0.02)
+    registry.observe_request('/api/x', 0.005)
+    lines = registry.prometheus().splitlines()
+
+    assert '# TYPE ml_stage_duration_seconds histogram' in lines
+    assert '# TYPE ml_request_duration_seconds histogram' in lines
+    assert 'ml_stage_duration_seconds_bucket{stage="predict",le="0.001"} 0' in lines
+    assert 'ml_stage_duration_seconds_bucket{stage="predict",le="0.01"} 1' in lines
+    assert 'ml_stage_duration_seconds_bucket{stage="predict",le="+Inf"} 2' in lines
+    assert 'ml_stage_duration_seconds_sum{stage="predict"} 0.022000000' in lines
+    assert 'ml_stage_duration_seconds_count{stage="predict"} 2' in lines
+    assert 'ml_request_duration_seconds_count{path="/api/x"} 1' in lines
+
+    summary = registry.summary()
+    assert summary['stages']['predict']['count'] == 2
+    assert summary['stages']['predict']['mean_ms'] == pytest.approx(11.0)
+
+
+def test_stage_timings_collected_per_request(monkeypatch):
+    monkeypatch.setattr(config, 'METRICS_ENABLED', True)
+    monkeypatch.setattr(metrics, 'REGISTRY', MetricsRegistry())
+
+    # Outside a request only the histogram is updated
+    with metrics.stage('transform'):
+        pass
+    token = metrics.begin()
+    with metrics.stage('predict'):
+        pass
+    with metrics.stage('predict'):
+        pass
+    metrics.merge({'shap': 0.25}, observe=False)
+    timings = metrics.end(token)
+
+    assert set(timings) == {'predict', 'shap'}
+    assert timings['shap'] == 0.25
+    assert metrics.REGISTRY.summary()['stages']['predict']['count'] == 2
+    assert 'shap' not in metrics.REGISTRY.summary()['stages']
+
+
+def test_disabled_stage_records_nothing(monkeypatch):
+    monkeypatch.setattr(config, 'METRICS_ENABLED', False)
+    monkeypatch.setattr(metrics, 'REGISTRY', MetricsRegistry())
+    token = metrics.begin()
+    with metrics.stage('predict'):
+        pass
+    assert metrics.end(token) == {}
+    assert metrics.REGISTRY.histograms == {}
+
+
+def test_server_timing_format():
+    assert server_timing({'predict': 0.0012345, 'total': 0.01}) == 'predict;dur=1.234, total;dur=10.000'
+
+
+@pytest.fixture
+def client(api_client):
+    metrics.REGISTRY.reset()
+    return api_client
+
+
+def test_server_timing_header(client):
+    response = client.post(PREDICT_URL, json=USER)
+    assert response.status_code == 200
+
+    stages = parse_server_timing(response.headers['server-timing'])
+    assert {'validate', 'transform', 'predict', 'total'} <= set(stages)
+    assert stages['total'] >= max(value for name, value in stages.items() if name != 'total')
+
+
+def test_server_timing_can_be_turned_off(client, monkeypatch):
+    monkeypatch.setattr(config, 'METRICS_SERVER_TIMING', False)
+    response = client.post(PREDICT_URL, json=USER)
+    assert response.status_code == 200
+    assert 'server-timing' not in response.headers
+
+
+def test_metrics_endpoint(client):
+    for _ in range(3):
+        client.post(PREDICT_URL, json=USER)
+    client.get('/no-such-route')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    text = response.text
+    assert f'ml_request_duration_seconds_count{{path="{PREDICT_URL}"}} 3' in text
+    assert 'ml_stage_duration_seconds_count{stage="predict"} 3' in text
+    # Unmatched paths get no histogram
+    assert 'no-such-route' not in text
+
+    # Every histogram's buckets are cumulative and end at its count
+    buckets = {}
+    for labels, value in re.findall(r'_bucket\{(.*?),le="[^"]+"\} (\d+)', text):
+        buckets.setdefault(labels, []).append(int(value))
+    counts = dict(re.findall(r'_count\{(.*?)\} (\d+)', text))
+    assert buckets
+    for labels, values in buckets.items():
+        assert values == sorted(values)
+        assert values[-1] == int(counts[labels])
+
+
+def test_metrics_endpoint_disabled(client, monkeypatch):
+    monkeypatch.setattr(config, 'METRICS_ENABLED', False)
+    assert client.get('/metrics').status_code == 404
@@ -0,0 +1,66 @@
+"""
+Bundle round trip and atomic replacement under an open memory map
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import model_bundle  # noqa: E402
+from model_bundle import BundleError, load_bundle, save_bundle  # noqa: E402
+
+
+def _arrays(fill):
+    return {'a': np.full(1000, fill, dtype=np.float64), 'b': np.arange(7, dtype=np.int32)}
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'model.bundle'
+    checksum = save_bundle(path, _arrays(1.5), {'name': 'test'})
+    arrays, manifest = load_bundle(path)
+    assert manifest['checksum'] == checksum
+    assert manifest['metadata'] == {'name': 'test'}
+    np.testing.assert_array_equal(arrays['a'], _arrays(1.5)['a'])
+    np.testing.assert_array_equal(arrays['b'], np.arange(7))
+    assert not arrays['a'].flags.writeable
+
+
+def test_overwrite_leaves_open_mapping_intact(tmp_path):
+    path = tmp_path / 'model.bundle'
+    save_bundle(path, _arrays(1.0), {})
+    old, _ = load_bundle(path)
+
+    save_bundle(path, _arrays(2.0), {})
+    new, _ = load_bundle(path)
+
+    # The old mapping still sees the complete old file, not a truncated one
+    assert np.all(old['a'] == 1.0)
+    assert np.all(new['a'] == 2.0)
+    assert [p.name for p in tmp_path.iterdir()] == ['model.bundle']
+
+
+def test_failed_write_keeps_previous_bundle(tmp_path, monkeypatch):
+    path = tmp_path / 'model.bundle'
+    save_bundle(path, _arrays(1.0), {})
+
+    def fail(fd):
+        raise OSError("disk full")
+    monkeypatch.setattr(model_bundle.os, 'fsync', fail)
+    with pytest.raises(OSError):
+        save_bundle(path, _arrays(2.0), {})
+
+    arrays, _ = load_bundle(path)
+    assert np.all(arrays['a'] == 1.0)
+    assert [p.name for p in tmp_path.iterdir()] == ['model.bundle']
+
+
+def test_corrupted_data_fails_checksum(tmp_path):
+    path = tmp_path / 'model.bundle'
+    save_bundle(path, _arrays(1.0), {})
+    with open(path, 'r+b') as f:
+        f.seek(-8, os.SEEK_END)
+        f.write(b'\xff' * 8)
+    with pytest.raises(BundleError):
+        load_bundle(path)
@@ -0,0 +1,191 @@
+"""
+Tests for one-pass statistics: merged moments, the quantile sketch and the
+streamed preprocessor fit against fit_transform
+
+Tolerances:
+- moments and scaler mean/variance: exact up to float rounding (rtol 1e-9)
+- sketch quantiles: rank within 2/k of the rows of the true quantile
+  (the sketch's documented error is about 1/k); exact while the input
+  fits in one compactor (up to k values)
+- label encoder classes: identical
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from preprocessor import DataPreprocessor, PreprocessorStats  # noqa: E402
+from running_stats import QuantileSketch, merge_moments, moments, nan_moments  # noqa: E402
+
+RTOL = 1e-9
+
+
+def rank_error(values, estimate, q=0.5):
+    """Distance (share of rows) from the estimate's rank to the q-quantile rank"""
+    values = values[~np.isnan(values)]
+    target = q * len(values)
+    below = (values < estimate).sum()
+    at_or_below = (values <= estimate).sum()
+    return max(0, below - target, target - at_or_below) / len(values)
+
+
+def chunked(df, size):
+    return [df.iloc[start:start + size] for start in range(0, len(df), size)]
+
+
+def customer_frame(rows, seed=0):
+    """Numeric columns with missing values, skew and a constant, plus a categorical"""
+    rng = np.random.default_rng(seed)
+    income = rng.lognormal(10, 1, rows)
+    debt = rng.normal(5000, 2000, rows)
+    debt[rng.random(rows) < 0.1] = np.nan
+    return pd.DataFrame({
+        'INCOME': income,
+        'DEBT': debt,
+        'CONSTANT': np.full(rows, 3.0),
+        'CAT_GAMBLING': rng.choice(['No', 'Low', 'High'], rows),
+        'CUST_ID': [f'C{i}' for i in range(rows)]
+    })
+
+
+FEATURES = ['INCOME', 'DEBT', 'CONSTANT', 'CAT_GAMBLING']
+
+
+def test_merged_moments_match_whole():
+    values = np.random.default_rng(1).normal(100, 15, (1000, 3))
+    merged = {'count': 0, 'mean': 0.0, 'm2': 0.0}
+    for start in range(0, 1000, 97):
+        merged = merge_moments(merged, moments(values[start:start + 97]))
+    whole = moments(values)
+    assert merged['count'] == 1000
+    np.testing.assert_allclose(merged['mean'], whole['mean'], rtol=RTOL)
+    np.testing.assert_allclose(merged['m2'], whole['m2'], rtol=RTOL)
+
+
+def test_nan_moments_skip_missing():
+    values = np.random.default_rng(2).normal(size=(200, 2))
+    values[::3, 0] = np.nan
+    merged = merge_moments(nan_moments(values[:50]), nan_moments(values[50:]))
+    np.testing.assert_array_equal(merged['count'], (~np.isnan(values)).sum(axis=0))
+    np.testing.assert_allclose(merged['mean'], np.nanmean(values, axis=0), rtol=RTOL)
+    np.testing.assert_allclose(merged['m2'] / merged['count'], np.nanvar(values, axis=0), rtol=RTOL)
+
+
+def test_sketch_is_exact_below_capacity():
+    values = np.random.default_rng(3).normal(size=501)
+    sketch = QuantileSketch(k=1024, seed=0)
+    sketch.update(values)
+    assert sketch.quantile(0.5) == np.median(values)
+
+
+@pytest.mark.parametrize('q', [0.1, 0.5, 0.9])
+def test_sketch_rank_error(q):
+    k = 256
+    values = np.random.default_rng(4).lognormal(size=100_000)
+    sketch = QuantileSketch(k=k, seed=0)
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+    assert sketch.count == len(values)
+    assert len(sketch) < 4 * k
+    assert rank_error(values, sketch.quantile(q), q) <= 2 / k
+
+
+def test_merged_sketches_rank_error():
+    k = 256
+    values = np.random.default_rng(5).normal(size=60_000)
+    shards = [QuantileSketch(k=k, seed=i) for i in range(3)]
+    for shard, part in zip(shards, np.array_split(values, 3)):
+        shard.update(part)
+    merged = shards[0]
+    merged.merge(shards[1])
+    merged.merge(shards[2])
+    assert merged.count == len(values)
+    assert rank_error(values, merged.quantile(0.5)) <= 2 / k
+
+
+def test_sketch_skips_nan_and_empty_is_nan():
+    sketch = QuantileSketch(k=16)
+    assert np.isnan(sketch.quantile(0.5))
+    sketch.update([1.0, np.nan, 3.0])
+    assert sketch.count == 2
+    assert sketch.quantile(0.5) == 2.0
+
+
+def assert_fits_match(streamed, in_memory):
+    np.testing.assert_allclose(streamed.scaler.mean_, in_memory.scaler.mean_, rtol=RTOL)
+    np.testing.assert_allclose(streamed.scaler.var_, in_memory.scaler.var_, rtol=RTOL)
+    np.testing.assert_allclose(streamed.scaler.scale_, in_memory.scaler.scale_, rtol=RTOL)
+    assert streamed.label_encoders.keys() == in_memory.label_encoders.keys()
+    for col, le in in_memory.label_encoders.items():
+        assert list(streamed.label_encoders[col].classes_) == list(le.classes_)
+
+
+def test_fit_stream_matches_fit_transform_exactly_below_sketch_capacity():
+    df = customer_frame(800)
+    in_memory = DataPreprocessor()
+    in_memory.fit_transform(df, FEATURES)
+    streamed = DataPreprocessor().fit_stream(chunked(df, 37), FEATURES, sketch_k=1024)
+
+    np.testing.assert_allclose(streamed.imputer.statistics_, in_memory.imputer.statistics_, rtol=RTOL)
+    assert_fits_match(streamed, in_memory)
+    # Constant column: unit scale, as StandardScaler
+    assert streamed.scaler.scale_[2] == 1.0
+    np.testing.assert_allclose(
+        streamed.compile().transform_frame(df), in_memory.compile().transform_frame(df), rtol=RTOL, atol=1e-12
+    )
+
+
+def test_fit_stream_medians_within_sketch_tolerance():
+    k = 256
+    df = customer_frame(30_000, seed=6)
+    in_memory = DataPreprocessor()
+    in_memory.fit_transform(df, FEATURES)
+    streamed = DataPreprocessor().fit_stream(chunked(df, 1000), FEATURES, sketch_k=k)
+
+    for i, col in enumerate(in_memory.imputer.feature_names_in_):
+        assert rank_error(df[col].to_numpy(), streamed.imputer.statistics_[i]) <= 2 / k
+    # Scaler statistics take the approximate median for the missing DEBT
+    # values; the other columns have none and match exactly
+    np.testing.assert_allclose(streamed.scaler.mean_[[0, 2]], in_memory.scaler.mean_[[0, 2]], rtol=RTOL)
+    np.testing.assert_allclose(streamed.scaler.var_[[0, 2]], in_memory.scaler.var_[[0, 2]], rtol=RTOL)
+    np.testing.assert_allclose(streamed.scaler.mean_, in_memory.scaler.mean_, rtol=1e-3)
+    np.testing.assert_allclose(streamed.scaler.scale_, in_memory.scaler.scale_, rtol=1e-3)
+
+
+def test_merged_shards_match_single_stream():
+    df = customer_frame(800, seed=7)
+    shards = [PreprocessorStats(FEATURES, sketch_k=1024) for _ in range(3)]
+    for shard, part in zip(shards, np.array_split(np.arange(len(df)), 3)):
+        for chunk in chunked(df.iloc[part], 50):
+            shard.update(chunk)
+    stats = PreprocessorStats(FEATURES, sketch_k=1024)
+    for shard in shards:
+        stats.merge(shard)
+    assert stats.rows == len(df)
+
+    merged = DataPreprocessor().fit_stats(stats)
+    in_memory = DataPreprocessor()
+    in_memory.fit_transform(df, FEATURES)
+    np.testing.assert_allclose(merged.imputer.statistics_, in_memory.imputer.statistics_, rtol=RTOL)
+    assert_fits_match(merged, in_memory)
+
+
+def test_all_missing_chunk_keeps_column_type():
+    df = customer_frame(100)
+    first, second = df.iloc[:50].copy(), df.iloc[50:]
+    first['CAT_GAMBLING'] = np.nan
+    streamed = DataPreprocessor().fit_stream([second, first], FEATURES)
+    assert 'CAT_GAMBLING' in streamed.label_encoders
+
+    numeric_later = df.iloc[50:].copy()
+    numeric_later['CAT_GAMBLING'] = 1.0
+    with pytest.raises(ValueError, match="CAT_GAMBLING"):
+        DataPreprocessor().fit_stream([df.iloc[50:], numeric_later], FEATURES)
+
+
+def test_fit_stream_without_rows():
+    with pytest.raises(ValueError, match="No rows"):
+        DataPreprocessor().fit_stream([], FEATURES)
@@ -0,0 +1,83 @@
+"""
+Tests for the offline scoring CLI (score.py)
+
+Chunks run on a thread pool in this process so the workers see the test
+model; a delay on the first chunks makes them finish out of order.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import score  # noqa: E402
+from predict import CreditScorePredictor  # noqa: E402
+
+
+@pytest.fixture
+def in_process_pool(trained_model, monkeypatch):
+    """Replace the spawn process pool with threads sharing one loaded predictor"""
+    def pool(max_workers, mp_context=None, initializer=None):
+        initializer()
+        return ThreadPoolExecutor(max_workers)
+
+    monkeypatch.setattr(score, 'ProcessPoolExecutor', pool)
+    monkeypatch.setattr(score, '_worker_predictor', None)
+
+    score_chunk = score.score_chunk
+
+    def slow_first_chunks(df, *args):
+        # Earlier chunks finish last
+        if df.index[0] < 40:
+            time.sleep(0.2)
+        return score_chunk(df, *args)
+
+    monkeypatch.setattr(score, 'score_chunk', slow_first_chunks)
+    return trained_model
+
+
+def test_output_keeps_input_order(in_process_pool, tmp_path):
+    source = pd.read_csv(in_process_pool)
+    output = tmp_path / 'scores.csv'
+
+    score.main([str(in_process_pool), '-o', str(output), '--chunk-size', '20', '--workers', '3'])
+
+    result = pd.read_csv(output)
+    assert list(result.columns) == ['CUST_ID', 'credit_score', 'category']
+    assert result['CUST_ID'].tolist() == source['CUST_ID'].tolist()
+
+
+def test_scores_match_single_predictions(in_process_pool, tmp_path):
+    output = tmp_path / 'scores.csv'
+    score.main([str(in_process_pool), '-o', str(output), '--chunk-size', '25', '--workers', '2'])
+
+    result = pd.read_csv(output)
+    predictor = CreditScorePredictor()
+    predictor.load_models()
+    source = pd.read_csv(in_process_pool)
+    expected = predictor.model.predict(source.iloc[[7, 120]])
+    assert result['credit_score'].iloc[[7, 120]].tolist() == pytest.approx(list(expected))
+
+
+@pytest.mark.parametrize('mode', ['exact', 'fast'])
+def test_explain_columns(in_process_pool, tmp_path, mode):
+    output = tmp_path / 'scores.csv'
+    score.main([str(in_process_pool), '-o', str(output), '--chunk-size', '20', '--workers', '2',
+                '--explain', '--top-k', '3', '--explain-mode', mode])
+
+    result = pd.read_csv(output, keep_default_na=False)
+    assert list(result.columns) == ['CUST_ID', 'credit_score', 'category', 'top_positive', 'top_negative']
+    assert result['CUST_ID'].tolist() == pd.read_csv(in_process_pool)['CUST_ID'].tolist()
+
+    feature_names = set(score._worker_predictor.model.feature_names)
+    for column, sign in (('top_positive', '+'), ('top_negative', '-')):
+        for cell in result[column]:
+            factors = cell.split(';') if cell else []
+            assert len(factors) <= 3
+            for factor in factors:
+                name, value = factor.split('=')
+                assert name in feature_names
+                assert value[0] == sign and float(value) != 0
@@ -0,0 +1,92 @@
+"""
+NDJSON streaming: line parsing, per-line errors, ordering and the line-length limit
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import config  # noqa: E402
+from streaming import LineTooLongError, iter_ndjson, spool_body, stream_scores  # noqa: E402
+
+
+def fake_scores(records, explain, top_k):
+    """predict_batch-shaped result: the score is the record's `x`"""
+    for record in records:
+        if record.get('x') == 'boom':
+            raise ValueError('cannot score')
+    result = {'scores': [record['x'] for record in records], 'categories': ['Good'] * len(records)}
+    if explain:
+        result['explanations'] = [{'top_k': top_k} for _ in records]
+    return result
+
+
+def _stream(body, **kwargs):
+    """Run stream_scores over a body; returns the decoded output lines"""
+    async def collect():
+        return [chunk async for chunk in stream_scores(io.BytesIO(body), fake_scores, **kwargs)]
+    return [json.loads(line) for line in b"".join(asyncio.run(collect())).splitlines()]
+
+
+def test_iter_ndjson_skips_blank_lines_and_reports_invalid_ones():
+    body = b'{"x": 1}\n\n   \n{"x": 2\n[1, 2]\n{"x": 3}'
+    items = list(iter_ndjson(io.BytesIO(body), block_size=4))
+    assert [(line, record) for line, record, _ in items] == [(1, {'x': 1}), (4, None), (5, None), (6, {'x': 3})]
+    assert items[1][2].startswith('Invalid JSON')
+    assert items[2][2] == 'Each line must be a JSON object'
+
+
+@pytest.mark.parametrize('block_size', [8, 1 << 16])
+def test_iter_ndjson_line_too_long(block_size):
+    body = b'{"x": 1}\n{"x": "' + b'a' * 100 + b'"}\n{"x": 2}\n'
+    items = iter_ndjson(io.BytesIO(body), max_line_bytes=50, block_size=block_size)
+    assert next(items)[1] == {'x': 1}
+    with pytest.raises(LineTooLongError, match='Line 2'):
+        next(items)
+
+
+def test_results_keep_input_order_across_chunks():
+    body = b"".join(json.dumps({'x': i}).encode() + b"\n" for i in range(25))
+    lines = _stream(body, chunk_size=4)
+    assert [line['line'] for line in lines] == list(range(1, 26))
+    assert [line['credit_score'] for line in lines] == list(range(25))
+
+
+def test_invalid_lines_get_errors_in_place():
+    body = b'{"x": 1}\nnot json\n\n{"x": "boom"}\n{"x": 4}\n'
+    lines = _stream(body, chunk_size=10)
+    assert [line['line'] for line in lines] == [1, 2, 4, 5]
+    assert lines[0]['credit_score'] == 1
+    assert lines[1]['error'].startswith('Invalid JSON')
+    # A row the model rejects fails alone; the rest of its chunk is scored
+    assert lines[2]['error'].startswith('Prediction error')
+    assert lines[3]['credit_score'] == 4
+
+
+def test_explanations_are_passed_through():
+    lines = _stream(b'{"x": 1}\n', explain=True, top_k=3)
+    assert lines == [{'line': 1, 'credit_score': 1, 'category': 'Good', 'explanation': {'top_k': 3}}]
+
+
+def test_line_too_long_after_results_were_sent(monkeypatch):
+    monkeypatch.setattr(config, 'STREAM_MAX_LINE_BYTES', 50)
+    body = b'{"x": 1}\n{"x": 2}\n{"x": "' + b'a' * 100 + b'"}\n{"x": 3}\n'
+    lines = _stream(body, chunk_size=1)
+    # Rows read before the long line are scored, then one error line ends the stream
+    assert [line.get('credit_score') for line in lines[:2]] == [1, 2]
+    assert lines[2] == {'error': 'Line 3 exceeds 50 bytes'}
+    assert len(lines) == 3
+
+
+def test_spool_body_rolls_over_to_disk():
+    async def chunks():
+        for _ in range(4):
+            yield b'x' * 10
+
+    spool = asyncio.run(spool_body(chunks(), max_memory_bytes=16))
+    assert spool.read() == b'x' * 40
+    assert spool._rolled
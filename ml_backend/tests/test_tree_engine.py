@@ -0,0 +1,104 @@
+"""
+Parity tests: FlatTreeEnsemble (and its compiled fallback) against sklearn
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from tree_engine import CompiledTreeEnsemble, FlatTreeEnsemble  # noqa: E402
+
+ATOL = 1e-8
+
+
+def _data(missing_rate=0.0, n_rows=600, n_features=8, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features))
+    # Integer-valued columns put many rows exactly on split thresholds
+    X[:, 0] = rng.integers(0, 5, n_rows)
+    y = 3 * X[:, 0] + np.sin(X[:, 1]) + X[:, 2] * X[:, 3] + rng.normal(scale=0.1, size=n_rows)
+    if missing_rate:
+        X[rng.random(X.shape) < missing_rate] = np.nan
+    return X, y
+
+
+def _gbr():
+    X, y = _data()
+    return GradientBoostingRegressor(n_estimators=40, max_depth=4, subsample=0.8, random_state=0).fit(X, y), X
+
+
+def _hgb_with_nans():
+    X, y = _data(missing_rate=0.1)
+    return HistGradientBoostingRegressor(max_iter=40, random_state=0).fit(X, y), X
+
+
+def _backend_forest():
+    # Same estimator family and settings as backend/train_model.py, fewer trees
+    X, y = _data()
+    return RandomForestRegressor(n_estimators=20, random_state=42).fit(X, y), X
+
+
+MODELS = {'gbr': _gbr, 'hgb_nan': _hgb_with_nans, 'backend_rf': _backend_forest}
+
+
+@pytest.fixture(scope='module', params=sorted(MODELS))
+def fitted(request):
+    estimator, X = MODELS[request.param]()
+    return request.param, estimator, X
+
+
+def _roundtrip(engine):
+    """Serialize and rebuild, as a model bundle does"""
+    return FlatTreeEnsemble.from_arrays(engine.to_arrays(), engine.params())
+
+
+def test_predict_matches_sklearn(fitted):
+    _, estimator, X = fitted
+    engine = FlatTreeEnsemble.from_sklearn(estimator)
+    np.testing.assert_allclose(engine.predict(X), estimator.predict(X), rtol=0, atol=ATOL)
+    np.testing.assert_allclose(_roundtrip(engine).predict(X), estimator.predict(X), rtol=0, atol=ATOL)
+
+
+def test_predict_single_rows(fitted):
+    _, estimator, X = fitted
+    engine = FlatTreeEnsemble.from_sklearn(estimator)
+    for row in X[:20]:
+        np.testing.assert_allclose(engine.predict(row[None, :]), estimator.predict(row[None, :]), rtol=0, atol=ATOL)
+
+
+def test_apply_matches_sklearn(fitted):
+    name, estimator, X = fitted
+    engine = FlatTreeEnsemble.from_sklearn(estimator)
+    leaves = engine.apply(X)
+    assert leaves.shape == (len(X), engine.n_trees)
+
+    if name == 'hgb_nan':
+        # No public apply(); check every tree's leaf value against its own predictor
+        X64 = np.ascontiguousarray(X, dtype=np.float64)
+        no_categories = np.zeros((0, 8), dtype=np.uint32)
+        feature_map = np.zeros(X.shape[1], dtype=np.uint32)
+        for i, (predictor,) in enumerate(estimator._predictors):
+            expected = predictor.predict(X64, no_categories, feature_map, 1)
+            np.testing.assert_allclose(engine.value[leaves[:, i]], expected, rtol=0, atol=ATOL)
+    else:
+        # sklearn reports node ids local to each tree
+        expected = np.asarray(estimator.apply(X)).reshape(len(X), -1)
+        np.testing.assert_array_equal(leaves - engine.roots[None, :], expected)
+
+
+def test_compiled_fallback_matches_sklearn(fitted):
+    _, estimator, X = fitted
+    compiled = CompiledTreeEnsemble(_roundtrip(FlatTreeEnsemble.from_sklearn(estimator)), X.shape[1])
+    np.testing.assert_allclose(compiled.predict(X), estimator.predict(X), rtol=0, atol=ATOL)
+
+
+def test_check_parity_reports_difference(fitted):
+    _, estimator, X = fitted
+    engine = FlatTreeEnsemble.from_sklearn(estimator)
+    assert engine.check_parity(estimator, X, atol=ATOL) <= ATOL
+    engine.value = engine.value + 1.0
+    with pytest.raises(AssertionError):
+        engine.check_parity(estimator, X, atol=ATOL)
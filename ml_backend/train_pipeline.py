@@ -1,93 +1,203 @@
 """
 Complete ML Pipeline - Training Script
 Run this to train the model and generate all artifacts
+
+Stages (load, infer types, target, preprocess, split, [tune,] fit, explainer,
+global explanation, save, snapshot) run once per run and are cached on disk keyed by their
+inputs and config, so unchanged stages are skipped on re-runs. Use
+--no-cache to recompute all.
 """
+import argparse
+import os
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import config
-from data_loader import DataLoader
+import model_bundle
+from data_loader import DataLoader, fingerprint_source
 from model_trainer import CreditScoreModel
 from shap_explainer import SHAPExplainer
-import joblib
+from stage_cache import StageRunner, stage_key
+import incremental
+import tuning
+from global_explanations import compute_global_explanation
 
-def main():
-    print("=" * 60)
-    print("🚀 Credit Score ML Pipeline - Training")
-    print("=" * 60)
-    
-    # Step 1: Load Data
+def _banner(title):
     print("\n" + "=" * 60)
-    print("STEP 1: Loading Data")
+    print(title)
     print("=" * 60)
-    loader = DataLoader()
-    df = loader.load_data()
-    
-    # Step 2: Infer Feature Types
-    print("\n" + "=" * 60)
-    print("STEP 2: Inferring Feature Types")
-    print("=" * 60)
-    feature_types = loader.infer_feature_types()
-    
-    # Step 3: Get Features for Modeling
-    print("\n" + "=" * 60)
-    print("STEP 3: Selecting Features for Modeling")
+
+def _bundle_key(path):
+    """Pipeline key recorded in an existing model bundle (or None)"""
+    try:
+        _, manifest = model_bundle.load_bundle(path, verify=False)
+    except (OSError, model_bundle.BundleError):
+        return None
+    return manifest['metadata'].get('feature_info', {}).get('pipeline_key')
+
+def main(use_cache=None, tune=None, csv_path=None, trace_memory=None):
     print("=" * 60)
-    feature_cols = loader.get_features_for_modeling()
-    print(f"✅ Selected {len(feature_cols)} features for modeling")
-    
-    # Step 4: Train Model
-    print("\n" + "=" * 60)
-    print("STEP 4: Training Credit Score Model")
+    print("🚀 Credit Score ML Pipeline - Training")
     print("=" * 60)
+
+    runner = StageRunner(enabled=use_cache, trace_memory=trace_memory)
     model = CreditScoreModel()
-    metrics = model.train(df, feature_cols)
-    
-    # Step 5: Create SHAP Explainer
-    print("\n" + "=" * 60)
-    print("STEP 5: Creating SHAP Explainer")
-    print("=" * 60)
-    
-    # Use sample of training data as background
-    from sklearn.model_selection import train_test_split
-    X_processed = model.preprocessor.transform(df)
-    X = X_processed[feature_cols]
-    y = model.create_synthetic_target(df)
-    X_train, _, _, _ = train_test_split(X, y, test_size=config.TEST_SIZE, random_state=config.RANDOM_STATE)
-    
-    # Use subset for faster SHAP computation
-    X_background = X_train.sample(min(100, len(X_train)), random_state=config.RANDOM_STATE)
-    
+
+    # Step 1: Load Data (DataLoader keeps its own columnar cache)
+    _banner("STEP 1: Loading Data")
+    loader = DataLoader(csv_path)
+    # Size of the file as trained on (incremental.py reads only what follows)
+    source_bytes = os.path.getsize(loader.csv_path)
+    df, data_key = runner.run(
+        'load', loader.load_data,
+        params={'source': fingerprint_source(loader.csv_path), 'downcast': config.DATA_CACHE_DOWNCAST},
+        cache=False
+    )
+    loader.df = df
+
+    # Step 2: Infer Feature Types and select features for modeling
+    _banner("STEP 2: Inferring Feature Types")
+    (feature_types, feature_cols), types_key = runner.run(
+        'infer_types',
+        lambda: (loader.infer_feature_types(), loader.get_features_for_modeling()),
+        inputs=[data_key]
+    )
+    print(f"✅ Selected {len(feature_cols)} features for modeling")
+
+    # Step 3: Synthetic target
+    _banner("STEP 3: Creating Synthetic Credit Score")
+    y, target_key = runner.run('target', lambda: model.create_synthetic_target(df), inputs=[data_key])
+    print(f"   Score range: {y.min()} - {y.max()}")
+    print(f"   Mean score: {y.mean():.2f}")
+    print(f"   Std score: {y.std():.2f}")
+
+    # Step 4: Preprocess (fit imputer, encoders and scaler once)
+    _banner("STEP 4: Preprocessing Features")
+    (X, preprocessor), preprocess_key = runner.run(
+        'preprocess',
+        lambda: (model.fit_preprocessor(df, feature_cols), model.preprocessor),
+        inputs=[data_key, types_key]
+    )
+    model.preprocessor = preprocessor
+    model.feature_names = feature_cols
+    model.pipeline = preprocessor.compile()
+
+    # Step 5: Train/test split (row positions, reused by fit and explainer)
+    _banner("STEP 5: Splitting Train/Test")
+    (train_idx, test_idx), split_key = runner.run(
+        'split', lambda: model.split_indices(len(X)),
+        inputs=[data_key],
+        params={'test_size': config.TEST_SIZE, 'random_state': config.RANDOM_STATE}
+    )
+    print(f"📈 Training set: {len(train_idx)} samples")
+    print(f"📊 Test set: {len(test_idx)} samples")
+
+    # Step 6: Hyperparameter search (optional, successive halving)
+    model_params = model.model_params()
+    if config.TUNE_ENABLED if tune is None else tune:
+        _banner("STEP 6: Tuning Hyperparameters")
+        search, _ = runner.run(
+            'tune', lambda: tuning.successive_halving(X, y, train_idx),
+            inputs=[preprocess_key, target_key, split_key],
+            params={
+                'engine': config.MODEL_ENGINE, 'space': tuning.SEARCH_SPACES[config.MODEL_ENGINE],
+                'candidates': config.TUNE_CANDIDATES, 'factor': config.TUNE_FACTOR,
+                'min_rows': config.TUNE_MIN_ROWS, 'latency_weight': config.TUNE_LATENCY_WEIGHT
+            }
+        )
+        tuning.save_report(search)
+        model_params = search['best_params']
+
+    # Step 7: Train Model
+    _banner("STEP 7: Training Credit Score Model")
+    (metrics, estimator), fit_key = runner.run(
+        'fit',
+        lambda: (model.fit(X, y, train_idx, test_idx, params=model_params), model.model),
+        inputs=[preprocess_key, target_key, split_key],
+        params={'engine': config.MODEL_ENGINE, **model_params}
+    )
+    model.model = estimator
+    model._build_engine()
+
+    # Step 8: Create SHAP Explainer (background sample of the training rows)
+    _banner("STEP 8: Creating SHAP Explainer")
+
+    def build_explainer():
+        X_train = X.iloc[train_idx]
+        X_background = X_train.sample(min(100, len(X_train)), random_state=config.RANDOM_STATE).values
+        explainer = SHAPExplainer(model.model, model.preprocessor, feature_cols)
+        explainer.create_explainer(X_background, explainer_type='tree')
+        return X_background, explainer.explainer
+
+    (X_background, tree_explainer), explainer_key = runner.run(
+        'explainer', build_explainer, inputs=[fit_key, split_key]
+    )
     explainer = SHAPExplainer(model.model, model.preprocessor, feature_cols)
-    explainer.create_explainer(X_background.values, explainer_type='tree')
-    
-    # Step 6: Save Models and Artifacts
-    print("\n" + "=" * 60)
-    print("STEP 6: Saving Models and Artifacts")
-    print("=" * 60)
-    
-    model_path = config.MODELS_DIR / "credit_score_model.pkl"
-    preprocessor_path = config.MODELS_DIR / "preprocessor.pkl"
-    explainer_path = config.MODELS_DIR / "shap_explainer.pkl"
-    feature_info_path = config.MODELS_DIR / "feature_info.pkl"
-    
-    model.save(model_path, preprocessor_path)
-    
-    # Save explainer
-    joblib.dump(explainer.explainer, explainer_path)
-    print(f"✅ SHAP Explainer saved to {explainer_path}")
-    
-    # Save feature information
-    joblib.dump({
-        'feature_names': feature_cols,
-        'feature_types': feature_types,
-        'metrics': metrics
-    }, feature_info_path)
-    print(f"✅ Feature info saved to {feature_info_path}")
-    
+    explainer.explainer = tree_explainer
+
+    # Step 9: Global importance and partial dependence, served from the bundle
+    _banner("STEP 9: Computing Global Explanation")
+    global_explanation, global_key = runner.run(
+        'global',
+        lambda: compute_global_explanation(model, explainer, X.iloc[train_idx]),
+        inputs=[fit_key, split_key],
+        params={
+            'rows': config.GLOBAL_EXPLANATION_ROWS, 'top_features': config.GLOBAL_PDP_FEATURES,
+            'grid_points': config.GLOBAL_PDP_GRID_POINTS, 'background_rows': config.GLOBAL_PDP_BACKGROUND_ROWS
+        }
+    )
+    for entry in global_explanation['importance'][:5]:
+        print(f"   {entry['feature']:<25} mean |SHAP| {entry['mean_abs_shap']:.2f}")
+
+    # Step 10: Save Models and Artifacts (skipped when the bundle is current)
+    _banner("STEP 10: Saving Models and Artifacts")
+    save_inputs = [fit_key, explainer_key, types_key, global_key]
+    pipeline_key = stage_key('save', save_inputs)
+
+    def save():
+        feature_info = {
+            'feature_names': feature_cols,
+            'feature_types': feature_types,
+            'metrics': {name: float(value) for name, value in metrics.items()},
+            'engine': config.MODEL_ENGINE,
+            'model_params': model_params,
+            'pipeline_key': pipeline_key
+        }
+        model.save_bundle(config.MODEL_BUNDLE_PATH, feature_info, global_explanation)
+
+        # Reload the bundle and check its trees explain like the sklearn model
+        bundled = CreditScoreModel()
+        bundled.load_bundle(config.MODEL_BUNDLE_PATH)
+        bundled_explainer = SHAPExplainer(bundled.engine, None, feature_cols)
+        bundled_explainer.create_explainer(None, explainer_type='tree')
+        shap_diff = np.abs(
+            explainer.explain_batch(X_background, mode='exact')
+            - bundled_explainer.explain_batch(X_background, mode='exact')
+        ).max()
+        if shap_diff > 1e-6:
+            raise ValueError(f"Bundled explainer differs from sklearn explainer by {shap_diff:g}")
+        print(f"✅ Bundle verified (max SHAP diff {shap_diff:g})")
+
+    runner.run(
+        'save', save, inputs=save_inputs,
+        is_current=lambda key: _bundle_key(config.MODEL_BUNDLE_PATH) == key
+    )
+
+    # Training snapshot for incremental updates on appended rows
+    runner.run(
+        'snapshot',
+        lambda: incremental.save_snapshot(
+            model, df, feature_cols, feature_types, y, test_idx, loader.csv_path, source_bytes,
+            metrics, key=pipeline_key
+        ),
+        inputs=save_inputs,
+        is_current=lambda key: incremental.snapshot_key() == pipeline_key
+    )
+
     print("\n" + "=" * 60)
     print("✅ Pipeline Training Complete!")
     print("=" * 60)
+    runner.print_report()
     print(f"\n📁 Models saved in: {config.MODELS_DIR}")
     print(f"📊 Model Performance:")
     print(f"   - Test R²: {metrics['test_r2']:.4f}")
@@ -95,5 +205,11 @@ def main():
     print(f"   - Test MAE: {metrics['test_mae']:.2f}")
 
 if __name__ == "__main__":
-    main()
-
+    parser = argparse.ArgumentParser(description="Train the credit score model")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every stage")
+    parser.add_argument("--tune", action="store_true", help="Search hyperparameters before training")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Report peak memory per stage (tracemalloc; slows the stages down)")
+    args = parser.parse_args()
+    main(use_cache=False if args.no_cache else None, tune=True if args.tune else None,
+         trace_memory=True if args.trace_memory else None)
@@ -0,0 +1,457 @@
+"""
+Flattened Tree Ensemble Module - Vectorized inference for sklearn tree ensembles
+"""
+import threading
+import numpy as np
+
+
+def sklearn_predict(estimator, X):
+    """
+    estimator.predict on a plain feature array
+
+    Estimators fitted on a DataFrame warn on bare arrays, so the array is
+    labelled with the training column names first.
+    """
+    names = getattr(estimator, 'feature_names_in_', None)
+    if names is not None and isinstance(X, np.ndarray):
+        import pandas as pd
+        X = pd.DataFrame(X, columns=names)
+    return estimator.predict(X)
+
+
+class FlatTreeEnsemble:
+    """
+    Tree ensemble exported into contiguous NumPy arrays
+
+    All trees are concatenated into flat node arrays (feature, threshold,
+    left/right children, leaf value). Leaves point back to themselves, so a
+    batch is evaluated by walking every (row, tree) pair one level at a time
+    for `max_depth` steps, with no per-estimator Python dispatch.
+
+    Supports GradientBoostingRegressor (init + learning_rate * sum of trees),
+    HistGradientBoostingRegressor (baseline + sum of shrunk trees) and
+    RandomForestRegressor (mean of trees).
+    """
+
+    # Arrays written to / read from a model bundle
+    ARRAY_NAMES = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'node_weight', 'default_left')
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth,
+                 learning_rate=1.0, init_value=0.0, aggregation='sum', node_weight=None,
+                 default_left=None, input_dtype='float32'):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.node_weight = node_weight
+        # Per-node side for missing values (histogram boosting); without it
+        # NaN fails every `<=` test and goes right
+        self.default_left = default_left
+        self.input_dtype = np.dtype(input_dtype)
+        self.max_depth = int(max_depth)
+        self.learning_rate = float(learning_rate)
+        self.init_value = float(init_value)
+        self.aggregation = aggregation
+        # Children interleaved as [left0, right0, left1, right1, ...] so one
+        # gather at (2 * node + go_right) picks the next node
+        self._children = np.stack([left, right], axis=1).ravel()
+        self._node_means = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, estimator):
+        """Export a fitted (Hist)GradientBoostingRegressor or RandomForestRegressor"""
+        if hasattr(estimator, '_predictors'):
+            return cls._from_hist_gradient_boosting(estimator)
+        if hasattr(estimator, 'learning_rate'):
+            trees = [stage[0] for stage in estimator.estimators_]
+            learning_rate = estimator.learning_rate
+            if estimator.init_ == 'zero':
+                init_value = 0.0
+            else:
+                init_value = float(np.ravel(
+                    estimator.init_.predict(np.zeros((1, estimator.n_features_in_)))
+                )[0])
+            aggregation = 'sum'
+        elif hasattr(estimator, 'estimators_'):
+            trees = list(estimator.estimators_)
+            learning_rate = 1.0
+            init_value = 0.0
+            aggregation = 'mean'
+        else:
+            raise ValueError(f"Unsupported estimator: {type(estimator).__name__}")
+
+        features, thresholds, lefts, rights, values, weights, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            t = tree.tree_
+            nodes = np.arange(t.node_count)
+            is_leaf = t.children_left == -1
+
+            # Leaves loop back to themselves: feature 0, threshold +inf -> "left" = self
+            features.append(np.where(is_leaf, 0, t.feature))
+            thresholds.append(np.where(is_leaf, np.inf, t.threshold))
+            lefts.append(np.where(is_leaf, nodes, t.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, t.children_right) + offset)
+            values.append(t.value[:, 0, 0])
+            weights.append(t.weighted_n_node_samples)
+            roots.append(offset)
+
+            offset += t.node_count
+            max_depth = max(max_depth, t.max_depth)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            learning_rate=learning_rate,
+            init_value=init_value,
+            aggregation=aggregation,
+            node_weight=np.ascontiguousarray(np.concatenate(weights), dtype=np.float64)
+        )
+
+    @classmethod
+    def _from_hist_gradient_boosting(cls, estimator):
+        """Export a fitted HistGradientBoostingRegressor from its tree predictors"""
+        features, thresholds, lefts, rights, values, weights, defaults, roots = [], [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for (predictor,) in estimator._predictors:
+            t = predictor.nodes
+            if t['is_categorical'].any():
+                raise ValueError("Categorical splits are not supported by the flat engine")
+            nodes = np.arange(len(t))
+            is_leaf = t['is_leaf'].astype(bool)
+
+            features.append(np.where(is_leaf, 0, t['feature_idx']))
+            thresholds.append(np.where(is_leaf, np.inf, t['num_threshold']))
+            lefts.append(np.where(is_leaf, nodes, t['left']) + offset)
+            rights.append(np.where(is_leaf, nodes, t['right']) + offset)
+            # Leaf values already include the learning rate
+            values.append(t['value'])
+            weights.append(t['count'])
+            # Leaves keep NaN on themselves
+            defaults.append(is_leaf | t['missing_go_to_left'].astype(bool))
+            roots.append(offset)
+
+            offset += len(t)
+            max_depth = max(max_depth, int(t['depth'].max()))
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            learning_rate=1.0,
+            init_value=float(np.ravel(estimator._baseline_prediction)[0]),
+            aggregation='sum',
+            node_weight=np.ascontiguousarray(np.concatenate(weights), dtype=np.float64),
+            default_left=np.ascontiguousarray(np.concatenate(defaults)),
+            # Histogram boosting compares float64 features against its thresholds
+            input_dtype='float64'
+        )
+
+    def to_arrays(self):
+        """Node arrays for serialization"""
+        return {name: getattr(self, name) for name in self.ARRAY_NAMES if getattr(self, name) is not None}
+
+    def params(self):
+        """Scalar parameters for serialization"""
+        return {
+            'max_depth': self.max_depth,
+            'learning_rate': self.learning_rate,
+            'init_value': self.init_value,
+            'aggregation': self.aggregation,
+            'input_dtype': self.input_dtype.name
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, params):
+        """Rebuild from to_arrays()/params() output (arrays may be memory-mapped)"""
+        return cls(**{name: arrays.get(name) for name in cls.ARRAY_NAMES}, **params)
+
+    def to_shap_model(self):
+        """
+        Describe the ensemble in SHAP's dictionary model format
+
+        Lets shap.TreeExplainer run TreeSHAP straight from the flat arrays,
+        without the sklearn estimator.
+        """
+        if self.node_weight is None:
+            raise ValueError("TreeSHAP needs node weights; re-export the model")
+
+        scale = self._tree_scale
+        bounds = list(self.roots) + [len(self.feature)]
+        trees = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            nodes = np.arange(start, stop)
+            is_leaf = self.left[start:stop] == nodes
+            children_left = np.where(is_leaf, -1, self.left[start:stop] - start)
+            children_right = np.where(is_leaf, -1, self.right[start:stop] - start)
+            if self.default_left is not None:
+                children_default = np.where(self.default_left[start:stop], children_left, children_right)
+            else:
+                children_default = children_left
+            trees.append({
+                'children_left': children_left,
+                'children_right': children_right,
+                'children_default': children_default,
+                'features': np.where(is_leaf, -2, self.feature[start:stop]),
+                'thresholds': np.where(is_leaf, -2.0, self.threshold[start:stop]),
+                'values': self.value[start:stop, None] * scale,
+                'node_sample_weight': np.asarray(self.node_weight[start:stop])
+            })
+
+        return {
+            'trees': trees,
+            'base_offset': self.init_value,
+            'input_dtype': self.input_dtype.type,
+            'tree_output': 'raw_value',
+            'objective': 'squared_error'
+        }
+
+    def _walk(self, X):
+        """
+        Descend every (row, tree) pair one level at a time
+
+        Yields:
+            (positions of the split features in X.ravel(), node, next node)
+            for each of the `max_depth` levels
+        """
+        # sklearn trees compare float32 features against float64 thresholds
+        # (histogram boosting keeps float64 features)
+        X = np.ascontiguousarray(X, dtype=self.input_dtype)
+        X_flat = X.ravel()
+        row_offsets = (np.arange(X.shape[0]) * X.shape[1])[:, None]
+        node = np.repeat(self.roots[None, :], X.shape[0], axis=0)
+        route_missing = self.default_left is not None and np.isnan(X_flat).any()
+        for _ in range(self.max_depth):
+            positions = row_offsets + self.feature.take(node)
+            values = X_flat.take(positions)
+            go_right = ~(values <= self.threshold.take(node))
+            if route_missing:
+                go_right &= ~(np.isnan(values) & self.default_left.take(node))
+            child = self._children.take(2 * node + go_right)
+            yield positions, node, child
+            node = child
+
+    def apply(self, X):
+        """Return the leaf node index reached in every tree, shape (n_rows, n_trees)"""
+        X = np.atleast_2d(X)
+        node = np.repeat(self.roots[None, :], X.shape[0], axis=0)
+        for _, _, node in self._walk(X):
+            pass
+        return node
+
+    def node_means(self):
+        """
+        Expected tree output at every node (training-weighted mean of its leaves)
+
+        The same expectation TreeSHAP uses, so path contributions start from
+        TreeSHAP's base value.
+        """
+        if self._node_means is None:
+            if self.node_weight is None:
+                raise ValueError("Node means need node weights; re-export the model")
+            means = np.array(self.value, dtype=np.float64)
+            internal = np.flatnonzero(self.left != np.arange(len(self.left)))
+            left, right = self.left[internal], self.right[internal]
+            left_weight, right_weight = self.node_weight[left], self.node_weight[right]
+            total = np.maximum(left_weight + right_weight, np.finfo(float).tiny)
+            # Each pass settles one more level above the leaves
+            for _ in range(self.max_depth):
+                means[internal] = (left_weight * means[left] + right_weight * means[right]) / total
+            self._node_means = means
+        return self._node_means
+
+    @property
+    def _tree_scale(self):
+        return self.learning_rate if self.aggregation == 'sum' else 1.0 / self.n_trees
+
+    @property
+    def expected_value(self):
+        """Model output expected over the training data (the base value)"""
+        return self.init_value + self._tree_scale * float(self.node_means()[self.roots].sum())
+
+    def path_contributions(self, X, chunk_size=4096):
+        """
+        Saabas path attributions, shape (n_rows, n_features)
+
+        Every split on a row's path credits its feature with the change in
+        expected output from the node to the child taken. Per row the
+        contributions sum to prediction - expected_value exactly; unlike
+        TreeSHAP they ignore the features not on the path, so credit leans
+        towards splits near the leaves.
+        """
+        X = np.atleast_2d(X)
+        means = self.node_means()
+        out = np.empty(X.shape, dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_size):
+            chunk = X[start:start + chunk_size]
+            contributions = np.zeros(chunk.size)
+            for positions, node, child in self._walk(chunk):
+                # Leaves point at themselves, so finished paths add zero
+                contributions += np.bincount(
+                    positions.ravel(), weights=(means[child] - means[node]).ravel(), minlength=chunk.size
+                )
+            out[start:start + chunk_size] = contributions.reshape(chunk.shape)
+        return out * self._tree_scale
+
+    def predict(self, X, chunk_size=4096):
+        """Predict a batch of rows (processed in chunks to bound memory)"""
+        X = np.atleast_2d(X)
+        out = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], chunk_size):
+            stop = start + chunk_size
+            out[start:stop] = self._predict_chunk(X[start:stop])
+        return out
+
+    def _predict_chunk(self, X):
+        leaf_values = self.value[self.apply(X)]
+        if self.aggregation == 'sum':
+            # Accumulate stage by stage (cumsum is sequential), like sklearn
+            stages = np.empty((leaf_values.shape[0], leaf_values.shape[1] + 1))
+            stages[:, 0] = self.init_value
+            stages[:, 1:] = self.learning_rate * leaf_values
+            return np.cumsum(stages, axis=1)[:, -1]
+        return leaf_values.sum(axis=1) / self.n_trees
+
+    def check_parity(self, estimator, X, atol=1e-8):
+        """
+        Compare against the sklearn estimator on X
+
+        Returns:
+            Maximum absolute difference
+
+        Raises:
+            AssertionError: if any prediction differs by more than atol
+        """
+        expected = sklearn_predict(estimator, X)
+        actual = self.predict(np.asarray(X, dtype=float))
+        max_diff = float(np.max(np.abs(expected - actual))) if len(expected) else 0.0
+        if max_diff > atol:
+            raise AssertionError(f"Flat tree engine differs from sklearn by {max_diff:g}")
+        return max_diff
+
+
+class CompiledTreeEnsemble:
+    """
+    sklearn's compiled tree predictors rebuilt from FlatTreeEnsemble arrays
+
+    A model bundle carries only the flat node arrays, so bundle-loaded models
+    have no fitted estimator. This rebuilds one sklearn Tree per tree
+    (GradientBoosting/RandomForest, float32 compares) or one histogram
+    TreePredictor (HistGradientBoosting, float64 compares with per-node
+    missing-value side), so large batches still get sklearn's Cython loop.
+    Trees are built on the first predict call, keeping bundle loads cheap.
+    """
+
+    def __init__(self, flat, n_features):
+        self.flat = flat
+        self.n_features = int(n_features)
+        self._predictors = None
+        self._lock = threading.Lock()
+
+    def _tree_slices(self):
+        """(root, stop) node range of every tree"""
+        stops = np.append(self.flat.roots[1:], len(self.flat.feature))
+        return zip(self.flat.roots.tolist(), stops.tolist())
+
+    def _build_sklearn_tree(self, start, stop):
+        from sklearn.tree._tree import Tree, NODE_DTYPE
+
+        flat = self.flat
+        local = np.arange(stop - start)
+        left = np.asarray(flat.left[start:stop]) - start
+        is_leaf = left == local
+        weight = (np.asarray(flat.node_weight[start:stop]) if flat.node_weight is not None
+                  else np.ones(stop - start))
+
+        nodes = np.zeros(stop - start, dtype=NODE_DTYPE)
+        nodes['left_child'] = np.where(is_leaf, -1, left)
+        nodes['right_child'] = np.where(is_leaf, -1, np.asarray(flat.right[start:stop]) - start)
+        nodes['feature'] = np.where(is_leaf, -2, flat.feature[start:stop])
+        nodes['threshold'] = np.where(is_leaf, -2.0, flat.threshold[start:stop])
+        nodes['n_node_samples'] = np.maximum(weight, 1).astype(np.int64)
+        nodes['weighted_n_node_samples'] = weight
+        if flat.default_left is not None:
+            nodes['missing_go_to_left'] = np.asarray(flat.default_left[start:stop]) & ~is_leaf
+
+        tree = Tree(self.n_features, np.array([1], dtype=np.intp), 1)
+        tree.__setstate__({
+            'max_depth': flat.max_depth,
+            'node_count': stop - start,
+            'nodes': nodes,
+            'values': np.ascontiguousarray(flat.value[start:stop], dtype=np.float64).reshape(-1, 1, 1)
+        })
+        return tree
+
+    def _build_hist_predictor(self, start, stop):
+        from sklearn.ensemble._hist_gradient_boosting.common import PREDICTOR_RECORD_DTYPE
+        from sklearn.ensemble._hist_gradient_boosting.predictor import TreePredictor
+
+        flat = self.flat
+        local = np.arange(stop - start)
+        left = np.asarray(flat.left[start:stop]) - start
+        is_leaf = left == local
+
+        nodes = np.zeros(stop - start, dtype=PREDICTOR_RECORD_DTYPE)
+        nodes['value'] = flat.value[start:stop]
+        nodes['feature_idx'] = flat.feature[start:stop]
+        nodes['num_threshold'] = flat.threshold[start:stop]
+        nodes['missing_go_to_left'] = np.asarray(flat.default_left[start:stop])
+        nodes['left'] = np.where(is_leaf, 0, left)
+        nodes['right'] = np.where(is_leaf, 0, np.asarray(flat.right[start:stop]) - start)
+        nodes['is_leaf'] = is_leaf
+        empty_bitsets = np.zeros((0, 8), dtype=np.uint32)
+        return TreePredictor(nodes, empty_bitsets, empty_bitsets)
+
+    def _build(self):
+        with self._lock:
+            if self._predictors is None:
+                if self.flat.input_dtype == np.float64 and self.flat.default_left is not None:
+                    build = self._build_hist_predictor
+                else:
+                    build = self._build_sklearn_tree
+                self._predictors = [build(start, stop) for start, stop in self._tree_slices()]
+        return self._predictors
+
+    def predict(self, X):
+        """Predict a batch of rows with the compiled per-tree loops"""
+        predictors = self._predictors or self._build()
+        flat = self.flat
+        if flat.input_dtype == np.float64 and flat.default_left is not None:
+            from sklearn.utils._openmp_helpers import _openmp_effective_n_threads
+
+            X = np.ascontiguousarray(X, dtype=np.float64)
+            no_categories = np.zeros((0, 8), dtype=np.uint32)
+            feature_map = np.zeros(X.shape[1], dtype=np.uint32)
+            n_threads = _openmp_effective_n_threads()
+            outputs = (p.predict(X, no_categories, feature_map, n_threads) for p in predictors)
+        else:
+            X = np.ascontiguousarray(X, dtype=np.float32)
+            outputs = (flat.value[root + tree.apply(X)] for tree, root in zip(predictors, flat.roots.tolist()))
+
+        # Accumulate tree by tree, in the same order as the estimators
+        out = np.full(X.shape[0], flat.init_value)
+        for values in outputs:
+            if flat.aggregation == 'sum':
+                out += flat.learning_rate * values
+            else:
+                out += values
+        if flat.aggregation != 'sum':
+            out /= flat.n_trees
+        return out
@@ -0,0 +1,234 @@
+"""
+Hyperparameter Tuning Module - Successive halving on a process pool
+
+Random candidates from the engine's search space are fitted on a growing
+share of the training rows; after every round only the best 1/factor of
+them go on to the next, larger budget. Candidates are ranked by validation
+RMSE plus a penalty on single-row inference latency, so a slightly more
+accurate but much slower ensemble does not win.
+
+The processed training matrix is written once as a float32 .npy file and
+memory-mapped by every worker: the OS shares the pages and the row budgets
+are prefix slices (views), so no worker gets its own copy of the data.
+"""
+import json
+import math
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import ParameterSampler, train_test_split
+import config
+from model_trainer import CreditScoreModel
+from tree_engine import FlatTreeEnsemble
+
+# Hyperparameter values sampled for each engine
+SEARCH_SPACES = {
+    'gbr': {
+        'n_estimators': [50, 100, 200, 300],
+        'max_depth': [3, 4, 5, 6],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'subsample': [0.6, 0.8, 1.0]
+    },
+    'hist': {
+        'max_iter': [50, 100, 200, 300],
+        'max_depth': [3, 4, 5, 6, 8],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'max_leaf_nodes': [15, 31, 63]
+    }
+}
+
+# Shared training matrix, memory-mapped once per worker
+_worker_X = None
+_worker_y = None
+_worker_n_train = None
+
+
+def _init_worker(X_path, y_path, n_train):
+    """Process-pool initializer: map the shared matrix in this worker"""
+    global _worker_X, _worker_y, _worker_n_train
+    _worker_X = np.load(X_path, mmap_mode='r')
+    _worker_y = np.load(y_path, mmap_mode='r')
+    _worker_n_train = n_train
+
+
+def _fit_candidate(engine, params, budget):
+    """
+    Fit one candidate on the first `budget` training rows
+
+    Returns:
+        (validation RMSE, fit seconds, exported flat trees)
+    """
+    X, y, n_train = _worker_X, _worker_y, _worker_n_train
+    estimator = CreditScoreModel.make_estimator(engine, params)
+    start = time.perf_counter()
+    estimator.fit(X[:budget], y[:budget])
+    fit_seconds = time.perf_counter() - start
+    rmse = float(np.sqrt(mean_squared_error(y[n_train:], estimator.predict(X[n_train:]))))
+    return rmse, fit_seconds, FlatTreeEnsemble.from_sklearn(estimator)
+
+
+def sample_candidates(engine, n_candidates, seed=config.RANDOM_STATE):
+    """
+    Candidate parameter sets: the current defaults plus random draws
+
+    Keeping the defaults in the pool means tuning never picks something
+    worse than the untuned model on the validation rows.
+    """
+    defaults = CreditScoreModel.model_params(engine)
+    candidates = [defaults]
+    seen = {json.dumps(defaults, sort_keys=True)}
+    for draw in ParameterSampler(SEARCH_SPACES[engine], n_iter=n_candidates * 4, random_state=seed):
+        if len(candidates) >= n_candidates:
+            break
+        params = {**defaults, **{name: value.item() if hasattr(value, 'item') else value
+                                 for name, value in draw.items()}}
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+    return candidates
+
+
+def single_row_latency_ms(engine, row, repeat=200):
+    """Median time (ms) of the flat engine predicting one row"""
+    row = np.atleast_2d(row)
+    engine.predict(row)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine.predict(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def successive_halving(X, y, train_idx, engine=None, n_candidates=None, factor=None, min_rows=None,
+                       latency_weight=None, workers=None):
+    """
+    Search hyperparameters with successive halving
+
+    Only the training rows are used: they are split again into search-train
+    and validation rows, so the test split stays untouched for the final
+    metrics.
+
+    Args:
+        X: Processed feature frame (from CreditScoreModel.fit_preprocessor)
+        y: Target scores aligned with X
+        train_idx: Training row positions (from CreditScoreModel.split_indices)
+        engine: 'gbr' or 'hist' (default config.MODEL_ENGINE)
+        n_candidates: Candidates in the first round
+        factor: Keep the best 1/factor candidates per round (budget grows by factor, >= 2)
+        min_rows: Smallest row budget of the first round (> 0)
+        latency_weight: RMSE points charged per millisecond of single-row latency
+        workers: Process pool size
+
+    Returns:
+        Dictionary with the best parameters, every round and the timings
+    """
+    engine = engine or config.MODEL_ENGINE
+    n_candidates = n_candidates or config.TUNE_CANDIDATES
+    factor = factor or config.TUNE_FACTOR
+    min_rows = min_rows or config.TUNE_MIN_ROWS
+    latency_weight = config.TUNE_LATENCY_WEIGHT if latency_weight is None else latency_weight
+    workers = workers or config.TUNE_WORKERS
+    if factor < 2:
+        raise ValueError(f"Halving factor must be at least 2, got {factor}")
+    if min_rows < 1:
+        raise ValueError(f"Minimum row budget must be positive, got {min_rows}")
+    if n_candidates < 1:
+        raise ValueError(f"Need at least one candidate, got {n_candidates}")
+
+    start = time.perf_counter()
+    # Shuffled search-train rows first, validation rows last: every budget
+    # is a prefix slice of the shared matrix
+    search_idx, val_idx = train_test_split(
+        np.asarray(train_idx), test_size=config.TEST_SIZE, random_state=config.RANDOM_STATE
+    )
+    order = np.concatenate([search_idx, val_idx])
+    n_train = len(search_idx)
+
+    candidates = sample_candidates(engine, n_candidates)
+    n_rounds = max(1, math.ceil(math.log(len(candidates), factor)))
+    # Budgets grow by `factor` per round and end at all search-train rows
+    budgets = [
+        min(n_train, max(n_train // factor ** (n_rounds - 1 - i), min_rows * factor ** i))
+        for i in range(n_rounds)
+    ]
+    budgets[-1] = n_train
+    latency_row = np.asarray(X.iloc[order[n_train:n_train + 1]], dtype=float)
+
+    print(f"\n🔎 Successive halving: {len(candidates)} {engine} candidates, "
+          f"{n_rounds} rounds, budgets {budgets} rows, {workers} workers")
+
+    rounds = []
+    alive = list(range(len(candidates)))
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='tuning-') as tmp:
+        X_path, y_path = Path(tmp) / 'X.npy', Path(tmp) / 'y.npy'
+        # float32 is what the gradient boosting fit works on, so the mapped
+        # pages are used in place
+        np.save(X_path, np.ascontiguousarray(X.iloc[order], dtype=np.float32))
+        np.save(y_path, np.asarray(y.iloc[order], dtype=np.float64))
+
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(str(X_path), str(y_path), n_train)) as pool:
+            for round_no, budget in enumerate(budgets):
+                round_start = time.perf_counter()
+                futures = {i: pool.submit(_fit_candidate, engine, candidates[i], budget) for i in alive}
+                fitted = {i: future.result() for i, future in futures.items()}
+                scored = []
+                for i, (rmse, fit_seconds, flat) in fitted.items():
+                    # Latency is timed once the round's fits are done, one
+                    # candidate at a time, in a worker (the parent may be
+                    # tracing allocations, which would slow it down)
+                    latency_ms = pool.submit(single_row_latency_ms, flat, latency_row).result()
+                    objective = rmse + latency_weight * latency_ms
+                    results[i] = {
+                        'params': candidates[i], 'rows': budget, 'rmse': rmse,
+                        'latency_ms': latency_ms, 'objective': objective, 'fit_seconds': fit_seconds
+                    }
+                    scored.append((objective, i))
+                scored.sort()
+                keep = max(1, math.ceil(len(alive) / factor))
+                alive = [i for _, i in scored[:keep]]
+                rounds.append({
+                    'round': round_no,
+                    'rows': budget,
+                    'candidates': [results[i] for _, i in scored],
+                    'seconds': time.perf_counter() - round_start
+                })
+                best = results[alive[0]]
+                print(f"   round {round_no}: {len(scored)} candidates on {budget} rows in "
+                      f"{rounds[-1]['seconds']:.1f} s, best RMSE {best['rmse']:.2f} "
+                      f"@ {best['latency_ms']:.3f} ms")
+
+    best = results[alive[0]]
+    search = {
+        'engine': engine,
+        'best_params': best['params'],
+        'best': {name: best[name] for name in ('rmse', 'latency_ms', 'objective', 'rows')},
+        'settings': {
+            'candidates': len(candidates), 'factor': factor, 'min_rows': min_rows,
+            'latency_weight': latency_weight, 'workers': workers,
+            'search_rows': n_train, 'validation_rows': len(val_idx)
+        },
+        'rounds': rounds,
+        'total_seconds': time.perf_counter() - start
+    }
+    print(f"✅ Best parameters: {best['params']}")
+    print(f"   Validation RMSE {best['rmse']:.2f}, single-row latency {best['latency_ms']:.3f} ms "
+          f"(search took {search['total_seconds']:.1f} s)")
+    return search
+
+
+def save_report(search, path=None):
+    """Write the chosen parameters and search timings as JSON next to the model"""
+    path = Path(path or config.TUNING_REPORT_PATH)
+    with open(path, 'w') as f:
+        json.dump(search, f, indent=2)
+    print(f"📝 Tuning report saved to {path}")
+    return path